@@ -0,0 +1,120 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from . import dbconn, tasks
+
+"""
+dbconn for coroutines.
+
+pymongo is blocking, so calls are run on a small bounded thread pool
+and awaited. That way a slow query only holds up the command that made
+it, not every guild on the shard.
+
+Writes nothing needs to wait on can be sent with run_later. They go
+through a single worker so they're still applied in order.
+"""
+
+DEFAULT_WORKERS = 4
+
+logger = logging.getLogger('battlebanana')
+
+executor = ThreadPoolExecutor(max_workers=dbconn.config.get("asyncWorkers", DEFAULT_WORKERS),
+                              thread_name_prefix="asyncdb")
+_write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="asyncdb-write")
+
+
+async def run(function, *args, **kwargs):
+    """
+    Runs a blocking db function in the thread pool
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(executor, functools.partial(function, *args, **kwargs))
+
+
+def run_later(function, *args, **kwargs):
+    """
+    Fire & forget a blocking db function (in the order they're called)
+    """
+    future = _write_executor.submit(function, *args, **kwargs)
+    future.add_done_callback(_log_failure)
+    return future
+
+
+def _log_failure(future):
+    if future.exception() is not None:
+        logger.error("Background db write failed: %s", future.exception())
+
+
+class AsyncCollection:
+    """
+    A pymongo collection where all the methods are coroutines.
+    find returns a list (not a cursor) so use skip, limit & sort kwargs.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def find(self, *args, **kwargs):
+        return await run(lambda: list(self.collection.find(*args, **kwargs)))
+
+    def __getattr__(self, name):
+        method = getattr(self.collection, name)
+
+        async def wrapped_method(*args, **kwargs):
+            return await run(method, *args, **kwargs)
+
+        return wrapped_method
+
+
+class AsyncDatabase:
+    def __init__(self, database):
+        self.database = database
+
+    def __getitem__(self, collection_name):
+        return AsyncCollection(self.database[collection_name])
+
+    async def command(self, *args, **kwargs):
+        return await run(self.database.command, *args, **kwargs)
+
+
+def conn():
+    return AsyncDatabase(dbconn.conn())
+
+
+def get_collection_for_object(object_class):
+    return conn()[object_class.__name__]
+
+
+async def insert_object(id, pickleable_object):
+    await run(dbconn.insert_object, id, pickleable_object)
+
+
+async def flush_objects(*pickleable_objects):
+    return await run(dbconn.flush_objects, *pickleable_objects)
+
+
+@tasks.task(timeout=dbconn.config.get("saveInterval", dbconn.DEFAULT_SAVE_INTERVAL))
+async def flush_task():
+    await flush_objects()
+
+
+async def drop_and_insert(collection, data):
+    await run(dbconn.drop_and_insert, collection, data)
+
+
+async def delete_object(object_class, id):
+    return await run(dbconn.delete_object, object_class, id)
+
+
+async def delete_objects(object_class, id_pattern):
+    return await run(dbconn.delete_objects, object_class, id_pattern)
+
+
+async def delete_player(player):
+    await run(dbconn.delete_player, player)
+
+
+async def update_guild_joined(count):
+    await run(dbconn.update_guild_joined, count)
@@ -4,10 +4,11 @@ import repoze.timeago
 from datetime import datetime
 
 import generalconfig as gconf
-from .. import commands, util, dbconn
+from .. import asyncdb, commands, util
 from ..game import awards, players, leaderboards, battles
 from ..game import emojis
 from ..game.helpers import misc, imagehelper
+from ..permissions import Permission
 
 topdogs_per_page = 10
 
@@ -63,28 +64,31 @@ async def eyes(ctx, eye_description="", **details):
     await imagehelper.googly_eyes(ctx, eye_description)
 
 
-@commands.command(args_pattern="C?", aliases=("globalrankings", "globalleaderboard", "gleaderboard"))
-async def globalranks(ctx, page=1, **details):
+@commands.command(args_pattern="M?C?", aliases=("globalrankings", "globalleaderboard", "gleaderboard"))
+async def globalranks(ctx, mixed=None, page=None, **details):
     """
-    [CMD_KEY]globalranks (page)
+    [CMD_KEY]globalranks (leaderboard) (page)
 
     Global BattleBanana leaderboard
     """
 
-    await leaderboard.__wrapped__(ctx, mixed="global", page_alt=page, **details)
+    await leaderboard.__wrapped__(ctx, "global", mixed, page, **details)
 
 
-@commands.command(args_pattern="M?C?", aliases=("ranks", "rankings"))
-async def leaderboard(ctx, mixed=1, page_alt=1, **details):
+@commands.command(args_pattern="M?M?C?", aliases=("ranks", "rankings"))
+async def leaderboard(ctx, *options, **details):
     """
-    [CMD_KEY]leaderboard (page)
+    [CMD_KEY]leaderboard (leaderboard) (page)
     or for global ranks
-    [CMD_KEY]leaderboard global (page)
-    [CMD_KEY]globalranks (page)
+    [CMD_KEY]leaderboard global (leaderboard) (page)
+    [CMD_KEY]globalranks (leaderboard) (page)
     
     The global leaderboard of BattleBanana!
+    The leaderboards are levels (default), money,
+    quests, wagers, prestige & awards.
     
-    The leaderboard updated every hour*.
+    The levels leaderboards are live & the others
+    are updated every 5 minutes*.
     
     **Now with local**
 
@@ -95,26 +99,34 @@ async def leaderboard(ctx, mixed=1, page_alt=1, **details):
     page_size = 10
 
     # Handle weird page args
-    if type(mixed) is int:
-        page = mixed - 1
-        local = True
-        ranks = "local"
-    else:
-        local = mixed.lower() != "global"
-        ranks = "local" if local else "global"
-        page = page_alt - 1
+    page = 0
+    local = True
+    rank_name = "levels"
+    for option in options:
+        if option is None:
+            continue
+        elif type(option) is int:
+            page = option - 1
+        elif option.lower() in ("global", "local"):
+            local = option.lower() == "local"
+        elif option.lower() in leaderboards.METRICS:
+            rank_name = option.lower()
+        else:
+            raise util.BattleBananaException(ctx.channel, "Leaderboard not found!")
+    ranks = "local" if local else "global"
+    metric = leaderboards.METRICS[rank_name]
+    leaderboard_name = "" if rank_name == "levels" else " (%s)" % metric.name
 
     # Local/Global
     if local:
-        title = "BattleBanana Leaderboard on %s" % details["server_name_clean"]
-        # Cached.
-        local_leaderboard = leaderboards.get_local_leaderboard(ctx.guild, "levels")
+        title = "BattleBanana Leaderboard on %s%s" % (details["server_name_clean"], leaderboard_name)
+        local_leaderboard = leaderboards.get_local_leaderboard(ctx.guild, rank_name)
         leaderboard_data = local_leaderboard.data
         last_updated = local_leaderboard.updated
     else:
-        title = "BattleBanana Global Leaderboard"
-        leaderboard_data = leaderboards.get_leaderboard("levels")
-        last_updated = leaderboards.last_leaderboard_update
+        title = "BattleBanana Global Leaderboard" + leaderboard_name
+        leaderboard_data = leaderboards.get_leaderboard(rank_name)
+        last_updated = leaderboard_data.updated
 
     if leaderboard_data is None or len(leaderboard_data) == 0:
         await util.reply(ctx, "The %s leaderboard has yet to be calculated!\n" % ranks
@@ -140,21 +152,27 @@ async def leaderboard(ctx, mixed=1, page_alt=1, **details):
             bonus = "     :second_place:"
         elif index == 2:
             bonus = "     :third_place:"
-        player = players.find_player(leaderboard_data[index])
+        player = await players.fetch_player(leaderboard_data[index])
+        if player is None:
+            # Deleted since the leaderboard was calculated
+            continue
         user_info = ctx.guild.get_member(player.id)
         if user_info is None:
             user_info = player.id
         leaderboard_embed \
             .add_field(name="#%s" % (index + 1) + bonus,
-                       value="[%s **``Level %s``**](https://battlebanana.xyz/player/id/%s) (%s) | **Total EXP** %d"
+                       value="[%s **``Level %s``**](https://battlebanana.xyz/player/id/%s) (%s) | **%s** %d"
                              % (player.name_clean, player.level, player.id,
-                                util.ultra_escape_string(str(user_info)), player.total_exp), inline=False)
+                                util.ultra_escape_string(str(user_info)), metric.name,
+                                metric.sort_function(player)), inline=False)
 
     if index < len(leaderboard_data) - 1:
         remaining_players = len(leaderboard_data) - page_size * (page + 1)
         leaderboard_embed.add_field(name="+%d more!" % remaining_players,
-                                    value="Do ``%sleaderboard%s %d`` for the next page!"
-                                          % (details["cmd_key"], "" if local else " global", page + 2), inline=False)
+                                    value="Do ``%sleaderboard%s%s %d`` for the next page!"
+                                          % (details["cmd_key"], "" if local else " global",
+                                             "" if rank_name == "levels" else " " + rank_name, page + 2),
+                                    inline=False)
     leaderboard_embed.set_footer(text="Leaderboard calculated "
                                       + repoze.timeago.get_elapsed(datetime.utcfromtimestamp(last_updated)))
     await util.reply(ctx, embed=leaderboard_embed)
@@ -293,9 +311,9 @@ async def topdog(ctx, **_):
 
     View the "top dog"
     """
-    top_dog_stats = awards.get_award_stat("TopDog")
+    top_dog_stats = await awards.get_award_stat("TopDog")
     if top_dog_stats is not None and "top_dog" in top_dog_stats:
-        top_dog = players.find_player(int(top_dog_stats["top_dog"]))
+        top_dog = await players.fetch_player(int(top_dog_stats["top_dog"]))
         await util.reply(ctx, (":dog: The current top dog is **%s** (%s)!\n"
                                + "They are the **%s** to earn the rank of top dog!")
                          % (top_dog, top_dog.id, util.int_to_ordinal(top_dog_stats["times_given"])))
@@ -310,11 +328,11 @@ async def battletopdog(ctx, **details):
     [CMD_KEY]battletopdog
     Battle the "top dog"
     """
-    top_dog_stats = awards.get_award_stat("TopDog")
+    top_dog_stats = await awards.get_award_stat("TopDog")
     if top_dog_stats is None or not "top_dog" in top_dog_stats:
         raise util.BattleBananaException(ctx.channel, "Sorry there was an error trying to find the topdog!")
 
-    top_dog = players.find_player(int(top_dog_stats["top_dog"]))
+    top_dog = await players.fetch_player(int(top_dog_stats["top_dog"]))
     if top_dog is None:
         raise util.BattleBananaException(ctx.channel, "Sorry there was an error trying to find the topdog!")
 
@@ -340,17 +358,51 @@ async def viewtopdog(ctx, **_):
     [CMD_KEY]viewtopdog
     See the info page of the "top dog"
     """
-    top_dog_stats = awards.get_award_stat("TopDog")
+    top_dog_stats = await awards.get_award_stat("TopDog")
     if top_dog_stats is None or not "top_dog" in top_dog_stats:
         raise util.BattleBananaException(ctx.channel, "Sorry there was an error trying to find the topdog!")
 
-    top_dog = players.find_player(int(top_dog_stats["top_dog"]))
+    top_dog = await players.fetch_player(int(top_dog_stats["top_dog"]))
     if top_dog is None:
         raise util.BattleBananaException(ctx.channel, "Sorry there was an error trying to find the topdog!")
 
     await imagehelper.stats_screen(ctx, top_dog)
 
 
+@commands.command(permission=Permission.BANANA_MOD, args_pattern="S?", aliases=["tdr"])
+async def topdogreplay(ctx, replay_id=None, **_):
+    """
+    [CMD_KEY]topdogreplay (replay id)
+
+    Re-runs the last battle that changed the "top dog"
+    (or a saved battle) from its replay & checks it
+    gives the same result.
+    """
+    document = await battles.find_replay(replay_id, reason="TopDog" if replay_id is None else None)
+    if document is None:
+        raise util.BattleBananaException(ctx.channel, "Replay not found!")
+
+    replay = battles.load_replay(document)
+    names = []
+    for fighter in replay.fighters:
+        player = await players.fetch_player(fighter.id) if isinstance(fighter.id, int) else None
+        names.append(player.name_clean if player is not None else str(fighter.id))
+    try:
+        replay_log = battles.get_replay_log(replay, names)
+    except ValueError as error:
+        raise util.BattleBananaException(ctx.channel, str(error))
+
+    winner_id = replay_log.winner.id if replay_log.winner is not None else None
+    same_result = winner_id == document.get("winner") and replay_log.turn_count == document.get("turn_count")
+    replay_info = ("Replay ``%s`` (%s battle on %s UTC)\nSame result as the battle: %s"
+                   % (document["_id"], document["reason"], document["date"].strftime("%Y-%m-%d %H:%M"),
+                      ":white_check_mark:" if same_result else ":x:"))
+    if replay_log.embed.description:
+        replay_info += "\n" + replay_log.embed.description
+    replay_log.embed.description = replay_info
+    await util.reply(ctx, embed=replay_log.embed)
+
+
 async def show_awards(ctx, top_dog, page=0):
     # Always show page 1 (0)
     if page != 0 and page * 5 >= len(top_dog.awards):
@@ -367,7 +419,7 @@ async def pandemic(ctx, **_):
 
     Tracked the passed BattleBanana pandemic.
     """
-    virus_stats = awards.get_award_stat("Duerus")
+    virus_stats = await awards.get_award_stat("Duerus")
 
     if virus_stats is None or virus_stats["times_given"] == 0:
         await util.reply(ctx, "All looks good now though a pandemic could break out any day.")
@@ -378,7 +430,7 @@ async def pandemic(ctx, **_):
                   1: "http://i.imgur.com/we6XgpG.gif",
                   2: "http://i.imgur.com/EJVYJ9C.gif"}
 
-    total_players = dbconn.get_collection_for_object(players.Player).count()
+    total_players = await asyncdb.get_collection_for_object(players.Player).count_documents({})
     total_infected = virus_stats["times_given"]
     total_uninfected = total_players - total_infected
     percent_infected = (total_infected / total_players) * 100
@@ -427,27 +479,27 @@ async def topdoghistory(ctx, page=1, **_):
     Display the current and the 10 previous topdogs
     """
     page -= 1
-    count = dbconn.conn()["Topdogs"].find().count()
+    count = await asyncdb.conn()["Topdogs"].count_documents({})
 
     if topdogs_per_page * page > count:
         raise util.BattleBananaException(ctx.channel, "Page not found!")
 
-    topdogs = dbconn.conn()["Topdogs"].find({}, {'_id': 0}).sort([('date', -1)]).skip(topdogs_per_page * page).limit(
-        topdogs_per_page)
+    topdogs = await asyncdb.conn()["Topdogs"].find({}, {'_id': 0}, sort=[('date', -1)],
+                                                   skip=topdogs_per_page * page, limit=topdogs_per_page)
 
     embed = discord.Embed(title="Topdog History", type="rich", color=gconf.DUE_COLOUR)
     embed.set_footer(text="Times are in UTC.")
 
-    topdog = awards.get_award_stat("TopDog")
+    topdog = await awards.get_award_stat("TopDog")
     if topdog is None or not "top_dog" in topdog:
         embed.add_field(name="Current topdog:", value=":bangbang: Failed to parse current topdog")
     else:
-        topdog = players.find_player(int(topdog["top_dog"]))
+        topdog = await players.fetch_player(int(topdog["top_dog"]))
         embed.add_field(name="Current topdog:", value=topdog.name)
 
     tdstring = ""
     for topdog in topdogs:
-        player = players.find_player(topdog.get('user_id'))
+        player = await players.fetch_player(topdog.get('user_id'))
         if player is not None:
             date: datetime = topdog.get('date')
 
@@ -135,7 +135,7 @@ async def blackjack(ctx, price, **details):
     elif gain < 0:
         result += " You lost `¤%s`." % (price)
 
-        battle_banana = players.find_player(ctx.guild.me.id)
+        battle_banana = await players.fetch_player(ctx.guild.me.id)
         if battle_banana is not None:
             battle_banana.money += price
             battle_banana.save()
@@ -179,7 +179,7 @@ async def russianroulette(ctx, price, **details):
         await util.edit_message(message, content=message.content + "\nYou survived and won `¤%s`!" % (reward))
     else:
         user.money -= price
-        battle_banana = players.find_player(ctx.guild.me.id)
+        battle_banana = await players.fetch_player(ctx.guild.me.id)
         if battle_banana is not None:
             battle_banana.money += price
             battle_banana.save()
@@ -17,8 +17,8 @@ from io import StringIO
 
 import dueutil.permissions
 import generalconfig as gconf
-from .. import commands, util, events, dbconn, loader
-from ..game import customizations, awards, leaderboards, game, emojis
+from .. import commands, util, events, asyncdb, loader
+from ..game import customizations, awards, leaderboards, game, emojis, stats
 from ..game.helpers import imagehelper
 from ..permissions import Permission
 
@@ -385,6 +385,7 @@ async def redeem(ctx, code, **details):
         del codes[code]
         user.money += money
         user.save()
+        await asyncdb.flush_objects(user)
 
         code_file.seek(0)
         code_file.truncate()
@@ -478,7 +479,7 @@ async def bans(ctx, page=1, **_):
 
     start = (page - 1) * 10
     end = page * 10
-    for cursor in dbconn.conn()['permissions'].find({'permission': "banned"}, {'_id': 1}).skip(start).limit(10):
+    for cursor in await asyncdb.conn()['permissions'].find({'permission': "banned"}, {'_id': 1}, skip=start, limit=10):
         string += "<@%s> (%s)\n" % (cursor['_id'], cursor['_id'])
 
     bans_embed.add_field(name="There is what I collected about bad people:", value=string or "Nobody is banned!")
@@ -603,6 +604,8 @@ async def updatebot(ctx, **_):
     if not (update_result.endswith("is up to date.") or update_result.endswith(
             "up-to-date.") or update_result == "Something went wrong!"):
         await util.duelogger.concern("BattleBanana updating!")
+        await asyncdb.flush_objects()
+        await asyncdb.run(stats.flush_stats)
         os._exit(1)
 
 
@@ -611,6 +614,8 @@ async def stopbot(ctx, **_):
     await util.reply(ctx, ":wave: Stopping BattleBanana!")
     await util.duelogger.concern("BattleBanana shutting down!")
     await util.clients[0].change_presence(activity=discord.Activity(name="restarting"), status=discord.Status.idle)
+    await asyncdb.flush_objects()
+    await asyncdb.run(stats.flush_stats)
     os._exit(0)
 
 
@@ -619,6 +624,8 @@ async def restartbot(ctx, **_):
     await util.reply(ctx, ":ferris_wheel: Restarting BattleBanana!")
     await util.duelogger.concern("BattleBanana restarting!!")
     await util.clients[0].change_presence(activity=discord.Activity(name="restarting"), status=discord.Status.idle)
+    await asyncdb.flush_objects()
+    await asyncdb.run(stats.flush_stats)
     os._exit(1)
 
 
@@ -632,6 +639,24 @@ async def meminfo(ctx, **_):
     await util.reply(ctx, "```%s```" % mem_info.getvalue())
 
 
+@commands.command(permission=Permission.BANANA_ADMIN, args_pattern=None, hidden=True)
+async def messagestages(ctx, **_):
+    """
+    [CMD_KEY]messagestages
+
+    How many messages each message stage (listeners & commands)
+    has seen & dropped before doing any work.
+    """
+
+    stage_info = ""
+    for stage, counts in events.message_stages.items():
+        seen, dropped = counts["seen"], counts["dropped"]
+        stage_info += ("%s: %s seen, %s dropped (%.1f%%)\n"
+                       % (stage, util.format_number_precise(seen), util.format_number_precise(dropped),
+                          dropped / seen * 100 if seen > 0 else 0))
+    await util.reply(ctx, "```%s```" % (stage_info or "No messages yet!"))
+
+
 @commands.command(args_pattern=None)
 async def ping(ctx, **_):
     """
@@ -640,7 +665,7 @@ async def ping(ctx, **_):
     """
     message = await util.reply(ctx, ":ping_pong:")
     t1 = time.time()
-    dbconn.db.command('ping')
+    await asyncdb.conn().command('ping')
     t2 = time.time()
     dbms = round((t2 - t1) * 1000)
 
@@ -656,6 +681,9 @@ async def ping(ctx, **_):
         embed.add_field(name="API Latency:", value="``NaN``")
 
     embed.add_field(name="Database Latency:", value="``%sms``" % (dbms), inline=False)
+    embed.add_field(name="Event Loop Lag:", value="``%sms`` (max ``%sms``)"
+                                                  % (round(util.clients[0].loop_lag * 1000),
+                                                     round(util.clients[0].max_loop_lag * 1000)))
     await util.edit_message(message, embed=embed)
 
 
@@ -671,7 +699,7 @@ async def pong(ctx, **_):
     latency = round(util.clients[0].latencies[util.get_shard_index(ctx.guild.id)][1] * 1000)
 
     t1 = time.time()
-    dbconn.db.command('ping')
+    await asyncdb.conn().command('ping')
     t2 = time.time()
     dbms = round((t2 - t1) * 1000)
 
@@ -4,10 +4,10 @@ import time
 
 import dueutil.game.awards as game_awards
 import generalconfig as gconf
-from .. import commands, util, dbconn
+from .. import asyncdb, commands, util
 from ..game import emojis as e
 from ..game import players, customizations
-from ..game import stats, game, gamerules, quests
+from ..game import stats, game, gamerules, quests, leaderboards
 from ..game.configs import dueserverconfig
 from ..game.helpers import misc, playersabstract, imagehelper
 from ..permissions import Permission
@@ -146,8 +146,8 @@ async def myinfo(ctx, **details):
     await imagehelper.stats_screen(ctx, details["author"])
 
 
-def player_profile_url(player_id):
-    private_record = dbconn.conn()["public_profiles"].find_one({"_id": player_id})
+async def player_profile_url(player_id):
+    private_record = await asyncdb.conn()["public_profiles"].find_one({"_id": player_id})
 
     if private_record is None or private_record["private"]:
         return None
@@ -162,7 +162,7 @@ async def myprofile(ctx, **details):
     Gives the link to your battlebanana.xyz profile
     """
 
-    profile_url = player_profile_url(details["author"].id)
+    profile_url = await player_profile_url(details["author"].id)
 
     if profile_url is None:
         await util.reply(ctx, (":lock: Your profile is currently set to private!\n"
@@ -180,7 +180,7 @@ async def profile(ctx, player, **_):
     Gives a link to a player's profile!
     """
 
-    profile_url = player_profile_url(player.id)
+    profile_url = await player_profile_url(player.id)
 
     if profile_url is None:
         await util.reply(ctx, ":lock: **%s** profile is private!" % player.get_name_possession_clean())
@@ -295,8 +295,8 @@ async def deleteme(ctx, cnf="", **details):
 
     user = details["author"]
 
-    dbconn.delete_player(user)
-    players.players.pop(ctx.author.id)
+    await players.delete_player(user)
+    leaderboards.remove_player(user.id)
 
     await util.reply(ctx, "Your user has been deleted.")
 
@@ -437,6 +437,8 @@ async def sendcash(ctx, receiver, transaction_amount, message="", **details):
 
     sender.save()
     receiver.save()
+    # Don't leave money transfers in the write-behind queue.
+    await asyncdb.flush_objects(sender, receiver)
 
     stats.increment_stat(stats.Stat.MONEY_TRANSFERRED, transaction_amount)
     if transaction_amount >= 50:
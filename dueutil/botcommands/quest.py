@@ -2,6 +2,7 @@ import discord
 import math
 import random
 import time
+from collections import namedtuple
 
 import generalconfig as gconf
 from .. import commands, util
@@ -44,7 +45,7 @@ async def spawnquest(ctx, *args, **details):
         active_quest = await quests.ActiveQuest.create(quest.q_id, player)
         if len(args) == 3:
             active_quest.level = args[2]
-            await active_quest._calculate_stats()
+            active_quest._calculate_stats()
         player.save()
         await util.reply(ctx,
                          ":cloud_lightning: Spawned **" + quest.name_clean + "** [Level " + str(
@@ -60,12 +61,19 @@ async def questinfo(ctx, quest_index, **details):
     [CMD_KEY]questinfo index
     
     Shows a simple stats page for the quest
+    (and your odds of beating it)
     """
 
     player = details["author"]
     quest_index -= 1
     if 0 <= quest_index < len(player.quests):
-        await imagehelper.quest_screen(ctx, player.quests[quest_index])
+        quest = player.quests[quest_index]
+        odds = battles.battle_odds(player, quest, reward=quest.money, risk=quest.money // 2)
+        await imagehelper.quest_screen(ctx, quest,
+                                       content=(":pen_fountain: Here you go. You have a "
+                                                + battles.describe_odds(odds) + "\nExpected reward: ``"
+                                                + util.format_number(odds.reward, full_precision=True, money=True)
+                                                + "``"))
     else:
         raise util.BattleBananaException(ctx.channel, "Quest not found!")
 
@@ -87,51 +95,30 @@ async def myquests(ctx, page=1, **details):
     await imagehelper.quests_screen(ctx, player, page)
 
 
-@commands.command(args_pattern='C', aliases=['aq'])
-@commands.imagecommand()
-async def acceptquest(ctx, quest_index, **details):
-    """
-    [CMD_KEY]acceptquest (quest number)
+_QuestResult = namedtuple("QuestResult", ["winner", "money", "attack", "strg", "accy", "exp"])
 
-    You know what to do. Spam ``[CMD_KEY]acceptquest 1``!
-    """
 
-    player = details["author"]
-    quest_index -= 1
-    if quest_index >= len(player.quests):
-        raise util.BattleBananaException(ctx.channel, "Quest not found!")
-    if player.money - player.quests[quest_index].money // 2 < 0:
-        raise util.BattleBananaException(ctx.channel, "You can't afford the risk!")
-    if player.quests_completed_today >= quests.MAX_DAILY_QUESTS:
-        raise util.BattleBananaException(ctx.channel,
-                                         "You can't do more than " + str(quests.MAX_DAILY_QUESTS) + " quests a day!")
+def _resolve_quest(player, quest, turns, winner):
+    """
+    Gives the player the rewards (or losses) of a quest battle.
+    Nothing is saved or sent here so acceptallquests can do many at once.
+    """
 
-    quest = player.quests.pop(quest_index)
-    battle_log = battles.get_battle_log(player_one=player, player_two=quest, p2_prefix="the ")
-    battle_embed = battle_log.embed
-    turns = battle_log.turn_count
-    winner = battle_log.winner
     stats.increment_stat(stats.Stat.QUESTS_ATTEMPTED)
     # Not really an average (but w/e)
     average_quest_battle_turns = player.misc_stats["average_quest_battle_turns"] = (player.misc_stats[
                                                                                         "average_quest_battle_turns"] + turns) / 2
     if winner == quest:
-        quest_results = (":skull: **" + player.name_clean + "** lost to the **" + quest.name_clean + "** and dropped ``"
-                         + util.format_number(quest.money // 2, full_precision=True, money=True) + "``")
         player.money -= quest.money // 2
         player.quest_spawn_build_up += 0.1
         player.misc_stats["quest_losing_streak"] += 1
-        if player.misc_stats["quest_losing_streak"] == 10:
-            await awards.give_award(ctx.channel, player, "QuestLoser")
+        return _QuestResult(winner=quest, money=-(quest.money // 2), attack=0, strg=0, accy=0, exp=0)
     elif winner == player:
         if player.quest_day_start == 0:
             player.quest_day_start = time.time()
         player.quests_completed_today += 1
         player.quests_won += 1
 
-        reward = (
-                ":sparkles: **" + player.name_clean + "** defeated the **" + quest.name + "** and was rewarded with ``"
-                + util.format_number(quest.money, full_precision=True, money=True) + "`` ")
         quest_scale = quest.get_quest_scale()
         avg_player_stat = player.get_avg_stat()
 
@@ -150,14 +137,10 @@ async def acceptquest(ctx, quest_index, **details):
         add_attack = min(attr_gain(quest.attack), min(add_strg * 3 * random.uniform(0.6, 1.5), max_stats_gain))
         add_accy = min(attr_gain(quest.accy), min(add_strg * 3 * random.uniform(0.6, 1.5), max_stats_gain))
 
-        stats_reward = players.STAT_GAIN_FORMAT % (add_attack, add_strg, add_accy)
-        quest_results = reward + stats_reward
-
-        prevExp = player.total_exp
+        prev_exp = player.total_exp
         player.progress(add_attack, add_strg, add_accy, max_attr=max_stats_gain,
                         max_exp=10000 * player.prestige_multiplicator())
-        expGain = player.total_exp - prevExp
-        quest_results = (reward + "and `" + str(round(expGain)) + "` EXP\n" + stats_reward)
+        exp_gain = player.total_exp - prev_exp
 
         player.money += quest.money
         stats.increment_stat(stats.Stat.MONEY_CREATED, quest.money)
@@ -166,145 +149,130 @@ async def acceptquest(ctx, quest_index, **details):
         if quest_info is not None:
             quest_info.times_beaten += 1
             quest_info.save()
-        await game.check_for_level_up(ctx, player)
         player.misc_stats["quest_losing_streak"] = 0
+        return _QuestResult(winner=player, money=quest.money,
+                            attack=add_attack, strg=add_strg, accy=add_accy, exp=exp_gain)
+    return _QuestResult(winner=None, money=0, attack=0, strg=0, accy=0, exp=0)
+
+
+@commands.command(args_pattern='C', aliases=['aq'])
+@commands.imagecommand()
+async def acceptquest(ctx, quest_index, **details):
+    """
+    [CMD_KEY]acceptquest (quest number)
+
+    You know what to do. Spam ``[CMD_KEY]acceptquest 1``!
+    """
+
+    player = details["author"]
+    quest_index -= 1
+    if quest_index >= len(player.quests):
+        raise util.BattleBananaException(ctx.channel, "Quest not found!")
+    if player.money - player.quests[quest_index].money // 2 < 0:
+        raise util.BattleBananaException(ctx.channel, "You can't afford the risk!")
+    if player.quests_completed_today >= quests.MAX_DAILY_QUESTS:
+        raise util.BattleBananaException(ctx.channel,
+                                         "You can't do more than " + str(quests.MAX_DAILY_QUESTS) + " quests a day!")
+
+    quest = player.quests.pop(quest_index)
+    battle_log = battles.get_battle_log(player_one=player, player_two=quest, p2_prefix="the ")
+    battle_embed = battle_log.embed
+    result = _resolve_quest(player, quest, battle_log.turn_count, battle_log.winner)
+    if result.winner == quest:
+        quest_results = (":skull: **" + player.name_clean + "** lost to the **" + quest.name_clean + "** and dropped ``"
+                         + util.format_number(quest.money // 2, full_precision=True, money=True) + "``")
+        if player.misc_stats["quest_losing_streak"] == 10:
+            await awards.give_award(ctx.channel, player, "QuestLoser")
+    elif result.winner == player:
+        reward = (
+                ":sparkles: **" + player.name_clean + "** defeated the **" + quest.name + "** and was rewarded with ``"
+                + util.format_number(quest.money, full_precision=True, money=True) + "`` ")
+        stats_reward = players.STAT_GAIN_FORMAT % (result.attack, result.strg, result.accy)
+        quest_results = (reward + "and `" + str(round(result.exp)) + "` EXP\n" + stats_reward)
+        await game.check_for_level_up(ctx, player)
     else:
         quest_results = ":question: Against all you drew with the quest!"
     battle_embed.add_field(name="Quest results", value=quest_results, inline=False)
     await imagehelper.battle_screen(ctx, player, quest)
     await util.say(ctx.channel, embed=battle_embed)
     # Put this here to avoid 'spoiling' results before battle log
-    if winner == player:
+    if result.winner == player:
         await awards.give_award(ctx.channel, player, "QuestDone", "*Saved* the guild!")
-    elif winner == quest:
+    elif result.winner == quest:
         await awards.give_award(ctx.channel, player, "RedMist", "Red mist...")
     else:
         await awards.give_award(ctx.channel, player, "InconceivableQuest")
     player.save()
 
 
-# @commands.command(args_pattern=None, aliases=['aaq'])
-# @commands.imagecommand()
-# async def acceptallquests(ctx, **details):
-#    """
-#    [CMD_KEY]acceptallquests
-#
-#    acceptquest, but without the spamming!
-#    """
-#
-#    if not player.donor:
-#        raise util.BattleBananaException(ctx.channel, "This command is for donors only!")
-#
-#    player = details["author"]
-#
-#    if 0 >= len(player.quests):
-#        raise util.BattleBananaException(ctx.channel, "You have no quests!")
-#    a = 0
-#    #while a < len(player.quests):
-#    #    if player.money - player.quests[a].money // 2 < 0:
-#    #        raise util.BattleBananaException(ctx.channel, "You can't afford the risk of doing all of your quests!")
-#    #    a +=1
-#    #if player.quests_completed_today >= quests.MAX_DAILY_QUESTS:
-#    #    raise util.BattleBananaException(ctx.channel,
-#    #                                "You can't do more than " + str(quests.MAX_DAILY_QUESTS) + " quests a day!")
-#    
-#    totalCash = 0
-#    totalXp = 0
-#    totalAttack = 0
-#    totalStrength = 0
-#    totalAccuracy = 0
-#    totalTurns = 0
-#    wins = 0
-#    lose = 0
-#    draw = 0
-#    b = 0
-#    quests = len(player.quests)
-#    while b < quests:
-#        quest = player.quests.pop(b)
-#        battle_log = battles.get_battle_log(player_one=player, player_two=quest, p2_prefix="the ")
-#        turns = battle_log.turn_count
-#        winner = battle_log.winner
-#        stats.increment_stat(stats.Stat.QUESTS_ATTEMPTED)
-#        # Not really an average (but w/e)
-#        average_quest_battle_turns = player.misc_stats["average_quest_battle_turns"] = (player.misc_stats[
-#                                                                                            "average_quest_battle_turns"] + turns) / 2
-#        if winner == quest:
-#            lose += 1
-#            totalCash -= quest.money // 2
-#            player.quest_spawn_build_up += 0.1
-#            player.misc_stats["quest_losing_streak"] += 1
-#            if player.misc_stats["quest_losing_streak"] == 10:
-#                await awards.give_award(ctx.channel, player, "QuestLoser")
-#        elif winner == player:
-#            wins += 1
-#            if player.quest_day_start == 0:
-#                player.quest_day_start = time.time()
-#            player.quests_completed_today += 1
-#            player.quests_won += 1
-#            totalCash += quest.money
-#            quest_scale = quest.get_quest_scale()
-#            avg_player_stat = player.get_avg_stat()
-#
-#            def attr_gain(stat):
-#                return (max(0.01, (stat / avg_player_stat)
-#                            * quest.level * (turns / average_quest_battle_turns) / 2 * (quest_scale + 0.5) * 3))
-#
-#            # Put some random in the prestige gain so its not a raw 20 * prestige
-#            max_stats_gain = 100 * player.prestige_multiplicator()
-#            if player.donor:
-#                max_stats_gain *= 1.5
-#
-#            add_strg = min(attr_gain(quest.strg), max_stats_gain)
-#            add_attack = min(attr_gain(quest.attack), min(add_strg * 3 * random.uniform(0.6, 1.5), max_stats_gain))
-#            add_accy = min(attr_gain(quest.accy), min(add_strg * 3 * random.uniform(0.6, 1.5), max_stats_gain))
-#
-#            prevExp = player.total_exp 
-#            player.progress(add_attack, add_strg, add_accy, max_attr=max_stats_gain, max_exp=10000 * player.prestige_multiplicator())
-#            expGain = player.total_exp - prevExp
-#
-#            totalXp += expGain
-#            totalAccuracy += add_accy
-#            totalAttack += add_attack
-#            totalStrength += add_strg
-#            # that's the wrong way to calculate total turns
-#            totalTurns += average_quest_battle_turns
-#
-#            stats.increment_stat(stats.Stat.MONEY_CREATED, quest.money)
-#
-#            quest_info = quest.info
-#            if quest_info is not None:
-#                quest_info.times_beaten += 1
-#                quest_info.save()
-#            await game.check_for_level_up(ctx, player)
-#            player.misc_stats["quest_losing_streak"] = 0
-#        else:
-#            draw += 1
-#        quests -=1
-#
-#    if draw > 0:
-#        drawQuest = ("\nDraw: " + draw)
-#    else:
-#        drawQuest = ""
-#    
-#    player.money += totalCash
-#    
-#    battle_embed = discord.Embed(title=("Battle Results"), type="rich", color=gconf.DUE_COLOUR)
-#    battle_embed.add_field(name="Quests Fought", value=("Total quests: "+str(int(wins+lose))+"\nWon: " +str(wins)+"\nLost "+str(lose)+drawQuest))
-#    battle_embed.add_field(name="Stat gains", value=("Added Cash: `¤"+str(totalCash)+"`\nAdded EXP: `"+str(round(totalXp))+"`\n"+emojis.ATK+": "+str(totalAttack)+"\n"+emojis.ACCY+": "+str(totalAccuracy)+"\n"+emojis.STRG+": "+str(totalStrength)))
-#    # totalTurns is wrong with the implementation of adding the averages
-#    #    battle_embed.add_field(name="Total turns", value=(str(round(totalTurns))))
-#    battle_embed.set_footer(text="If the added money is negative, then you lost more money from losing battles than you gained from winning them.")
-#    
-#    await util.reply(ctx, embed=battle_embed)
-#
-#    if wins > 0:
-#        await awards.give_award(ctx.channel, player, "QuestDone", "*Saved* the guild!")
-#    elif lose > 0:
-#        await awards.give_award(ctx.channel, player, "RedMist", "Red mist...")
-#    elif draw > 0:
-#        await awards.give_award(ctx.channel, player, "InconceivableQuest")
-#
-#    player.save()
+@commands.command(args_pattern=None, aliases=['aaq'])
+async def acceptallquests(ctx, **details):
+    """
+    [CMD_KEY]acceptallquests
+
+    acceptquest, but without the spamming!
+    Fights your quests in order until you run out,
+    can't afford the risk or hit the daily limit
+    (so at most the max number of active quests).
+    """
+
+    player = details["author"]
+    if len(player.quests) == 0:
+        raise util.BattleBananaException(ctx.channel, "You have no quests!")
+    if player.quests_completed_today >= quests.MAX_DAILY_QUESTS:
+        raise util.BattleBananaException(ctx.channel,
+                                         "You can't do more than " + str(quests.MAX_DAILY_QUESTS) + " quests a day!")
+
+    results = []
+    quest_loser = False
+    level_up_reward = 0
+    while (len(player.quests) > 0 and player.quests_completed_today < quests.MAX_DAILY_QUESTS
+           and player.money - player.quests[0].money // 2 >= 0):
+        quest = player.quests.pop(0)
+        # No need for the log embed (only the result is shown)
+        battle_result = battles.battle(player_one=player, player_two=quest, p2_prefix="the ")
+        result = _resolve_quest(player, quest, battle_result.turn_count, battle_result.winner)
+        quest_loser |= result.winner == quest and player.misc_stats["quest_losing_streak"] == 10
+        if result.winner == player:
+            # Level up now (like acceptquest) so the next quest is fought at the new level
+            level_up_reward += game.level_up(player)
+        results.append(result)
+    if len(results) == 0:
+        raise util.BattleBananaException(ctx.channel, "You can't afford the risk!")
+
+    wins = sum(1 for result in results if result.winner == player)
+    draws = sum(1 for result in results if result.winner is None)
+    losses = len(results) - wins - draws
+    money = sum(result.money for result in results)
+
+    quests_fought = ("Total quests: %d\nWon: %d\nLost: %d" % (len(results), wins, losses)
+                     + ("\nDrew: %d" % draws if draws > 0 else ""))
+    if len(player.quests) > 0:
+        quests_fought += "\nNot fought: %d" % len(player.quests)
+    stats_reward = players.STAT_GAIN_FORMAT % (sum(result.attack for result in results),
+                                               sum(result.strg for result in results),
+                                               sum(result.accy for result in results))
+    battle_embed = discord.Embed(title="%s Quest results" % e.QUEST, type="rich", color=gconf.DUE_COLOUR)
+    battle_embed.add_field(name="Quests fought", value=quests_fought, inline=False)
+    battle_embed.add_field(name="Rewards",
+                           value=("Money: ``" + ("-" if money < 0 else "")
+                                  + util.format_number(abs(money), full_precision=True, money=True) + "``\n"
+                                  + "EXP: ``" + str(round(sum(result.exp for result in results))) + "``\n"
+                                  + stats_reward), inline=False)
+    battle_embed.set_footer(text="If the money is negative, you lost more from losing quests than you won.")
+    await util.reply(ctx, embed=battle_embed)
+
+    # Just one level up image (for all the quests) after the results
+    await game.send_level_up(ctx, player, level_up_reward)
+    if quest_loser:
+        await awards.give_award(ctx.channel, player, "QuestLoser")
+    if wins > 0:
+        await awards.give_award(ctx.channel, player, "QuestDone", "*Saved* the guild!")
+    if losses > 0:
+        await awards.give_award(ctx.channel, player, "RedMist", "Red mist...")
+    if draws > 0:
+        await awards.give_award(ctx.channel, player, "InconceivableQuest")
+    player.save()
 
 
 @commands.command(args_pattern='C', aliases=["dq"])
@@ -511,7 +479,7 @@ async def removequest(ctx, quest_name, **_):
     if quest is None:
         raise util.BattleBananaException(ctx.channel, "Quest not found!")
 
-    quests.remove_quest_from_server(ctx.guild, quest_name)
+    await quests.remove_quest_from_server(ctx.guild, quest_name)
     await util.reply(ctx, ":white_check_mark: **" + quest.name_clean + "** is no more!")
 
 
@@ -525,7 +493,7 @@ async def resetquests(ctx, **_):
     This command will **delete all quests** on your guild.
     """
 
-    quests_deleted = quests.remove_all_quests(ctx.guild)
+    quests_deleted = await quests.remove_all_quests(ctx.guild)
     if quests_deleted > 0:
         await util.reply(ctx, ":wastebasket: Your quests have been reset—**%d %s** deleted."
                          % (quests_deleted, util.s_suffix("quest", quests_deleted)))
@@ -1,8 +1,7 @@
 import discord
-import jsonpickle
 
 import generalconfig as gconf
-from .. import commands, util, dbconn
+from .. import asyncdb, commands, util, dbconn
 from ..game import players, teams
 
 
@@ -28,7 +27,7 @@ async def createteam(ctx, name, description="This is a new and awesome team!", i
         raise util.BattleBananaException(ctx.channel, "Description must not exceed 1024 characters!")
     if name != util.filter_string(name):
         raise util.BattleBananaException(ctx.channel, "Invalid team name!")
-    if teams.find_team(name.lower()):
+    if await teams.fetch_team(name.lower()):
         raise util.BattleBananaException(ctx.channel, "That team already exists!")
     if level < 1:
         raise util.BattleBananaException(ctx.channel, "Minimum level cannot be under 1!")
@@ -50,7 +49,7 @@ async def deleteteam(ctx, **details):
     if member.team is None:
         raise util.BattleBananaException(ctx.channel, "You're not in a team!")
 
-    team = teams.find_team(member.team)
+    team = await teams.fetch_team(member.team)
     if team is None:
         member.team = None
 
@@ -58,7 +57,7 @@ async def deleteteam(ctx, **details):
         raise util.BattleBananaException(ctx.channel, "You need to be the owner to delete the team!")
 
     name = team.name
-    team.Delete()
+    await team.Delete()
 
     await util.reply(ctx, "**%s** successfully deleted!" % (name))
 
@@ -82,7 +81,7 @@ async def teaminvite(ctx, member, **details):
     if member.team != None:
         raise util.BattleBananaException(ctx.channel, "This player is already in a team!")
 
-    team = teams.find_team(inviter.team)
+    team = await teams.fetch_team(inviter.team)
     if team is None:
         inviter.team = None
         raise util.BattleBananaException(ctx.channel, "You are not a part of a team!")
@@ -114,12 +113,12 @@ async def showinvites(ctx, **details):
         Embed.add_field(name="No invites!", value="You do not have invites!")
     else:
         for id in member.team_invites:
-            team = teams.find_team(id)
+            team = await teams.fetch_team(id)
             if team:
-                owner = players.find_player(team.owner)
+                owner = await players.fetch_player(team.owner)
                 Embed.add_field(name=team.name,
                                 value="**Owner:** %s (%s)\n**Average level:** %s\n**Members:** %s\n**Required Level:** %s\n**Recruiting:** %s"
-                                      % (owner.name, owner.id, team.avgLevel, len(team.members), team.level,
+                                      % (owner.name, owner.id, await team.avgLevel(), len(team.members), team.level,
                                          ("Yes" if team.open else "No")),
                                 inline=False)
             else:
@@ -183,7 +182,7 @@ async def myteam(ctx, **details):
 
     member = details["author"]
 
-    team = teams.find_team(member.team)
+    team = await teams.fetch_team(member.team)
     if team is None:
         member.team = None
     if member.team is None:
@@ -196,21 +195,21 @@ async def myteam(ctx, **details):
     admins = ""
     for id in team.admins:
         if id != team.owner:
-            admins += "%s (%s)\n" % (players.find_player(id).name, str(id))
+            admins += "%s (%s)\n" % ((await players.fetch_player(id)).name, str(id))
     for id in team.members:
         if id not in team.admins and id != team.owner:
-            members += "%s (%s)\n" % (players.find_player(id).name, str(id))
+            members += "%s (%s)\n" % ((await players.fetch_player(id)).name, str(id))
     for id in team.pendings:
         if id in team.members:
             team.pendings.remove(id)
         else:
-            pendings += "%s (%s)\n" % (players.find_player(id).name, str(id))
+            pendings += "%s (%s)\n" % ((await players.fetch_player(id)).name, str(id))
 
     team_embed.add_field(name="Name", value=team.name, inline=False)
     team_embed.add_field(name="Description", value=team.description, inline=False)
-    team_embed.add_field(name="Owner", value="%s (%s)" % (players.find_player(team.owner), team.owner), inline=False)
+    team_embed.add_field(name="Owner", value="%s (%s)" % (await players.fetch_player(team.owner), team.owner), inline=False)
     team_embed.add_field(name="Member Count", value=len(team.members), inline=False)
-    team_embed.add_field(name="Average level", value=team.avgLevel, inline=False)
+    team_embed.add_field(name="Average level", value=await team.avgLevel(), inline=False)
     team_embed.add_field(name="Required level", value=team.level, inline=False)
     team_embed.add_field(name="Recruiting", value="Yes" if team.open else "No", inline=False)
 
@@ -253,7 +252,7 @@ async def promoteuser(ctx, user, **details):
     if member.team != user.team:
         raise util.BattleBananaException(ctx.channel, "This player is not in your team!")
 
-    team = teams.find_team(member.team)
+    team = await teams.fetch_team(member.team)
     if team is None:
         member.team = None
         raise util.BattleBananaException(ctx.channel, "You are not in a team!")
@@ -286,7 +285,7 @@ async def demoteuser(ctx, user, **details):
     if member.team is None:
         raise util.BattleBananaException(ctx.channel, "You are not in a team!")
 
-    team = teams.find_team(member.team)
+    team = await teams.fetch_team(member.team)
     if team is None:
         member.team = None
         raise util.BattleBananaException(ctx.channel, "You are not in a team!")
@@ -325,7 +324,7 @@ async def teamkick(ctx, user, **details):
     if member.team != user.team:
         raise util.BattleBananaException(ctx.channel, "This player is not in your team!")
 
-    team = teams.find_team(member.team)
+    team = await teams.fetch_team(member.team)
     if team is None:
         member.team = None
         raise util.BattleBananaException(ctx.channel, "You are not in a team!")
@@ -353,7 +352,7 @@ async def leaveteam(ctx, **details):
     """
     member = details["author"]
 
-    team = teams.find_team(member.team)
+    team = await teams.fetch_team(member.team)
     if team is None:
         member.team = None
     if member.team is None:
@@ -388,7 +387,7 @@ async def showteams(ctx, page=1, **details):
     teamsEmbed = discord.Embed(title="There is the teams lists", description="Display all existant teams", type="rich",
                                colour=gconf.DUE_COLOUR)
 
-    db_teams = list(dbconn.get_collection_for_object(teams.Team).find())
+    db_teams = await asyncdb.get_collection_for_object(teams.Team).find()
     top = (page * page_size + page_size)
     if page != 0 and page * 5 >= len(db_teams):
         raise util.BattleBananaException(ctx.channel, "Page not found")
@@ -396,17 +395,16 @@ async def showteams(ctx, page=1, **details):
     limit = top if top < len(db_teams) else len(db_teams)
     for index in range(page * page_size, limit, 1):
         # TODO: Make this team loading more efficient
-        loaded_team = jsonpickle.decode(db_teams[index - 1]["data"])
-        if loaded_team.id in teams.teams:
-            team = teams.teams[loaded_team.id]
-        else:
+        team = teams.teams.get(db_teams[index - 1]["_id"])
+        if team is None:
+            loaded_team = dbconn.load_object(db_teams[index - 1], teams.Team)
             teams.teams[loaded_team.id] = util.load_and_update(teams.REFERENCE_TEAM, loaded_team)
             team = teams.teams[loaded_team.id]
         try:
-            owner = players.find_player(team.owner)
+            owner = await players.fetch_player(team.owner)
             teamsEmbed.add_field(name=team.name,
                                  value="Owner: **%s** (%s)\nDescription: **%s**\nMembers: **%s**\nAverage Level: **%s**\nRequired Level: **%s**\nRecruiting: **%s**" % (
-                                     owner.name, owner.id, team.description, len(team.members), team.avgLevel,
+                                     owner.name, owner.id, team.description, len(team.members), await team.avgLevel(),
                                      team.level,
                                      ("Yes" if team.open else "No")), inline=False)
         except:
@@ -433,22 +431,22 @@ async def showteaminfo(ctx, team, **_):
     admins = ""
     for id in team.admins:
         if id != team.owner:
-            admins += "%s (%s)\n" % (players.find_player(id).name, str(id))
+            admins += "%s (%s)\n" % ((await players.fetch_player(id)).name, str(id))
     for id in team.members:
         if id not in team.admins and id != team.owner:
-            members += "%s (%s)\n" % (players.find_player(id).name, str(id))
+            members += "%s (%s)\n" % ((await players.fetch_player(id)).name, str(id))
     for id in team.pendings:
         if id in team.members:
             team.pendings.remove(id)
         else:
-            pendings += "%s (%s)\n" % (players.find_player(id).name, str(id))
+            pendings += "%s (%s)\n" % ((await players.fetch_player(id)).name, str(id))
 
     team_embed.add_field(name="Name", value=team.name, inline=False)
     team_embed.add_field(name="Description", value=team.description, inline=False)
-    team_embed.add_field(name="Owner", value="%s (%s)" % (players.find_player(team.owner).name, team.owner),
+    team_embed.add_field(name="Owner", value="%s (%s)" % ((await players.fetch_player(team.owner)).name, team.owner),
                          inline=False)
     team_embed.add_field(name="Member Count", value=len(team.members), inline=False)
-    team_embed.add_field(name="Average level", value=team.avgLevel, inline=False)
+    team_embed.add_field(name="Average level", value=await team.avgLevel(), inline=False)
     team_embed.add_field(name="Required level", value=team.level, inline=False)
     team_embed.add_field(name="Recruiting", value="Yes" if team.open else "No", inline=False)
 
@@ -513,7 +511,7 @@ async def editteam(ctx, updates, **details):
 
     member = details["author"]
 
-    team = teams.find_team(member.team)
+    team = await teams.fetch_team(member.team)
     if team is None:
         member.team = None
     if member.team is None:
@@ -560,7 +558,7 @@ async def showteampendings(ctx, page=1, **details):
     member = details["author"]
     page_size = 10
     page = page - 1
-    team = teams.find_team(member.team)
+    team = await teams.fetch_team(member.team)
     if page < 0:
         raise util.BattleBananaException(ctx.channel, "Page not found!")
     if team is None:
@@ -578,7 +576,7 @@ async def showteampendings(ctx, page=1, **details):
                                    colour=gconf.DUE_COLOUR)
     for index in range((page_size * page), top, 1):
         id = team.pendings[index]
-        member = players.find_player(id)
+        member = await players.fetch_player(id)
         pendings_embed.add_field(name=index, value="%s (%s)" % (member.name, member.id), inline=False)
 
     if len(pendings_embed.fields) == 0:
@@ -600,7 +598,7 @@ async def acceptpending(ctx, user, **details):
 
     member = details["author"]
 
-    team = teams.find_team(member.team)
+    team = await teams.fetch_team(member.team)
     if team is None:
         member.team = None
     if member.team is None:
@@ -624,7 +622,7 @@ async def declinepending(ctx, user, **details):
 
     member = details["author"]
 
-    team = teams.find_team(member.team)
+    team = await teams.fetch_team(member.team)
     if team is None:
         member.team = None
     if member.team is None:
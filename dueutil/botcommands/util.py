@@ -174,7 +174,7 @@ async def botstats(ctx, **_):
     BattleBanana's stats since the dawn of time!
     """
 
-    game_stats = stats.get_stats()
+    game_stats = await stats.get_stats()
     stats_embed = discord.Embed(title="BattleBanana's Statistics!", type="rich", color=gconf.DUE_COLOUR)
 
     stats_embed.description = ("The numbers and stuff of BattleBanana right now!\n"
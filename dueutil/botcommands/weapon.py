@@ -166,10 +166,12 @@ async def wagerbattle(ctx, receiver, money, **details):
                                          "**%s** wager inbox is full!" % receiver.get_name_possession_clean())
 
     battles.BattleRequest(sender, receiver, money)
+    odds = battles.battle_odds(sender, receiver)
 
     await util.reply(ctx, ("**" + sender.name_clean + "** wagers **" + receiver.name_clean + "** ``"
                            + util.format_number(money, full_precision=True,
-                                                money=True) + "`` that they will win in a battle!"))
+                                                money=True) + "`` that they will win in a battle!\n"
+                           + "They have a " + battles.describe_odds(odds)))
 
 
 @commands.command(args_pattern='C?', aliases=["vw"])
@@ -182,13 +184,19 @@ async def mywagers(ctx, page=1, **details):
 
     @misc.paginator
     def wager_page(wagers_embed, current_wager, **extras):
-        sender = players.find_player(current_wager.sender_id)
+        sender = senders.get(current_wager.sender_id)
         if not sender:
             return
+        odds = battles.battle_odds(player, sender)
         wagers_embed.add_field(name="%d. Request from %s" % (extras["index"] + 1, sender.name_clean),
-                               value="<@%s> ``%s``" % (sender.id, util.format_money(current_wager.wager_amount)))
+                               value="<@%s> ``%s``\nYou have a %s" % (sender.id,
+                                                                       util.format_money(current_wager.wager_amount),
+                                                                       battles.describe_odds(odds)))
 
     player = details["author"]
+    # Senders on this page (loaded here as the paginator can't await)
+    page_wagers = player.received_wagers[(page - 1) * misc.PAGE_SIZE:page * misc.PAGE_SIZE]
+    senders = {wager.sender_id: await players.fetch_player(wager.sender_id) for wager in page_wagers}
     wager_list_embed = wager_page(player.received_wagers, page - 1,
                                   title=player.get_name_possession_clean() + " Received Wagers",
                                   footer_more="But wait there's more! Do %smywagers %d" % (
@@ -224,7 +232,7 @@ async def acceptwager(ctx, wager_index, **details):
         raise util.BattleBananaException(ctx.channel, "You can't afford the risk!")
 
     wager = player.received_wagers.pop(wager_index)
-    sender = players.find_player(wager.sender_id)
+    sender = await players.fetch_player(wager.sender_id)
     if not sender:
         raise util.BattleBananaException(ctx.channel, "Play no longer exists!")
     battle_log = battles.get_battle_log(player_one=player, player_two=sender)
@@ -314,7 +322,7 @@ async def declinewager(ctx, wager_index, **details):
         wager = player.received_wagers[wager_index]
         del player.received_wagers[wager_index]
         player.save()
-        sender = players.find_player(wager.sender_id)
+        sender = await players.fetch_player(wager.sender_id)
         await util.reply(ctx, "**" + player.name_clean + "** declined a wager from **" + sender.name_clean + "**")
 
     else:
@@ -434,7 +442,7 @@ async def removeweapon(ctx, weapon_name, **_):
         raise util.BattleBananaException(ctx.channel, "Weapon not found")
     if weapon.id != weapons.NO_WEAPON_ID and weapons.stock_weapon(weapon_name) != weapons.NO_WEAPON_ID:
         raise util.BattleBananaException(ctx.channel, "You can't remove stock weapons!")
-    weapons.remove_weapon_from_shop(ctx.guild, weapon_name)
+    await weapons.remove_weapon_from_shop(ctx.guild, weapon_name)
     await util.reply(ctx, "**" + weapon.name_clean + "** has been removed from the shop!")
 
 
@@ -448,7 +456,7 @@ async def resetweapons(ctx, **_):
     This command **deletes all weapons** on your guild.
     """
 
-    weapons_deleted = weapons.remove_all_weapons(ctx.guild)
+    weapons_deleted = await weapons.remove_all_weapons(ctx.guild)
     if weapons_deleted > 0:
         await util.reply(ctx, ":wastebasket: Your weapon shop has been reset—**%d %s** deleted."
                          % (weapons_deleted, util.s_suffix("weapon", weapons_deleted)))
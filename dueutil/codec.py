@@ -0,0 +1,150 @@
+import jsonpickle
+from collections import namedtuple
+
+"""
+A versioned BSON document codec for BattleBanana objects.
+
+Registered classes are stored with each slot as a real document field
+(so Mongo can index & project them) rather than one jsonpickle string.
+Objects inside registered objects (e.g. a player's quests) are stored
+as sub-documents tagged with their class name.
+"""
+
+VERSION_FIELD = "_v"
+CLASS_FIELD = "_class"
+# BSON ints are 64 bit. Python ints are not.
+BIG_INT_FIELD = "_bigint"
+# Last resort for values the codec does not know about.
+PICKLE_FIELD = "_pickle"
+RESERVED_FIELDS = ("_id", VERSION_FIELD, CLASS_FIELD)
+MAX_BSON_INT = 2 ** 63 - 1
+
+_Codec = namedtuple("Codec", ["object_class", "version", "migrations"])
+codecs = dict()
+
+
+def register(object_class, version=1, migrations=None):
+    """
+    Registers a class with the codec.
+
+    migrations is a dict of version -> function that takes the state of
+    that version and returns the state for the next version.
+    """
+    codecs[object_class.__name__] = _Codec(object_class, version, migrations or {})
+    return object_class
+
+
+def can_encode(bot_object):
+    return type(bot_object).__name__ in codecs
+
+
+def encode(bot_object) -> dict:
+    """
+    Encodes a registered object as a document (without an _id)
+    """
+    document = {slot: _encode_value(value) for slot, value in _get_state(bot_object).items()}
+    document[VERSION_FIELD] = codecs[type(bot_object).__name__].version
+    return document
+
+
+def decode(document: dict, object_class=None):
+    """
+    Decodes a document made by encode. Older versions are migrated.
+    """
+    codec = codecs[document.get(CLASS_FIELD, object_class.__name__ if object_class is not None else None)]
+    state = {field: _decode_value(value) for field, value in document.items() if field not in RESERVED_FIELDS}
+    for version in range(document.get(VERSION_FIELD, 1), codec.version):
+        state = codec.migrations[version](state)
+    bot_object = codec.object_class.__new__(codec.object_class)
+    _set_state(bot_object, state)
+    return bot_object
+
+
+def delta(old_document: dict, new_document: dict) -> dict:
+    """
+    Returns a Mongo update with only the fields that differ between
+    two encoded documents. Ints are sent as $inc so concurrent
+    changes to (e.g.) money are not lost. Changes within dicts
+    (like misc_stats) use dotted fields.
+    """
+    set_fields, increment_fields, unset_fields = dict(), dict(), dict()
+    _delta(old_document, new_document, "", set_fields, increment_fields, unset_fields)
+
+    update = dict()
+    if len(set_fields) > 0:
+        update["$set"] = set_fields
+    if len(increment_fields) > 0:
+        update["$inc"] = increment_fields
+    if len(unset_fields) > 0:
+        update["$unset"] = unset_fields
+    return update
+
+
+def _delta(old_document, new_document, prefix, set_fields, increment_fields, unset_fields):
+    for field, value in new_document.items():
+        old_value = old_document.get(field)
+        # Type check as True == 1 & 1 == 1.0
+        if field in old_document and type(old_value) is type(value) and old_value == value:
+            continue
+        if type(value) is int and type(old_value) is int:
+            increment_fields[prefix + field] = value - old_value
+        elif (isinstance(value, dict) and isinstance(old_value, dict)
+              and _dotted_keys(value) and _dotted_keys(old_value)):
+            _delta(old_value, value, prefix + field + ".", set_fields, increment_fields, unset_fields)
+        else:
+            set_fields[prefix + field] = value
+    for field in old_document:
+        if field not in new_document:
+            unset_fields[prefix + field] = ""
+
+
+def _dotted_keys(document):
+    return all(len(key) > 0 and "." not in key and not key.startswith("$") for key in document)
+
+
+def _get_state(bot_object):
+    state = bot_object.__getstate__()
+    if isinstance(state, tuple):
+        # Default state of a class with __slots__ -> (dict state, slot state)
+        state = dict(state[0] or {}, **state[1])
+    return state
+
+
+def _set_state(bot_object, state):
+    if hasattr(bot_object, "__setstate__"):
+        bot_object.__setstate__(state)
+    else:
+        for slot, value in state.items():
+            setattr(bot_object, slot, value)
+
+
+def _encode_value(value):
+    if value is None or isinstance(value, (bool, float, str)):
+        return value
+    elif isinstance(value, int):
+        if abs(value) > MAX_BSON_INT:
+            return {BIG_INT_FIELD: str(value)}
+        return value
+    elif isinstance(value, dict):
+        return {str(key): _encode_value(item) for key, item in value.items()}
+    elif isinstance(value, (list, tuple, set)):
+        return [_encode_value(item) for item in value]
+    elif can_encode(value):
+        document = encode(value)
+        document[CLASS_FIELD] = type(value).__name__
+        return document
+    return {PICKLE_FIELD: jsonpickle.encode(value)}
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if CLASS_FIELD in value:
+            return decode(value)
+        elif BIG_INT_FIELD in value:
+            return int(value[BIG_INT_FIELD])
+        elif PICKLE_FIELD in value:
+            return jsonpickle.decode(value[PICKLE_FIELD])
+        return {key: _decode_value(item) for key, item in value.items()}
+    elif isinstance(value, list):
+        return [_decode_value(item) for item in value]
+    return value
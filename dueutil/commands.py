@@ -1,6 +1,7 @@
 import asyncio
+import re
 import time
-from functools import wraps
+from functools import lru_cache, wraps
 
 from dueutil.game import stats
 from . import commandextras
@@ -12,6 +13,12 @@ from .permissions import Permission
 
 extras = commandextras
 IMAGE_REQUEST_COOLDOWN = 3
+# What the command parser needs to stop at (everything else is part of an arg).
+# A string with nothing to escape is matched whole.
+SPECIAL_CHARS_REGEX = re.compile(r'"[^"\\]*"|\\+|"|\s+')
+# In a string whitespace is part of the arg
+STRING_SPECIAL_CHARS_REGEX = re.compile(r'\\+|"')
+DIGITS_REGEX = re.compile(r'[0-9]+')
 
 """
 DueUtils random command system.
@@ -33,9 +40,9 @@ def command(**command_rules):
                     or '@here' in ctx.content or '@everyone' in ctx.content)
         return False
 
-    def get_command_details(ctx, **details):
+    async def get_command_details(ctx, **details):
         details["timestamp"] = ctx.created_at
-        details["author"] = players.find_player(ctx.author.id)
+        details["author"] = await players.fetch_player(ctx.author.id)
         details["server"] = ctx.guild
         details["server_id"] = ctx.guild.id
         details["server_name"] = ctx.guild.name
@@ -48,11 +55,12 @@ def command(**command_rules):
         return details
 
     def wrap(command_func):
+        args_matcher = compile_args_pattern(command_rules.get('args_pattern', ""))
 
         @wraps(command_func)
         async def wrapped_command(ctx, prefix, _, args, **details):
             name = command_func.__name__
-            player = players.find_player(ctx.author.id)
+            player = await players.fetch_player(ctx.author.id)
             if player is None:
                 if name != "createaccount":
                     return await util.reply(ctx,
@@ -75,9 +83,8 @@ def command(**command_rules):
             # Do they have the perms for the command
             if check(ctx.author, wrapped_command):
                 # Check args
-                args_pattern = command_rules.get('args_pattern', "")
                 # Send a copy of args to avoid possible issues.
-                command_args = await determine_args(args_pattern, args.copy(), wrapped_command, ctx)
+                command_args = await args_matcher.match(args.copy(), wrapped_command, ctx)
                 if command_args is False:
                     # React ?
                     if not has_my_variant(name) or len(ctx.raw_mentions) > 0:
@@ -93,19 +100,21 @@ def command(**command_rules):
                     # Run command
                     details["cmd_key"] = prefix
                     details["command_name"] = name
-                    if name not in ("eval", "evaluate"):
-                        await command_func(ctx, *command_args, **get_command_details(ctx, **details))
-                    else:
-                        key = dueserverconfig.server_cmd_key(ctx.guild)
-                        command_string = ctx.content.replace(key, '', 1).replace(name, '').strip()
-                        await command_func(ctx, command_string, **get_command_details(ctx, **details))
+                    # Keep the author cached till the command is done
+                    with players.players.pinned(ctx.author.id):
+                        if name not in ("eval", "evaluate"):
+                            await command_func(ctx, *command_args, **(await get_command_details(ctx, **details)))
+                        else:
+                            key = dueserverconfig.server_cmd_key(ctx.guild)
+                            command_string = ctx.content.replace(key, '', 1).replace(name, '').strip()
+                            await command_func(ctx, command_string, **(await get_command_details(ctx, **details)))
                 else:
                     raise util.BattleBananaException(ctx.channel, "Please don't include spam mentions in commands.")
             else:
                 # React X
                 if not (permissions.has_permission(ctx.author, Permission.PLAYER) or permissions.has_special_permission(
                         ctx.author, Permission.BANNED)):
-                    player = players.find_player(ctx.author.id)
+                    player = await players.fetch_player(ctx.author.id)
                     local_optout = not player.is_playing(ctx.author, local=True)
                     if local_optout:
                         await util.reply(ctx, "You are opted out. Use ``%soptinhere``!" % prefix)
@@ -116,6 +125,7 @@ def command(**command_rules):
             return True
 
         wrapped_command.is_hidden = command_rules.get('hidden', False)
+        wrapped_command.args_pattern = args_matcher.pattern
         wrapped_command.permission = command_rules.get('permission', Permission.PLAYER)
         wrapped_command.aliases = tuple(command_rules.get('aliases', ()))
         # Add myX to X aliases
@@ -225,42 +235,61 @@ def parse(command_message):
     key = dueserverconfig.server_cmd_key(command_message.guild)
     command_string = command_message.content.replace(key, '', 1)
     user_mentions = command_message.raw_mentions
+    mentions = _Mentions(user_mentions) if len(user_mentions) > 0 else None
     escaped = False
     is_string = False
     args = []
-    current_arg = ''
-
-    def replace_mentions():
-        nonlocal user_mentions, current_arg
-        for mention in user_mentions:  # Replace mentions
-            mention = str(mention)
-            if mention in current_arg and len(current_arg) - len(mention) < 6:
-                current_arg = mention
-                del user_mentions[user_mentions.index(int(mention))]
+    current_arg = []
 
     def add_arg():
-        nonlocal current_arg, args
         if len(current_arg) > 0:
-            replace_mentions()
-            args = args + [current_arg]
-            current_arg = ""
-
-    for char_pos in range(0, len(command_string) + 1):
-        current_char = command_string[char_pos] if char_pos < len(command_string) else ' '
-        if char_pos < len(command_string) and (not current_char.isspace() or is_string):
-            if not escaped:
-                if current_char == '\\' and not (current_char.isspace() or current_char.isalpha()):
-                    escaped = True
-                    continue
-                elif current_char == '"':
-                    is_string = not is_string
-                    add_arg()
-                    continue
-            else:
+            arg = ''.join(current_arg)
+            current_arg.clear()
+            if len(arg) > 0:
+                args.append(mentions.replace(arg) if mentions is not None else arg)
+
+    # Only jumps between the runs of special chars (slices in between are just copied)
+    position = 0
+    find_special = SPECIAL_CHARS_REGEX.search
+    special = find_special(command_string)
+    while special is not None:
+        start = special.start()
+        if start > position:
+            current_arg.append(command_string[position:start])
+            # The first char after a \
+            escaped = False
+        position = special.end()
+        special_chars = special.group()
+        if special_chars[0] == '\\':
+            # Each pair is a \ (an odd one out escapes the next char)
+            backslashes = len(special_chars) + escaped
+            if backslashes > 1:
+                current_arg.append('\\' * (backslashes // 2))
+            escaped = backslashes % 2 == 1
+        elif special_chars[0] == '"':
+            if escaped:
                 escaped = False
-            current_arg += command_string[char_pos]
-        else:
+                current_arg.append('"')
+                # Anything after the quote still needs parsing
+                position = start + 1
+            elif len(special_chars) > 1:
+                add_arg()
+                current_arg.append(special_chars[1:-1])
+                add_arg()
+            else:
+                is_string = not is_string
+                find_special = (STRING_SPECIAL_CHARS_REGEX if is_string else SPECIAL_CHARS_REGEX).search
+                add_arg()
+        elif not is_string:
+            # Escapes carry over whitespace
             add_arg()
+        else:
+            escaped = False
+            current_arg.append(special_chars)
+        special = find_special(command_string, position)
+    if position < len(command_string):
+        current_arg.append(command_string[position:])
+    add_arg()
 
     if is_string:
         raise util.BattleBananaException(command_message.channel, "Unclosed string in command!")
@@ -271,6 +300,220 @@ def parse(command_message):
         return key, "", []
 
 
+class _Mentions:
+    """
+    The mentions in a message (for parse).
+
+    An arg that contains a mention (with < 6 other chars, e.g. <@!id>)
+    is replaced with the id & the mention is removed from the message's
+    raw_mentions. Most args are not mentions so they're checked
+    against a set first.
+    """
+
+    __slots__ = ["raw_mentions", "remaining", "lengths"]
+
+    def __init__(self, raw_mentions):
+        self.raw_mentions = raw_mentions
+        self._update()
+
+    def _update(self):
+        self.remaining = set(map(str, self.raw_mentions))
+        self.lengths = set(map(len, self.remaining))
+
+    def _could_replace(self, arg):
+        for length in self.lengths:
+            if len(arg) - length >= 6:
+                continue
+            # A mention is all digits so it can only be in a run of digits
+            for digits in DIGITS_REGEX.findall(arg):
+                for start in range(len(digits) - length + 1):
+                    if digits[start:start + length] in self.remaining:
+                        return True
+        return False
+
+    def replace(self, arg):
+        if not self._could_replace(arg):
+            return arg
+        user_mentions = self.raw_mentions
+        for mention in user_mentions:  # Replace mentions
+            mention = str(mention)
+            if mention in arg and len(arg) - len(mention) < 6:
+                arg = mention
+                del user_mentions[user_mentions.index(int(mention))]
+        self._update()
+        return arg
+
+
+def _remove_optional(args_pattern, args_count):
+    pattern_pos = len(args_pattern) - 1
+    while pattern_pos >= 0:
+        if len(args_pattern.replace('?', '')) == args_count:
+            break
+        elif pattern_pos == 0:
+            return False
+        if args_pattern[pattern_pos] == '?':
+            args_pattern = args_pattern[:pattern_pos - 1]
+            pattern_pos = len(args_pattern) - 1
+            continue
+        pattern_pos -= 1
+    return args_pattern.replace('?', '')
+
+
+def _could_be_string(args_pattern):
+    if args_pattern[0] in commandtypes.STRING_TYPES:
+        if len(args_pattern) > 1:
+            pattern_pos = len(args_pattern) - 1
+            while pattern_pos > 0:
+                if args_pattern[pattern_pos] == '?':
+                    pattern_pos -= 2
+                    continue
+                return False
+        return args_pattern in commandtypes.STRING_TYPES or len(args_pattern) > 1
+    return False
+
+
+class ArgsMatcher:
+    """
+    An args_pattern compiled (once) for determine_args.
+
+    Everything that only depends on the pattern (the pattern to use
+    for each number of args, if it could be a string, where the last
+    string goes when guessing quotes) is worked out here so matching
+    only has to run the type parsers.
+    """
+
+    __slots__ = ["pattern", "could_be_string", "has_star", "patterns_for_count",
+                 "guess_pattern", "guess_last_string"]
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.could_be_string = bool(pattern) and _could_be_string(pattern)
+        self.has_star = pattern is not None and '*' in pattern
+        # args count -> pattern with the unused optionals removed (or False)
+        self.patterns_for_count = []
+        self.guess_pattern = None
+        self.guess_last_string = -1
+        if not pattern or self.has_star:
+            return
+        for args_count in range(len(pattern) + 1):
+            pattern_optional_removed = _remove_optional(pattern, args_count)
+            if pattern_optional_removed is not False and args_count > len(pattern_optional_removed):
+                pattern_optional_removed = False
+            self.patterns_for_count.append(pattern_optional_removed)
+        self.guess_pattern = pattern.replace('?', '')
+        # Find the last type that could be a string in the pattern.
+        last_string = max(self.guess_pattern.rfind(string_type) for string_type in commandtypes.STRING_TYPES)
+        if last_string != -1 and _could_be_string(self.guess_pattern[last_string:]):
+            self.guess_last_string = last_string
+
+    @staticmethod
+    def _valid_args_len(test_args, args_pattern):
+        # Length - zero or more types (as they are not needed)
+        pattern_type_count = len(args_pattern) - args_pattern.count('*') * 2
+        if '*' in args_pattern:
+            return len(test_args) >= pattern_type_count
+        return len(test_args) == pattern_type_count
+
+    def _attempt_args_as_string(self, crappy_args):
+        # A last ditch effort to get some use out of the shit known as input.
+        if len(crappy_args) > 0 and self.could_be_string:
+            # Only a pattern that can just be a string is valid
+            return ' '.join(map(str, crappy_args)),
+        return False
+
+    async def match(self, args, called, ctx):
+        """
+        See determine_args
+        """
+
+        pattern = self.pattern
+        # Initial pattern checks
+        guessing_arguments = False
+        if pattern is None and len(args) > 0:
+            return False
+        elif pattern is None and len(args) == 0:
+            return args
+        if len(pattern) == 0:
+            return args
+        if not self.has_star:
+            pattern_optional_removed = (self.patterns_for_count[len(args)]
+                                        if len(args) < len(self.patterns_for_count) else False)
+            if pattern_optional_removed is False:
+                if self.could_be_string:
+                    # If the command is wrong by all other tests and it could be a string
+                    # merge the arguments to a single string.
+                    if len(args) > 0:
+                        return ' '.join(args),
+                    return False
+                # Guessing args: Trying to figure out if the user has forgot quotes.
+                # With no context on the command it's fiddly
+                guessing_arguments = True
+                pattern = self.guess_pattern
+            else:
+                pattern = pattern_optional_removed
+
+        # Checking the command args match the given pattern.
+        pos = 0
+        args_index = 0
+        current_rule = ''
+        checks_satisfied = 0
+        while pos < len(pattern) and args_index < len(args):
+            pos_change = pattern[pos] != '*'
+            if pos_change:
+                current_rule = pattern[pos]
+            if pos + 1 < len(pattern) and pattern[pos + 1] == '*':
+                # We don't move in were we are in the pattern
+                # if the rule is a Kleene star
+                pos += 1
+                pos_change = False
+            # Get the value as the type it should be (if possible). Will return False or None if it fails.
+            value = await commandtypes.parse_type(current_rule, args[args_index], called=called, ctx=ctx)
+            if (value is False and current_rule != 'B') or value is None:
+                # We've got a incorrect value and are not expecting multiple (*)
+                if pattern[pos] != '*':
+                    # We've been unable to parse it.
+                    # One last try.
+                    return self._attempt_args_as_string(args)
+                else:
+                    # Must be the end of the repeated set of values (*)
+                    if pos + 1 < len(pattern):
+                        args_index -= 1
+                        pos_change = True
+                    else:
+                        # Okay I'm super cereal - Giving up after this
+                        return self._attempt_args_as_string(args)
+            else:
+                # Normal - All is good
+                args[args_index] = value
+                checks_satisfied += 1
+            args_index += 1
+            if pos_change:
+                pos += 1
+
+        # Final checks
+        if (checks_satisfied == len(args) and not guessing_arguments
+                and self._valid_args_len(args, pattern)):
+            return args
+        elif guessing_arguments:
+            """
+            If they've forgot quotes for the last sting
+            so !command arg0 arg1 arg2 "A String here"
+            and they've done
+            !command arg0 arg1 arg2 A String here
+            """
+            last_string = self.guess_last_string
+            if len(args) > len(pattern) and last_string != -1:
+                new_args = tuple(args[:last_string]) + (' '.join(args[last_string:]),)
+                if checks_satisfied == len(new_args) and self._valid_args_len(new_args, pattern):
+                    return new_args
+        return False
+
+
+@lru_cache(maxsize=None)
+def compile_args_pattern(pattern):
+    return ArgsMatcher(pattern)
+
+
 async def determine_args(pattern, args, called, ctx):
     """
     
@@ -288,7 +531,8 @@ async def determine_args(pattern, args, called, ctx):
     This allows the commands to not need to parse their args
     unless they're doing something strange.
     
-    TODO: This method probably can be improved and simplified
+    The pattern is compiled (once) into an ArgsMatcher.
+    Commands compile theirs when they're made.
     
     Returns False if the args could not be determined or
     a turple of args if they could.
@@ -298,134 +542,4 @@ async def determine_args(pattern, args, called, ctx):
     
     """
 
-    original_pattern = pattern
-
-    # Internal helpers.
-    def remove_optional(args_pattern):
-        pattern_pos = len(args_pattern) - 1
-        while pattern_pos >= 0:
-            if len(args_pattern.replace('?', '')) == len(args):
-                break
-            elif pattern_pos == 0:
-                return False
-            if args_pattern[pattern_pos] == '?':
-                args_pattern = args_pattern[:pattern_pos - 1]
-                pattern_pos = len(args_pattern) - 1
-                continue
-            pattern_pos -= 1
-        return args_pattern.replace('?', '')
-
-    def could_be_string(args_pattern):
-        if args_pattern[0] in commandtypes.STRING_TYPES:
-            if len(args_pattern) > 1:
-                pattern_pos = len(args_pattern) - 1
-                while pattern_pos > 0:
-                    if args_pattern[pattern_pos] == '?':
-                        pattern_pos -= 2
-                        continue
-                    return False
-            return args_pattern in commandtypes.STRING_TYPES or len(args_pattern) > 1
-        return False
-
-    def attempt_args_as_string(crappy_args, args_pattern):
-        # A last ditch effort to get some use out of the shit known as input.
-        if len(crappy_args) > 0 and could_be_string(args_pattern):
-            # Only a pattern that can just be a string is valid
-            return ' '.join(map(str, crappy_args)),
-        return False
-
-    def valid_args_len(test_args, args_pattern):
-        # Length - zero or more types (as they are not needed)
-        pattern_type_count = len(args_pattern) - args_pattern.count('*') * 2
-        if '*' in args_pattern:
-            return len(test_args) >= pattern_type_count
-        return len(test_args) == pattern_type_count
-
-    # Initial pattern checks
-    guessing_arguments = False
-    if pattern is None and len(args) > 0:
-        return False
-    elif pattern is None and len(args) == 0:
-        return args
-    if len(pattern) == 0:
-        return args
-    if '*' not in pattern:
-        pattern_optional_removed = remove_optional(pattern)
-        if pattern_optional_removed is False or len(args) > len(pattern_optional_removed):
-            if could_be_string(pattern):
-                # If the command is wrong by all other tests and it could be a string
-                # merge the arguments to a single string.
-                if len(args) > 0:
-                    return ' '.join(args),
-                return False
-            # Guessing args: Trying to figure out if the user has forgot quotes.
-            # With no context on the command it's fiddly
-            guessing_arguments = True
-        if not guessing_arguments:
-            pattern = pattern_optional_removed
-        else:
-            pattern = pattern.replace('?', '')
-
-    # Checking the command args match the given pattern.
-    pos = 0
-    args_index = 0
-    current_rule = ''
-    checks_satisfied = 0
-    while pos < len(pattern) and args_index < len(args):
-        pos_change = pattern[pos] != '*'
-        if pos_change:
-            current_rule = pattern[pos]
-        if pos + 1 < len(pattern) and pattern[pos + 1] == '*':
-            # We don't move in were we are in the pattern
-            # if the rule is a Kleene star
-            pos += 1
-            pos_change = False
-        # Get the value as the type it should be (if possible). Will return False or None if it fails.
-        value = commandtypes.parse_type(current_rule, args[args_index], called=called, ctx=ctx)
-        if (value is False and current_rule != 'B') or value is None:
-            # We've got a incorrect value and are not expecting multiple (*)
-            if pattern[pos] != '*':
-                # We've been unable to parse it.
-                # One last try.
-                return attempt_args_as_string(args, original_pattern)
-            else:
-                # Must be the end of the repeated set of values (*)
-                if pos + 1 < len(pattern):
-                    args_index -= 1
-                    pos_change = True
-                else:
-                    # Okay I'm super cereal - Giving up after this
-                    return attempt_args_as_string(args, original_pattern)
-        else:
-            # Normal - All is good
-            args[args_index] = value
-            checks_satisfied += 1
-        args_index += 1
-        if pos_change:
-            pos += 1
-
-    # Final checks
-    if (checks_satisfied == len(args) and not guessing_arguments
-            and valid_args_len(args, pattern)):
-        return args
-    elif guessing_arguments:
-        """
-        If they've forgot quotes for the last sting
-        so !command arg0 arg1 arg2 "A String here"
-        and they've done
-        !command arg0 arg1 arg2 A String here
-        """
-        if len(args) > len(pattern):
-            last_string = -1
-            # Find the last type that could be a string in the pattern.
-            # Use a simple loop as the regex (re) kinda sucks for this
-            for string_type in commandtypes.STRING_TYPES:
-                last_string_type = pattern.rfind(string_type)
-                if last_string_type > last_string:
-                    last_string = last_string_type
-            if last_string != -1:
-                if could_be_string(pattern[last_string:]):
-                    new_args = tuple(args[:last_string]) + (' '.join(args[last_string:]),)
-                    if checks_satisfied == len(new_args) and valid_args_len(new_args, pattern):
-                        return new_args
-    return False
+    return await compile_args_pattern(pattern).match(args, called, ctx)
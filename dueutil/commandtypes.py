@@ -1,4 +1,7 @@
+import inspect
 import re
+import threading
+from collections import OrderedDict, namedtuple
 
 from dueutil.game.helpers import imagehelper
 from . import util
@@ -11,8 +14,46 @@ MAX_NUMBER = 9223372036854775807
 MIN_NUMBER = -MAX_NUMBER
 STRING_TYPES = ('S', 'M')
 THOUSANDS_REGEX = re.compile(r'(\,)([0-9][0-9][0-9])')
+# How many messages to keep cached converter results for
+MESSAGE_CACHE_SIZE = 64
 
+_Converter = namedtuple("Converter", ["parse", "is_async", "cached", "contextual"])
+converters = dict()
+# message id -> {(type, value, command): parsed value}
+_message_caches = OrderedDict()
+_message_caches_lock = threading.Lock()
 
+
+def converter(arg_type, cached=False, contextual=False):
+    """
+    Registers a parser for a type in args patterns.
+
+    The parser gets the arg (a str) & returns the value
+    (False or None if it's not valid). It can be a coroutine.
+    contextual parsers also get the command called & the message.
+    cached parsers are only run once per value in a message
+    (for things like players that may need the db).
+    """
+
+    def register(parse_function):
+        converters[arg_type] = _Converter(parse_function, inspect.iscoroutinefunction(parse_function),
+                                          cached, contextual)
+        return parse_function
+
+    return register
+
+
+def _message_cache(message):
+    with _message_caches_lock:
+        cache = _message_caches.get(message.id)
+        if cache is None:
+            cache = _message_caches[message.id] = dict()
+            if len(_message_caches) > MESSAGE_CACHE_SIZE:
+                _message_caches.popitem(last=False)
+        return cache
+
+
+@converter('L')
 def parse_link(url):
     if (imagehelper.is_url_image(url)):
         return url
@@ -30,13 +71,15 @@ def strip_thousands_separators(value):
     return value
 
 
-def parse_team(value):
-    team = teams.find_team(value.lower())
+@converter('T', cached=True)
+async def parse_team(value):
+    team = await teams.fetch_team(value.lower())
     if team is None:
         return False
     return team
 
 
+@converter('I')
 def parse_int(value):
     # An int limited between min and max number
     try:
@@ -45,6 +88,7 @@ def parse_int(value):
         return False
 
 
+@converter('S')
 def parse_string(value):
     # When is a string not a string?
     """
@@ -62,6 +106,7 @@ def parse_string(value):
     return False
 
 
+@converter('C')
 def parse_count(value):
     # The counting numbers.
     # Natural numbers starting from 1
@@ -72,6 +117,7 @@ def parse_count(value):
         return int_value
 
 
+@converter('R')
 def parse_float(value):
     # Float between min and max number
     try:
@@ -80,10 +126,11 @@ def parse_float(value):
         return False
 
 
-def parse_player(player_id, called, ctx):
+@converter('P', cached=True, contextual=True)
+async def parse_player(player_id, called, ctx):
     # A BattleBanana Player
     try:
-        player = players.find_player(int(player_id))
+        player = await players.fetch_player(int(player_id))
         if player is None or not player.is_playing(ctx.author) \
                 and called.permission < Permission.BANANA_MOD:
             return False
@@ -92,19 +139,40 @@ def parse_player(player_id, called, ctx):
         return False
 
 
-base_func_dict = {'T': parse_team, 'S': parse_string, 'I': parse_int, 'C': parse_count, 'R': parse_float}
+@converter('M')
+def parse_mixed(value):
+    # This one is for page selectors that could be a page number or a string like a weapon name.
+    count = parse_count(value)
+    return count if count else value
+
+
+@converter('B')
+def parse_bool(value):
+    return value.lower() in misc.POSITIVE_BOOLS
+
+
+@converter('%')
+def parse_percent(value):
+    return parse_float(value.rstrip("%"))
 
 
-def parse_type(arg_type, value, **extras):
+async def parse_type(arg_type, value, **extras):
+    type_converter = converters.get(arg_type)
+    if type_converter is None:
+        return None
     called = extras.get("called")
     ctx = extras.get("ctx")
-    if arg_type in base_func_dict:
-        return base_func_dict[arg_type](value)
-    return {
-        'P': parse_player(value, called, ctx),
-        # This one is for page selectors that could be a page number or a string like a weapon name.
-        'M': parse_count(value) if parse_count(value) else value,
-        'B': value.lower() in misc.POSITIVE_BOOLS,
-        '%': parse_float(value.rstrip("%")),
-        'L': parse_link(value)
-    }.get(arg_type)
+    if type_converter.cached and ctx is not None:
+        cache = _message_cache(ctx)
+        cache_key = (arg_type, value, called)
+        if cache_key in cache:
+            return cache[cache_key]
+    if type_converter.contextual:
+        parsed_value = type_converter.parse(value, called, ctx)
+    else:
+        parsed_value = type_converter.parse(value)
+    if type_converter.is_async:
+        parsed_value = await parsed_value
+    if type_converter.cached and ctx is not None:
+        cache[cache_key] = parsed_value
+    return parsed_value
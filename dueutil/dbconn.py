@@ -1,13 +1,33 @@
 import json
 import jsonpickle
+import logging
 import pymongo
+import re
+import threading
+from collections import defaultdict
 from datetime import datetime
-from pymongo import MongoClient
+from pymongo import MongoClient, ReplaceOne, UpdateOne
+
+from . import codec
 
 db = None
 config = {}
 ASCENDING = pymongo.ASCENDING
 DESCENDING = pymongo.DESCENDING
+# Seconds between write-behind flushes (can be set with "saveInterval" in dbconfig.json)
+DEFAULT_SAVE_INTERVAL = 5
+
+logger = logging.getLogger('battlebanana')
+
+# Objects waiting to be written keyed by (collection, id).
+# Saving the same object again before a flush just replaces the entry.
+_pending_objects = dict()
+# Objects taken from _pending_objects by the flush that's writing them
+_flushing_objects = dict()
+_pending_lock = threading.Lock()
+# Flushes happen from both the task loop & shard threads (forced flushes).
+# They must not overlap or an older state could be written last.
+_flush_lock = threading.Lock()
 
 
 def conn():
@@ -27,11 +47,156 @@ def conn():
 def insert_object(id, pickleable_object):
     if isinstance(id, str) and id.strip() == "":
         return
-    # todo
-    # jsonpickle_data = json.loads(jsonpickle.encode(pickleable_object))
-    conn()[type(pickleable_object).__name__].update({'_id': id},
-                                                    {"$set": {'data': jsonpickle.encode(pickleable_object)}},
-                                                    upsert=True)
+    request, document = _write_request(id, pickleable_object)
+    if request is not None:
+        conn()[type(pickleable_object).__name__].bulk_write([request])
+        _mark_saved(pickleable_object, document)
+
+
+def _write_request(id, pickleable_object):
+    """
+    Returns the write needed to save an object (or None if nothing changed)
+    and the document that will have been saved.
+    """
+    if codec.can_encode(pickleable_object):
+        document = codec.encode(pickleable_object)
+        saved_document = getattr(pickleable_object, "saved_document", None)
+        if saved_document is None:
+            # Native schema. Replacing the document also drops any old jsonpickle 'data'.
+            return ReplaceOne({'_id': id}, dict(document, _id=id), upsert=True), document
+        # Only send the slots that changed since the last save.
+        update = codec.delta(saved_document, document)
+        if len(update) == 0:
+            return None, document
+        return UpdateOne({'_id': id}, update, upsert=True), document
+    return UpdateOne({'_id': id}, {"$set": {'data': jsonpickle.encode(pickleable_object)}}, upsert=True), None
+
+
+def _mark_saved(pickleable_object, document):
+    if document is not None:
+        pickleable_object.mark_saved(document)
+
+
+def load_object(document, object_class, migrate=True):
+    """
+    Loads an object from its document. Objects still stored as a
+    jsonpickle blob are migrated to the native schema lazily (they're
+    queued to be rewritten on the next flush).
+
+    migrate should be False for throwaway copies (that are not the
+    object the bot will use & save).
+    """
+    if 'data' in document:
+        loaded_object = jsonpickle.decode(document['data'])
+        if migrate and codec.can_encode(loaded_object):
+            # Never replace a real save of the object
+            _requeue(type(loaded_object).__name__, document['_id'], loaded_object)
+        return loaded_object
+    loaded_object = codec.decode(document, object_class)
+    loaded_object.mark_saved({field: value for field, value in document.items() if field != '_id'})
+    return loaded_object
+
+
+def queue_object(id, pickleable_object):
+    """
+    Write-behind save. Marks the object as dirty so it's written
+    on the next flush (rather than blocking on an upsert now).
+    """
+    if isinstance(id, str) and id.strip() == "":
+        return
+    with _pending_lock:
+        _pending_objects[(type(pickleable_object).__name__, id)] = pickleable_object
+
+
+def is_pending(pickleable_object):
+    """
+    If the object has a save that's not been written yet
+    (queued or being flushed)
+    """
+    key = (type(pickleable_object).__name__, pickleable_object.id)
+    with _pending_lock:
+        return key in _pending_objects or key in _flushing_objects
+
+
+def flush_objects(*pickleable_objects):
+    """
+    Writes all dirty objects with one bulk_write per collection.
+    This is synchronous, so it can also be used to force a save
+    (e.g. for shutting down).
+
+    If objects are given only those are written (if dirty), for
+    saves that can't wait (like money transfers).
+    """
+    with _flush_lock:
+        with _pending_lock:
+            if len(pickleable_objects) == 0:
+                pending = _pending_objects.copy()
+                _pending_objects.clear()
+            else:
+                keys = set((type(pickleable_object).__name__, pickleable_object.id)
+                           for pickleable_object in pickleable_objects)
+                pending = {key: _pending_objects.pop(key) for key in keys if key in _pending_objects}
+            _flushing_objects.update(pending)
+        if len(pending) == 0:
+            return 0
+        try:
+            return _write_pending(pending)
+        finally:
+            with _pending_lock:
+                # Anything not written has been requeued by now
+                _flushing_objects.clear()
+
+
+def _write_pending(pending):
+    updates = defaultdict(list)
+    for (collection, id), pickleable_object in pending.items():
+        try:
+            request, document = _write_request(id, pickleable_object)
+            if request is not None:
+                updates[collection].append((id, pickleable_object, document, request))
+        except RuntimeError:
+            # Changed by another thread while encoding. Will be written next flush.
+            _requeue(collection, id, pickleable_object)
+        except Exception:
+            # Never lose a save (or stop the flush task) over one bad object
+            logger.exception("Failed to encode %s %s", collection, id)
+            _retry_later(collection, id, pickleable_object)
+
+    written = 0
+    for collection, collection_updates in updates.items():
+        try:
+            conn()[collection].bulk_write([request for *_, request in collection_updates], ordered=False)
+            written += len(collection_updates)
+            for _, pickleable_object, document, _ in collection_updates:
+                _mark_saved(pickleable_object, document)
+        except pymongo.errors.BulkWriteError as write_error:
+            failed = set(error["index"] for error in write_error.details["writeErrors"])
+            logger.error("Failed to flush %d %s objects: %s", len(failed), collection, write_error)
+            for index, (id, pickleable_object, document, _) in enumerate(collection_updates):
+                if index in failed:
+                    _requeue(collection, id, pickleable_object)
+                else:
+                    _mark_saved(pickleable_object, document)
+        except Exception as write_error:
+            # e.g. PyMongoError or bson's InvalidDocument. The other collections are still written.
+            logger.error("Failed to flush %d %s objects: %s", len(collection_updates), collection, write_error,
+                         exc_info=not isinstance(write_error, pymongo.errors.PyMongoError))
+            for id, pickleable_object, _, _ in collection_updates:
+                _retry_later(collection, id, pickleable_object)
+    return written
+
+
+def _retry_later(collection, id, pickleable_object):
+    if codec.can_encode(pickleable_object):
+        # Unknown if the write happened. A full write next time is safe to repeat ($inc is not).
+        pickleable_object.mark_saved(None)
+    _requeue(collection, id, pickleable_object)
+
+
+def _requeue(collection, id, pickleable_object):
+    with _pending_lock:
+        # Don't replace a newer save made during the flush.
+        _pending_objects.setdefault((collection, id), pickleable_object)
 
 
 def drop_and_insert(collection, data):
@@ -44,12 +209,46 @@ def get_collection_for_object(object_class):
     return conn()[object_class.__name__]
 
 
+def _drop_pending(collection, is_deleted):
+    with _pending_lock:
+        # A queued save would bring the object back.
+        for key in [key for key in _pending_objects if key[0] == collection and is_deleted(key[1])]:
+            del _pending_objects[key]
+
+
+def delete_object(object_class, id):
+    # Not during a flush (that could write the object back after the delete)
+    with _flush_lock:
+        _drop_pending(object_class.__name__, lambda pending_id: pending_id == id)
+        return conn()[object_class.__name__].delete_one({'_id': id})
+
+
 def delete_objects(object_class, id_pattern):
-    return conn()[object_class.__name__].delete_many({'_id': {'$regex': id_pattern}})
+    id_regex = re.compile(id_pattern)
+    with _flush_lock:
+        _drop_pending(object_class.__name__,
+                      lambda pending_id: isinstance(pending_id, str) and id_regex.search(pending_id) is not None)
+        return conn()[object_class.__name__].delete_many({'_id': {'$regex': id_pattern}})
+
+
+def delete_guild_objects(collection, guild_id):
+    """
+    Deletes everything a guild has in a collection
+    (the guild's id or ids that contain it, like quests & weapons)
+    """
+    id_pattern = '%s.*' % guild_id
+    id_regex = re.compile(id_pattern)
+    guild_ids = (guild_id, str(guild_id))
+    with _flush_lock:
+        _drop_pending(collection, lambda pending_id: pending_id in guild_ids or isinstance(pending_id, str)
+                      and id_regex.search(pending_id) is not None)
+        connection = conn()
+        connection[collection].delete_many({'_id': {'$in': list(guild_ids)}})
+        connection[collection].delete_many({'_id': {'$regex': id_pattern}})
 
 
 def delete_player(player):
-    conn()["Player"].delete_one({'_id': player.id})
+    delete_object(type(player), player.id)
 
 
 def update_guild_joined(count):
@@ -65,3 +264,4 @@ def _load_config():
 
 
 _load_config()
+
@@ -1,4 +1,5 @@
 import inspect
+from collections import Counter, defaultdict
 from discord import Message
 from itertools import chain
 from typing import Callable
@@ -8,9 +9,35 @@ from .game.configs import dueserverconfig
 from .game.helpers.misc import DueMap
 
 
+# Stage name -> how many messages it saw & dropped before doing any work
+message_stages = defaultdict(Counter)
+
+
+def stage_eligible(stage, eligible, ctx):
+    """
+    Counts a message going into a stage & runs the stage's
+    (cheap) eligible check. No check means every message goes through.
+    """
+
+    counts = message_stages[stage]
+    counts["seen"] += 1
+    if eligible is not None and not eligible(ctx):
+        counts["dropped"] += 1
+        return False
+    return True
+
+
 class MessageEvent(list):
+    """
+    Listeners run on every message. A listener can have an eligible
+    function (see register_message_listener) that's checked first, so
+    messages it would do nothing with are dropped before it loads anything.
+    """
+
     async def __call__(self, ctx: Message):
         for listener in self:
+            if not stage_eligible(listener.__name__, getattr(listener, "eligible", None), ctx):
+                continue
             if await listener(ctx):
                 break
 
@@ -33,6 +60,8 @@ class CommandEvent(dict):
     def __init__(self):
         super().__init__()
         self.command_categories = DueMap()
+        # Command names & aliases -> command
+        self.names = dict()
 
     def command_list(self, **options):
         filter_func = options.get("filter", (lambda command: command))
@@ -51,21 +80,54 @@ class CommandEvent(dict):
 
     def __setitem__(self, key: str, command: Callable[..., None]):
         module_name = inspect.getmodule(command).__name__.rsplit('.', 1)[1]
-        self.command_categories[module_name + "/" + command.__name__] = command
+        self.command_categories[module_name, command.__name__] = command
         command.category = module_name
+        replaced = key in self
         super(CommandEvent, self).__setitem__(key, command)
+        if replaced:
+            # Could have old aliases
+            self.rebuild_names()
+        else:
+            for alias in command.aliases:
+                self.names.setdefault(alias, command)
+            self.names[key] = command
 
     def __delitem__(self, key: str):
         command = self[key]
         module_name = inspect.getmodule(command).__name__.rsplit('.', 1)[1]
-        del self.command_categories[module_name + "/" + command.__name__]
+        del self.command_categories[module_name, command.__name__]
         super(CommandEvent, self).__delitem__(key)
-
-    async def __call__(self, ctx):
+        self.rebuild_names()
+
+    def rebuild_names(self):
+        """
+        Rebuilds the name/alias lookup. Names beat aliases
+        & the first command with an alias gets it.
+        """
+
+        names = dict()
+        for command in self.values():
+            for alias in command.aliases:
+                names.setdefault(alias, command)
+        names.update(self)
+        self.names = names
+
+    def could_be_command(self, ctx):
         # Commands can be triggered by using the command key or 
         # mentioning the bot
-        if not ctx.content.startswith(dueserverconfig.server_cmd_key(ctx.guild)):
-            return
+        key = dueserverconfig.server_cmd_key(ctx.guild)
+        if not ctx.content.startswith(key):
+            return False
+        # Check the command exists before parsing the whole message.
+        # (a quoted/escaped name has to be parsed first)
+        words = ctx.content[len(key):].split(None, 1)
+        return len(words) > 0 and ('"' in words[0] or '\\' in words[0] or words[0].lower() in self.names)
+
+    async def __call__(self, ctx):
+        if self.could_be_command(ctx):
+            await self.run_command(ctx)
+
+    async def run_command(self, ctx):
         args = commands.parse(ctx)
         command = get_command(args[1])
         if command is not None:
@@ -90,7 +152,8 @@ command_event = CommandEvent()
 
 async def on_message_event(ctx):
     await message_event(ctx)
-    await command_event(ctx)
+    if stage_eligible("commands", command_event.could_be_command, ctx):
+        await command_event.run_command(ctx)
 
 
 def find_old(listener_function, listeners):
@@ -98,7 +161,13 @@ def find_old(listener_function, listeners):
                  if listener.__name__ == listener_function.__name__), -1)
 
 
-def register_message_listener(listener_function):
+def register_message_listener(listener_function, eligible=None):
+    """
+    eligible(message) should be cheap (no db or player loading).
+    The listener is only called for messages it returns True for.
+    """
+
+    listener_function.eligible = eligible
     message_event.append(listener_function)
 
 
@@ -118,10 +187,4 @@ def remove_command(command_function):
 
 
 def get_command(command_name):
-    command_name = command_name.lower()
-    if command_name in command_event:
-        return command_event[command_name]
-    for command in command_event.values():
-        # Sad - need to search
-        if command_name in command.aliases:
-            return command
+    return command_event.names.get(command_name.lower())
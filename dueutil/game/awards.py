@@ -2,7 +2,7 @@ import discord
 import json
 from PIL import Image
 
-from .. import util, dbconn
+from .. import asyncdb, util, dbconn
 from ..game.configs import dueserverconfig
 
 awards = dict()
@@ -60,11 +60,11 @@ def update_award_stat(award_id, stat, value, increment=True):
             update = {"$inc": {stat: value}}
         else:
             update = {"$set": {stat: value}}
-        dbconn.conn()["award_stats"].update({"award": award_id}, update, upsert=True)
+        asyncdb.run_later(dbconn.conn()["award_stats"].update_one, {"award": award_id}, update, upsert=True)
 
 
-def get_award_stat(award_id):
-    return dbconn.conn()["award_stats"].find_one({"award": award_id})
+async def get_award_stat(award_id):
+    return await asyncdb.conn()["award_stats"].find_one({"award": award_id})
 
 
 _load()
@@ -1,20 +1,31 @@
 import discord
+import numpy
 import random
-from collections import OrderedDict
+from bson import ObjectId
+from bson.errors import InvalidId
 from collections import namedtuple
+from datetime import datetime
+from itertools import chain
 
 import generalconfig as gconf
-from .. import util
+from .. import asyncdb, codec, dbconn, util
 from ..game import weapons, awards
 from ..game.players import Player
 
 # Some tuples for use within this module.
 _BattleResults = namedtuple("BattleResults", ["moves", "turn_count", "winner",
-                                              "loser", "opponents", "p1_hits", "p2_hits"])
-_BattleLog = namedtuple("BattleLog", ["embed", "turn_count", "winner", "loser"])
-_Move = namedtuple("Move", ["message", "repetitions"])
+                                              "loser", "opponents", "p1_hits", "p2_hits", "replay"])
+_BattleLog = namedtuple("BattleLog", ["embed", "turn_count", "winner", "loser", "replay"])
+_Move = namedtuple("Move", ["attacker", "duo", "repetitions"])
 _OpponentInfo = namedtuple("OpponentInfo", ["prefix", "player"])
 _Opponents = namedtuple("Opponents", ["p1", "p2"])
+_BattleOdds = namedtuple("BattleOdds", ["win", "draw", "loss", "turns", "reward"])
+# Everything a battle needs to know about a player (or quest)
+_Fighter = namedtuple("Fighter", ["id", "level", "hp", "attack", "strg", "accy",
+                                  "hit_chance", "weapon_id", "weapon_damage", "melee"])
+_BattleReplay = namedtuple("BattleReplay", ["seed", "fighters", "version"])
+# How a fighter is shown in a replayed battle log
+_ReplayOpponent = namedtuple("ReplayOpponent", ["id", "name_clean", "weapon"])
 
 """
         ===################===============                                           
@@ -27,6 +38,11 @@ _Opponents = namedtuple("Opponents", ["p1", "p2"])
 # Some default attack messages (if the player does not have a weapon)
 BABY_MOVES = ("slapped", "scratched", "hit", "punched", "licked", "bit", "kicked", "tickled")
 MAX_BATTLE_LOG_LEN = 1024
+BATTLE_SIMULATIONS = 2000
+# Bump if a change to the engine would change the result of old replays
+REPLAY_VERSION = 1
+# Replays are deleted (by Mongo) after this many seconds
+REPLAY_KEEP_TIME = 3600 * 24 * 90
 
 
 class BattleRequest:
@@ -45,6 +61,9 @@ class BattleRequest:
         receiver.save()
 
 
+codec.register(BattleRequest)
+
+
 async def give_awards_for_battle(channel, battle_log: _BattleLog):
     """
     Award triggers that can be called after a battle.
@@ -65,6 +84,8 @@ async def give_awards_for_battle(channel, battle_log: _BattleLog):
                 await awards.give_award(channel, winner, "TopDog")
                 awards.update_award_stat("TopDog", "top_dog", str(winner.id))
                 await util.save_old_topdog(loser)
+                replay_id = save_replay(battle_log, "TopDog")
+                util.logger.info("TopDog taken by %s from %s (replay %s)", winner.id, loser.id, replay_id)
                 loser.save()
                 winner.save()
         if battle_log.turn_count == 1 and winner.level - loser.level <= 2.5:
@@ -79,18 +100,22 @@ def get_battle_log(**battleargs):
     Creates a formatted embed of a battle
     """
 
-    battle_result = battle(**battleargs)
-    battle_moves = list(battle_result.moves.values())
-    battle_embed = discord.Embed(title=(battleargs.get('player_one').name_clean
-                                        + " :vs: " + battleargs.get('player_two').name_clean), type="rich",
+    return _battle_log(battle(**battleargs))
+
+
+def _battle_log(battle_result):
+    battle_embed = discord.Embed(title=(battle_result.opponents.p1.player.name_clean
+                                        + " :vs: " + battle_result.opponents.p2.player.name_clean), type="rich",
                                  color=gconf.DUE_COLOUR)
     battle_log = ""
-    for move in battle_moves:
-        move_repetition = move.repetitions
-        if move_repetition <= 1:
-            battle_log += move.message + '\n'
-        else:
-            battle_log += "(%s) × %d\n" % (move.message, move.repetitions)
+    # Seeded so a replay of the battle gets the same log
+    move_random = random.Random(battle_result.replay.seed)
+    # Only render as much of the log as can be shown
+    for line in chain((_move_line(battle_result.opponents, move, move_random) for move in battle_result.moves),
+                      (_result_message(battle_result),)):
+        battle_log += line + '\n'
+        if len(battle_log) > MAX_BATTLE_LOG_LEN:
+            break
     if len(battle_log) > MAX_BATTLE_LOG_LEN:
         # Too long battle.
         # Mini summary.
@@ -104,7 +129,7 @@ def get_battle_log(**battleargs):
                                         util.s_suffix("time", battle_result.p1_hits),
                                         player_two.prefix, player_two.player.name_clean, battle_result.p2_hits,
                                         util.s_suffix("time", battle_result.p2_hits))
-                                     + battle_moves[-1].message)
+                                     + _result_message(battle_result))
     else:
         battle_embed.add_field(name='Battle log', value=battle_log)
     battle_info = battle_result._asdict()
@@ -114,150 +139,280 @@ def get_battle_log(**battleargs):
     return _BattleLog(embed=battle_embed, **battle_info)
 
 
+def _hit_message(opponents, attacker, move_random):
+    attacker_info = opponents[attacker]
+    other_info = opponents[1 - attacker]
+    weapon = attacker_info.player.weapon
+    if weapon.id == weapons.NO_WEAPON_ID:
+        message = move_random.choice(BABY_MOVES)
+    else:
+        message = weapon.hit_message
+    return "%s**%s** %s %s**%s**" % (attacker_info.prefix.title(), attacker_info.player.name_clean,
+                                     message, other_info.prefix, other_info.player.name_clean)
+
+
+def _move_line(opponents, move, move_random):
+    message = _hit_message(opponents, move.attacker, move_random)
+    if move.duo:
+        message += " ⇆ " + _hit_message(opponents, 1 - move.attacker, move_random)
+    if move.repetitions <= 1:
+        return message
+    return "(%s) × %d" % (message, move.repetitions)
+
+
+def _result_message(battle_result):
+    turns = battle_result.turn_count
+    if battle_result.winner is None:
+        return ":question: Against all odds it's a draw after **%d** %s!" % (turns, util.s_suffix("turn", turns))
+    winner = battle_result.opponents.p1 if battle_result.winner is battle_result.opponents.p1.player \
+        else battle_result.opponents.p2
+    return (":trophy: %s**%s** wins in **%d** %s!"
+            % (winner.prefix.title(), winner.player.name_clean, turns, util.s_suffix("turn", turns)))
+
+
+def _compress_moves(runs):
+    """
+    Shrinks the runs of hits from a battle into the moves shown in the log.
+
+    Every two runs (P1 hits P2 × a then P2 hits P1 × b) become
+    P1 hits P2 × (a - 1), a duo move (P1 hits P2 <-> P2 Hits P1)
+    and P2 hits P1 × (b - 1). Then repeated duos are merged.
+    """
+
+    moves = []
+    for index in range(0, len(runs) - 1, 2):
+        (first, first_repetitions), (second, second_repetitions) = runs[index], runs[index + 1]
+        moves += (_Move(attacker=first, duo=False, repetitions=first_repetitions - 1),
+                  _Move(attacker=first, duo=True, repetitions=1),
+                  _Move(attacker=second, duo=False, repetitions=second_repetitions - 1))
+    if len(runs) % 2 == 1:
+        moves.append(_Move(attacker=runs[-1][0], duo=False, repetitions=runs[-1][1]))
+
+    compressed_moves = []
+    for move in moves:
+        if move.repetitions <= 0:
+            continue
+        if len(compressed_moves) > 0 and compressed_moves[-1][:2] == move[:2]:
+            move = move._replace(repetitions=move.repetitions + compressed_moves[-1].repetitions)
+            compressed_moves[-1] = move
+        else:
+            compressed_moves.append(move)
+    return compressed_moves
+
+
+def _fighter_id(player):
+    return getattr(player, "q_id", getattr(player, "id", None))
+
+
+def _snapshot(player):
+    weapon = player.weapon
+    return _Fighter(id=_fighter_id(player), level=player.level, hp=player.hp,
+                    attack=player.attack, strg=player.strg, accy=player.accy, hit_chance=player.weapon_accy,
+                    weapon_id=weapon.id, weapon_damage=weapon.damage, melee=weapon.melee)
+
+
+def _battle_stats(fighter_one, fighter_two):
+    """
+    The hp, hit chance & damage per hit (before the damage modifier)
+    of both fighters. These don't change during a battle.
+    """
+
+    fighters = (fighter_one, fighter_two)
+    hp = [fighter.hp * util.clamp(5 - fighter.level, 1, 5) for fighter in fighters]
+    hit_chance = [fighter.hit_chance for fighter in fighters]
+    damage = []
+    for attacker, other in (fighters, fighters[::-1]):
+        damage.append((attacker.weapon_damage * (attacker.attack if attacker.melee else attacker.accy)) / other.strg)
+    return hp, hit_chance, damage
+
+
+def _fight(fighters, seed):
+    """
+    The battle itself. The same fighters & seed always give the same fight.
+    Returns the runs of (attacker, repetitions), the hits of each
+    fighter & the index of the winner (None for a draw).
+    """
+
+    hp, hit_chance, damage = _battle_stats(*fighters)
+    rng = random.Random(seed)
+    damage_modifier = 1.5
+    hit_count = [0, 0]  # p1 and p2 hit counter
+    runs = []
+
+    while hp[0] > 0 and hp[1] > 0:
+        hits = (rng.random() < hit_chance[0], rng.random() < hit_chance[1])
+        for attacker in (0, 1):
+            if hits[attacker]:
+                # Deal damage
+                hp[1 - attacker] -= damage[attacker] * damage_modifier
+                damage_modifier += 0.5
+                hit_count[attacker] += 1
+                if len(runs) > 0 and runs[-1][0] == attacker:
+                    runs[-1][1] += 1
+                else:
+                    runs.append([attacker, 1])
+
+    if hp[0] > hp[1]:
+        winner = 0
+    elif hp[0] < hp[1]:
+        winner = 1
+    else:
+        # Inconceivable
+        winner = None
+    return runs, hit_count, winner
+
+
+def _battle_results(opponents, replay):
+    runs, hit_count, winner = _fight(replay.fighters, replay.seed)
+    if winner is None:
+        winner_player = loser_player = None
+    else:
+        winner_player = opponents[winner].player
+        loser_player = opponents[1 - winner].player
+    # Results as a simple namedturple
+    return _BattleResults(moves=_compress_moves(runs), turn_count=hit_count[0] + hit_count[1],
+                          winner=winner_player, loser=loser_player, opponents=opponents,
+                          p1_hits=hit_count[0], p2_hits=hit_count[1], replay=replay)
+
+
 # quest, wager normal
 def battle(**battleargs):
     """
     Battles two player like things.
     Will return a log of the battle
-    """
 
-    current_move = 1
-    damage_modifier = 1.5
+    Hits are recorded as runs of (attacker, repetitions) & only
+    turned into text by get_battle_log.
+    A seed can be passed to get the same battle again (otherwise
+    it's random). The replay in the results can be re-run
+    with replay_battle.
+    """
 
     opponents = _Opponents(p1=_OpponentInfo(prefix=battleargs.get('p1_prefix', ""),
                                             player=battleargs.get('player_one')),
                            p2=_OpponentInfo(prefix=battleargs.get('p2_prefix', ""),
                                             player=battleargs.get('player_two')))
+    seed = battleargs.get('seed')
+    if seed is None:
+        # 63 bits so it fits in a BSON int
+        seed = random.getrandbits(63)
+    replay = _BattleReplay(seed=seed, fighters=(_snapshot(opponents.p1.player), _snapshot(opponents.p2.player)),
+                           version=REPLAY_VERSION)
+    return _battle_results(opponents, replay)
 
-    hp = [opponents.p1.player.hp * util.clamp(5 - opponents.p1.player.level, 1, 5),
-          opponents.p2.player.hp * util.clamp(5 - opponents.p2.player.level, 1, 5)]
-    hit_count = [0, 0]  # p1 and p2 hit counter
 
-    moves = OrderedDict()
-
-    def add_move(attacker, other, message=None):
-        nonlocal opponents, moves, current_move, damage_modifier
-        if message is None:
-            weapon = attacker.player.weapon
-            if weapon.id == weapons.NO_WEAPON_ID:
-                message = random.choice(BABY_MOVES)
-            else:
-                message = weapon.hit_message
-
-        player_num = opponents.index(attacker)
-        moves['%d/%d' % (player_num,
-                         current_move)] = _Move(message=("%s**%s** %s %s**%s**"
-                                                         % (attacker.prefix.title(),
-                                                            attacker.player.name_clean,
-                                                            message,
-                                                            other.prefix,
-                                                            other.player.name_clean)
-                                                         ), repetitions=1)
-        hit_count[player_num] += 1
-        current_move += 1
-        damage_modifier += 0.5
-
-    def shrink_repeats(moves_to_shrink):
-
-        """
-        Replaces consecutive repeated moves with 
-        moves with a single move with "repetitions"
-        """
-
-        last_move_id = None
-        moves_shrink_repeat = OrderedDict()
-        for move_id, move in moves_to_shrink.items():
-            if last_move_id is not None:
-                # If last move and this move are from the same player
-                if last_move_id[0] == move_id[0]:
-                    last_move = moves_shrink_repeat[last_move_id]
-                    move = move._replace(repetitions=move.repetitions + last_move.repetitions)
-                    move_id = last_move_id
-            moves_shrink_repeat[move_id] = move
-            last_move_id = move_id
-        return moves_shrink_repeat
-
-    def shrink_duos(moves_to_shrink):
-
-        """
-        Replaces moves that swich between players. With a single duo move.
-        
-        E.g.
-        
-        P1 hits P2
-        P2  hits P1
-        
-        to P1 hits P2 <-> P2 Hits P1
-        """
-
-        moves_shrink_duos = OrderedDict()
-        last_move_id = None
-        count = 0
-        for move_id, move in moves_to_shrink.items():
-            count += 1
-            if last_move_id is not None and count % 2 == 0:
-                last_move = moves_to_shrink[last_move_id]
-                moves_shrink_duos[last_move_id] = last_move._replace(repetitions=last_move.repetitions - 1)
-
-                moves_shrink_duos["Duo%d" % count] = _Move(message=last_move.message + " ⇆ " + move.message,
-                                                           repetitions=1)
-                moves_shrink_duos[move_id] = move._replace(repetitions=move.repetitions - 1)
-            last_move_id = move_id
-        if len(moves_to_shrink) % 2 == 1:
-            # Add missed move
-            odd_move = moves_to_shrink.popitem()
-            moves_shrink_duos[odd_move[0]] = odd_move[1]
-        for move_id, move in list(moves_shrink_duos.items()):
-            if move.repetitions <= 0:
-                del moves_shrink_duos[move_id]
-        return moves_shrink_duos
-
-    def compress_moves():
-
-        """
-        Shortcut for the full process to shrink the log
-        """
-        nonlocal moves
-        moves = shrink_repeats(shrink_duos(shrink_repeats(moves)))
-
-    def fight():
-        nonlocal opponents, damage_modifier
-
-        hits = [opponents.p1.player.weapon_hit(),
-                opponents.p2.player.weapon_hit()]
-
-        for hitter, hit in enumerate(hits):
-            if hit:
-                attacker = opponents.p1 if hitter == 0 else opponents.p2
-                other = opponents[1 - opponents.index(attacker)]
-                weapon_damage_modifier = attacker.player.attack
-                if not attacker.player.weapon.melee:
-                    weapon_damage_modifier = attacker.player.accy
-                # Deal damage
-                hp[1 - hitter] -= ((attacker.player.weapon.damage * weapon_damage_modifier)
-                                   / other.player.strg * damage_modifier)
-                add_move(attacker, other)
+def replay_battle(replay: _BattleReplay, opponents=None):
+    """
+    Re-runs a battle from its replay. The opponents in the
+    results are the fighter snapshots (not players) unless
+    the players (or things to show as them) are given.
+    """
 
-    while hp[0] > 0 and hp[1] > 0:
-        fight()
+    if replay.version != REPLAY_VERSION:
+        raise ValueError("Replay version %d can't be run (current version %d)" % (replay.version, REPLAY_VERSION))
+    if opponents is None:
+        opponents = replay.fighters
+    opponents = _Opponents(p1=_OpponentInfo(prefix="", player=opponents[0]),
+                           p2=_OpponentInfo(prefix="", player=opponents[1]))
+    return _battle_results(opponents, replay)
 
-    compress_moves()
-    if hp[0] > hp[1]:
-        winner = opponents.p1
-        loser = opponents.p2
-    elif hp[0] < hp[1]:
-        winner = opponents.p2
-        loser = opponents.p1
-    else:
-        # Inconceivable
-        winner = loser = None
-    turns = current_move - 1
-    moves["winner"] = _Move(message=(":trophy: %s**%s** wins in **%d** %s!"
-                                     % (winner.prefix.title(),
-                                        winner.player.name_clean,
-                                        turns,
-                                        util.s_suffix("turn", turns))
-                                     ), repetitions=1)
-    # Results as a simple namedturple
-    return _BattleResults(moves=moves, turn_count=turns, winner=winner.player,
-                          loser=loser.player, opponents=opponents, p1_hits=hit_count[0], p2_hits=hit_count[1])
+
+def get_replay_log(replay: _BattleReplay, names):
+    """
+    Creates a formatted embed of a replayed battle
+    (with the weapons the fighters had at the time)
+    """
+
+    opponents = [_ReplayOpponent(id=fighter.id, name_clean=name, weapon=weapons.get_weapon_from_id(fighter.weapon_id))
+                 for fighter, name in zip(replay.fighters, names)]
+    return _battle_log(replay_battle(replay, opponents))
+
+
+def replay_document(battle_log: _BattleLog, reason):
+    winner = battle_log.winner
+    return {"_id": ObjectId(), "seed": battle_log.replay.seed, "version": battle_log.replay.version,
+            "fighters": [fighter._asdict() for fighter in battle_log.replay.fighters],
+            "winner": _fighter_id(winner) if winner is not None else None,
+            "turn_count": battle_log.turn_count, "reason": reason, "date": datetime.utcnow()}
+
+
+def save_replay(battle_log: _BattleLog, reason):
+    """
+    Stores a battle replay & its result (for battles that may
+    need to be checked later). Returns the replay id.
+    """
+
+    document = replay_document(battle_log, reason)
+    asyncdb.run_later(dbconn.conn()["BattleReplays"].insert_one, document)
+    return str(document["_id"])
+
+
+def load_replay(document) -> _BattleReplay:
+    return _BattleReplay(seed=document["seed"], version=document["version"],
+                         fighters=tuple(_Fighter(**fighter) for fighter in document["fighters"]))
+
+
+async def find_replay(replay_id=None, reason=None):
+    """
+    Gets a saved replay document (or None). The latest one
+    (for the reason) if no id is given.
+    """
+
+    replays = asyncdb.conn()["BattleReplays"]
+    if replay_id is not None:
+        try:
+            return await replays.find_one({"_id": ObjectId(replay_id)})
+        except InvalidId:
+            return None
+    latest = await replays.find({"reason": reason} if reason is not None else {}, sort=[("date", -1)], limit=1)
+    return latest[0] if len(latest) > 0 else None
+
+
+def _create_replay_index():
+    # So replays don't pile up forever
+    dbconn.conn()["BattleReplays"].create_index("date", expireAfterSeconds=REPLAY_KEEP_TIME)
+
+
+def battle_odds(player_one, player_two, reward=0, risk=0, simulations=BATTLE_SIMULATIONS, seed=None):
+    """
+    Estimates player one's odds against player two by
+    running lots of battles at once (with numpy).
+
+    Only turns where someone hits change anything so those are all
+    that's simulated. reward & risk are what player one wins & loses
+    (to work out the expected reward). A seed gives the same odds every time.
+    """
+
+    start_hp, hit_chance, damage = _battle_stats(_snapshot(player_one), _snapshot(player_two))
+    hp = [numpy.full(simulations, player_hp, dtype=float) for player_hp in start_hp]
+
+    # Chance a turn has any hit & chance it's only player one's
+    hit_turn_chance = 1 - (1 - hit_chance[0]) * (1 - hit_chance[1])
+    p1_only_chance = hit_chance[0] * (1 - hit_chance[1])
+    hits = numpy.zeros(simulations, dtype=int)
+    active = numpy.arange(simulations)
+    rng = numpy.random.default_rng(seed)
+    while len(active) > 0 and hit_turn_chance > 0:
+        roll = rng.random(len(active)) * hit_turn_chance
+        p1_hit = roll < hit_chance[0]
+        p2_hit = roll >= p1_only_chance
+        # The damage modifier goes up 0.5 every hit (from 1.5)
+        damage_modifier = 1.5 + 0.5 * hits[active]
+        hp[1][active] -= p1_hit * damage[0] * damage_modifier
+        hits[active] += p1_hit
+        hp[0][active] -= p2_hit * damage[1] * (damage_modifier + 0.5 * p1_hit)
+        hits[active] += p2_hit
+        active = active[(hp[0][active] > 0) & (hp[1][active] > 0)]
+
+    win = numpy.count_nonzero(hp[0] > hp[1]) / simulations
+    loss = numpy.count_nonzero(hp[0] < hp[1]) / simulations
+    return _BattleOdds(win=win, draw=1 - win - loss, loss=loss, turns=hits.mean(),
+                       reward=win * reward - loss * risk)
+
+
+def describe_odds(odds: _BattleOdds):
+    return "**%.1f%%** chance to win (~%d %s)" % (odds.win * 100, round(odds.turns),
+                                                   util.s_suffix("turn", round(odds.turns)))
+
+
+_create_replay_index()
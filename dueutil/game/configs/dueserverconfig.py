@@ -1,5 +1,7 @@
+import copy
+
 from ..helpers.misc import DueMap
-from ... import dbconn, util
+from ... import asyncdb, dbconn, util
 
 muted_channels = DueMap()
 command_whitelist = DueMap()
@@ -11,19 +13,26 @@ General config for a particular guild
 """
 
 
+def _channel_key(channel):
+    # Channel ids are str keys (as they are in the db)
+    return channel.guild.id, str(channel.id)
+
+
 def update_server_config(guild, **update):
-    dbconn.conn()["serverconfigs"].update({'_id': guild.id}, {"$set": update}, upsert=True)
+    # Copied as the configs could change before the write is sent.
+    asyncdb.run_later(dbconn.conn()["serverconfigs"].update_one, {'_id': guild.id},
+                      {"$set": copy.deepcopy(update)}, upsert=True)
 
 
 def mute_level(channel):
-    key = f"{channel.guild.id}/{channel.id}"
+    key = _channel_key(channel)
     if key in muted_channels:
         return muted_channels[key]
     return -1
 
 
 def whitelisted_commands(channel):
-    key = f"{channel.guild.id}/{channel.id}"
+    key = _channel_key(channel)
     if key in command_whitelist:
         return command_whitelist[key]
 
@@ -31,7 +40,7 @@ def whitelisted_commands(channel):
 def set_command_whitelist(channel, command_list):
     # Todo fix blacklist
     global command_whitelist
-    key = f"{channel.guild.id}/{channel.id}"
+    key = _channel_key(channel)
     if len(command_list) != 0:
         command_whitelist[key] = command_list
     elif key in command_whitelist:
@@ -40,7 +49,7 @@ def set_command_whitelist(channel, command_list):
 
 
 def mute_channel(channel, **options):
-    key = f"{channel.guild.id}/{channel.id}"
+    key = _channel_key(channel)
     prior_mute_level = mute_level(channel)
     new_level = options.get('mute_all', False)
     if prior_mute_level != new_level:
@@ -51,7 +60,7 @@ def mute_channel(channel, **options):
 
 
 def unmute_channel(channel):
-    key = f"{channel.guild.id}/{channel.id}"
+    key = _channel_key(channel)
     if key in muted_channels:
         del muted_channels[key]
         update_server_config(channel.guild, **{"muted_channels": muted_channels[channel.guild]})
@@ -137,7 +137,7 @@ async def process_transactions():
                 source = transaction.get('from')
                 source_id = source.get('id')
 
-                player = players.find_player(user_id)
+                player = await players.fetch_player(user_id)
                 if player is None or payout < 1:
                     await reverse_transaction(user_id, source_id, payout, transaction_id)
                     client.run_task(notify_complete, user_id, transaction, failed=True)
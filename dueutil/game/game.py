@@ -6,7 +6,7 @@ import time
 import generalconfig as gconf
 from . import gamerules
 from .. import events
-from .. import util, dbconn
+from .. import asyncdb, tasks, util
 from ..game import players
 from ..game import stats, weapons, quests, awards
 from ..game.configs import dueserverconfig
@@ -19,6 +19,7 @@ from ..game.helpers import imagehelper
 # from threading import Lock
 
 SPAM_TOLERANCE = 50
+PROGRESS_COOLDOWN = 60
 # For awards in the first week. Not permanent.
 old_players = open('oldplayers.txt').read()  # For comeback award
 testers = open('testers.txt').read()  # For testers award
@@ -41,7 +42,7 @@ def get_spam_level(player, message_content):
 
 
 def progress_time(player):
-    return time.time() - player.last_progress >= 60
+    return time.time() - player.last_progress >= PROGRESS_COOLDOWN
 
 
 def quest_time(player):
@@ -85,7 +86,7 @@ async def player_message(message, player, spam_level):
                 await awards.give_award(message.channel, player, "Donor",
                                         "Donate to BattleBanana!!! :money_with_wings: :money_with_wings: :money_with_wings:")
             # DueUtil tech award
-            if dbconn.conn()["dueutiltechusers"].find({"_id": player.id}).count() > 0:
+            if await asyncdb.conn()["dueutiltechusers"].count_documents({"_id": player.id}) > 0:
                 if "DueUtilTech" not in player.awards:
                     player.inventory["themes"].append("dueutil.tech")
                 await awards.give_award(message.channel, player, "DueUtilTech", "<https://battlebanana.xyz/>")
@@ -141,6 +142,15 @@ async def check_for_level_up(ctx, player):
     Handles player level ups.
     """
 
+    await send_level_up(ctx, player, level_up(player))
+
+
+def level_up(player):
+    """
+    Levels up a player as far as their exp goes.
+    Returns the money rewarded.
+    """
+
     exp_for_next_level = gamerules.get_exp_for_next_level(player.level)
     level_up_reward = 0
     while player.exp >= exp_for_next_level:
@@ -153,6 +163,10 @@ async def check_for_level_up(ctx, player):
 
         exp_for_next_level = gamerules.get_exp_for_next_level(player.level)
     stats.increment_stat(stats.Stat.MONEY_CREATED, level_up_reward)
+    return level_up_reward
+
+
+async def send_level_up(ctx, player, level_up_reward):
     if level_up_reward > 0:
         if dueserverconfig.mute_level(ctx.channel) < 0:
             await imagehelper.level_up_screen(ctx, player, level_up_reward)
@@ -247,20 +261,58 @@ async def check_for_removed_stats(player):
         delattr(player, "language")
 
 
+# Player id -> when on_message could next do something for them.
+# (Saves loading players that are on cooldown)
+# Entries that have passed are dropped, so this only holds recent authors.
+_next_message_time = dict()
+
+
+def _next_time(player):
+    return min(player.last_progress + PROGRESS_COOLDOWN, player.last_quest + quests.QUEST_COOLDOWN)
+
+
+def message_eligible(message):
+    """
+    Cheap check for if on_message could do anything with a message.
+    Only players off cooldown (or mentioning the old bot) get through.
+    The other checks (recalls etc) wait till the player's next turn.
+    """
+
+    author_id = message.author.id
+    if author_id not in players.registered_players:
+        return False
+    next_time = _next_message_time.get(author_id)
+    if next_time is None or time.time() >= next_time:
+        _next_message_time.pop(author_id, None)
+        return True
+    return gconf.DEAD_BOT_ID in message.raw_mentions
+
+
 async def on_message(message):
-    player = players.find_player(message.author.id)
+    player = await players.fetch_player(message.author.id)
     spam_level = 100
-    if player is not None:
-        if not player.is_playing(message.author):
-            return
-        if quest_time(player) or progress_time(player):
-            spam_level = get_spam_level(player, message.content)
+    if player is None:
+        return
+    if not player.is_playing(message.author):
+        _next_message_time[player.id] = time.time() + PROGRESS_COOLDOWN
+        return
+    if quest_time(player) or progress_time(player):
+        spam_level = get_spam_level(player, message.content)
     await player_message(message, player, spam_level)
-    if player is not None:
-        await manage_quests(message, player, spam_level)
-        await check_for_recalls(message, player)
-        await check_for_missing_new_stats(player)
-        await check_for_removed_stats(player)
+    await manage_quests(message, player, spam_level)
+    await check_for_recalls(message, player)
+    await check_for_missing_new_stats(player)
+    await check_for_removed_stats(player)
+    _next_message_time[player.id] = _next_time(player)
+
+
+@tasks.task(timeout=PROGRESS_COOLDOWN * 10)
+def prune_message_times():
+    # For players that have not messaged since their time passed
+    now = time.time()
+    for player_id, next_time in list(_next_message_time.items()):
+        if now >= next_time:
+            _next_message_time.pop(player_id, None)
 
 
-events.register_message_listener(on_message)
+events.register_message_listener(on_message, message_eligible)
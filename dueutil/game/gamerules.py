@@ -1,13 +1,36 @@
+import ast
 import json
+from bisect import bisect_right
 
 from .. import dbconn
 
 exp_per_level = dict()
+# exp_for_next_level[level] (level 0 is not a level)
+exp_for_next_level = [-1]
+# total_exp_for_level[level - 1] is the exp needed to get past level
+total_exp_for_level = []
 
 """
 Some values needed for player, quests & etc
 """
 
+# The only things allowed in progression expressions
+_EXPRESSION_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Load,
+                     ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.USub, ast.UAdd)
+
+
+def _compile_expression(expression):
+    tree = ast.parse(expression, mode="eval")
+    for node in ast.walk(tree):
+        if not isinstance(node, _EXPRESSION_NODES) or isinstance(node, ast.Name) and node.id != "oldLevel":
+            raise ValueError("Bad progression expression: %s" % expression)
+    return compile(tree, "progression.json", "eval")
+
+
+def _parse_levels(levels):
+    bounds = [int(level) for level in levels.split(",")]
+    return range(bounds[0], bounds[-1] + 1)
+
 
 def _load_game_rules():
     with open('dueutil/game/configs/progression.json') as progression_file:
@@ -15,35 +38,43 @@ def _load_game_rules():
         exp = progression["dueutil-ranks"]
         # for web
         expanded_exp_per_level = dict()
+        exp_for_levels = dict()
         for levels, exp_details in exp.items():
-            if "," in levels:
-                level_range = eval("range(" + levels + "+1)")
-            else:
-                level_range = eval("range(" + levels + "," + levels + "+1)")
+            level_range = _parse_levels(levels)
             exp_expression = str(exp_details["expForNextLevel"])
             expanded_exp_per_level[','.join(map(str, level_range))] = exp_per_level[level_range] = exp_expression
+            # Each expression is worked out once per level here (not every call)
+            expression = _compile_expression(exp_expression)
+            for level in level_range:
+                exp_for_levels[level] = int(eval(expression, {"__builtins__": {}}, {"oldLevel": level}))
+    # Levels should be 1 - max with no gaps (anything after a gap is not reachable)
+    level = 1
+    while level in exp_for_levels:
+        exp_for_next_level.append(exp_for_levels[level])
+        total_exp_for_level.append((total_exp_for_level[-1] if level > 1 else 0) + exp_for_levels[level])
+        level += 1
     dbconn.drop_and_insert("gamerules", expanded_exp_per_level)
 
 
 def get_exp_for_next_level(level):
-    for level_range, exp_details in exp_per_level.items():
-        if level in level_range:
-            return int(eval(exp_details.replace("oldLevel", str(level))))
+    if 1 <= level < len(exp_for_next_level) and level == int(level):
+        return exp_for_next_level[int(level)]
     return -1
 
 
 def get_exp_for_level(level):
-    return sum([get_exp_for_next_level(level) for level in range(1, level)])
+    if level <= 1:
+        return 0
+    max_level = len(total_exp_for_level)
+    if level - 1 <= max_level:
+        return total_exp_for_level[level - 2]
+    # Levels over the max count as -1 exp
+    return total_exp_for_level[-1] - (level - 1 - max_level)
 
 
 def get_level_from_exp(exp):
-    level = 1
-    while 1:
-        exp -= get_exp_for_next_level(level)
-        if exp < 0:
-            break
-        level += 1
-    return level
+    # The first level that the exp does not get past
+    return bisect_right(total_exp_for_level, exp) + 1
 
 
 def get_level_for_prestige(prestige):
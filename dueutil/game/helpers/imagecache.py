@@ -3,7 +3,7 @@ import os
 import re
 from PIL import Image
 
-from ... import dbconn, util, tasks
+from ... import asyncdb, dbconn, util, tasks
 
 
 class _CacheStats:
@@ -108,8 +108,8 @@ def get_cached_filename(name):
 
 
 @tasks.task(timeout=3600)
-def save_cache_info():
-    dbconn.insert_object("stats", stats)
+async def save_cache_info():
+    await asyncdb.insert_object("stats", stats)
 
 
 def _load():
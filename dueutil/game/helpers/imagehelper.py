@@ -460,7 +460,7 @@ async def stats_screen(ctx, player):
                      content=":pen_fountain: **" + player.get_name_possession_clean() + "** information.")
 
 
-async def quest_screen(ctx, quest):
+async def quest_screen(ctx, quest, content=":pen_fountain: Here you go."):
     image = quest_info_template.copy()
 
     try:
@@ -492,7 +492,7 @@ async def quest_screen(ctx, quest):
     draw.text((203 - width, 207), weapon_name, "white", font=font)
 
     if quest_info is not None:
-        creator = get_text_limit_len(draw, quest_info.creator, font, 119)
+        creator = get_text_limit_len(draw, await quest_info.get_creator(), font, 119)
         home = get_text_limit_len(draw, quest_info.home, font, 146)
     else:
         creator = "Unknown"
@@ -505,7 +505,7 @@ async def quest_screen(ctx, quest):
     width = draw.textsize(reward, font=font_med)[0]
     draw.text((203 - width, 266), reward, DUE_BLACK, font=font_med)
 
-    await send_image(ctx, image, "r", file_name="questinfo.png", content=":pen_fountain: Here you go.")
+    await send_image(ctx, image, "r", file_name="questinfo.png", content=content)
 
 
 async def battle_screen(ctx, player_one, player_two):
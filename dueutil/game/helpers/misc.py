@@ -8,10 +8,15 @@ from abc import ABC
 from bs4 import BeautifulSoup
 
 import generalconfig as gconf
-from dueutil import dbconn, util
+from dueutil import asyncdb, dbconn, util
 from . import imagecache
 
+# Items per page (paginator)
+PAGE_SIZE = 12
 POSITIVE_BOOLS = ('true', '1', 't', 'y', 'yes', 'yeah', 'yup', 'certainly', 'uh-huh')
+# Old style string ids are parsed once (and kept in this cache)
+DUEMAP_KEY_CACHE_SIZE = 65536
+_parsed_duemap_keys = dict()
 auto_replies = []
 GLITTER_TEXT_URL = ("http://www.gigaglitters.com/procesing.php?text=%s"
                     + "&size=90&text_color=img/DCdarkness.gif"
@@ -80,7 +85,7 @@ class BattleBananaObject:
 
     def save(self):
         if not self.no_save:
-            dbconn.insert_object(self.id, self)
+            dbconn.queue_object(self.id, self)
 
     def __setattr__(self, name, value):
         current_thread = threading.current_thread()
@@ -101,73 +106,79 @@ class BattleBananaObject:
     def __del__(self):
         try:
             if hasattr(self, "image_url"):
-                if dbconn.get_collection_for_object(self.__class__).find_one({"_id": self.id}) is None:
-                    imagecache.uncache(self.image_url)
-                    util.logger.info("%s, (%s) has been deleted" % (self.__class__.__name__, self.id))
-        except (TypeError, AttributeError):
+                # Objects can be freed on a shard loop. Don't block it on the db.
+                asyncdb.run_later(_uncache_if_deleted, self.__class__, self.id, self.image_url)
+        except (TypeError, AttributeError, RuntimeError):
             pass  # del is being called as the script as been stopped.
 
 
+def _uncache_if_deleted(object_class, object_id, image_url):
+    if dbconn.get_collection_for_object(object_class).find_one({"_id": object_id}) is None:
+        imagecache.uncache(image_url)
+        util.logger.info("%s, (%s) has been deleted" % (object_class.__name__, object_id))
+
+
 #### MacDue's wacky data clases (monkey patches)
 class DueMap(collections.abc.MutableMapping):
     """
     
     A 2D Mapping for things & items
-    E.g. Key "ServerID/Name"
+    E.g. Key (Guild.id, item name)
     or Guild & Item
-    where the key is Guild.id/Item.name
     
+    Items are stored in a dict per guild (or other group
+    like "STOCK") so tuple keys are just two dict lookups.
+    
+    Old style string keys still work:
+      "ServerID/Name"
     or key with addtional data:
       some.id+data/item.name
       (some id can't contain any '/' or '+'s)
       and the data can't contain any '/'s
+    These are parsed once & cached. Numeric ids become ints
+    so "1234/name", (1234, "name") & Guild(1234) all match.
    
     This mapping will return an empty dict or None
     if the guild or item does not exist!
     
     Happens to be quite useful
     
-    TODO: REWRITE (if becomes apparent this mapping is slow)
-    
     """
 
     def __init__(self):
         self.collection = dict()
 
     def __getitem__(self, key):
-        key = self._parse_key(key)
-        if isinstance(key, list):
-            if key[0] in self.collection and key[1] in self.collection[key[0]]:
-                return self.collection[key[0]][key[1]]
-            return None
-        if key in self.collection:
-            return self.collection[key]
-        return {}
+        group, item = self._key(key)
+        items = self.collection.get(group)
+        if item is None:
+            return items if items is not None else {}
+        if items is not None:
+            return items.get(item)
+        return None
 
     def __contains__(self, key):
-        key = self._parse_key(key)
-        if isinstance(key, list):
-            return key[0] in self.collection and key[1] in self.collection[key[0]]
-        return key in self.collection
+        group, item = self._key(key)
+        if item is None:
+            return group in self.collection
+        items = self.collection.get(group)
+        return items is not None and item in items
 
     def __setitem__(self, key, value):
-        key = self._parse_key(key, value)
-        if isinstance(key, list):
-            if key[0] not in self.collection:
-                items = dict()
-                items[key[1]] = value
-                self.collection[key[0]] = items
-            else:
-                self.collection[key[0]][key[1]] = value
+        group, item = self._key(key, value)
+        if item is None:
+            self.collection[group] = value
+        elif group not in self.collection:
+            self.collection[group] = {item: value}
         else:
-            self.collection[key] = value
+            self.collection[group][item] = value
 
     def __delitem__(self, key):
-        key = self._parse_key(key)
-        if isinstance(key, list):
-            del self.collection[key[0]][key[1]]
+        group, item = self._key(key)
+        if item is None:
+            del self.collection[group]
         else:
-            del self.collection[key]
+            del self.collection[group][item]
 
     def __iter__(self):
         return iter(self.collection)
@@ -179,19 +190,40 @@ class DueMap(collections.abc.MutableMapping):
         return "DueMap(%s)" % str(self.collection)
 
     @staticmethod
-    def _parse_key(key, value=None):
-        if isinstance(key, int):
-            key = str(key)
-        if isinstance(key, discord.Guild):
-            if value is not None:
-                return [str(key.id), value.name]
-            return str(key.id)
-        elif "/" not in key:
+    def _key(key, value=None):
+        """
+        Returns (group, item) where item is None for a whole group
+        """
+
+        key_type = type(key)
+        if key_type is tuple:
             return key
-        key = key.split('/', 1)
-        if '+' in key[0]:
-            key[0] = key[0].split('+')[0]
-        return key
+        elif key_type is str:
+            parsed_key = _parsed_duemap_keys.get(key)
+            if parsed_key is None:
+                parsed_key = DueMap._parse_key(key)
+            return parsed_key
+        elif isinstance(key, int):
+            return key, None
+        elif isinstance(key, discord.Guild):
+            if value is not None:
+                return key.id, value.name
+            return key.id, None
+        return DueMap._parse_key(key)
+
+    @staticmethod
+    def _parse_key(key):
+        group, separator, item = key.partition('/')
+        if separator == "":
+            item = None
+        else:
+            group = group.split('+', 1)[0]
+        if group.isdigit():
+            group = int(group)
+        if len(_parsed_duemap_keys) >= DUEMAP_KEY_CACHE_SIZE:
+            _parsed_duemap_keys.clear()
+        _parsed_duemap_keys[key] = group, item
+        return group, item
 
 
 class Ring(list):
@@ -261,7 +293,7 @@ def paginator(item_add):
     """
 
     def page_getter(item_list, page, title, **extras):
-        page_size = 12
+        page_size = PAGE_SIZE
         page_embed = discord.Embed(title=title + (" : Page " + str(page + 1) if page > 0 else ""), type="rich",
                                    color=gconf.DUE_COLOUR)
         if len(item_list) > 0 or page != 0:
@@ -1,7 +1,9 @@
+import numpy
 import threading
 import time
-from cachetools.func import ttl_cache
-from collections import namedtuple
+from collections import defaultdict, namedtuple
+from itertools import chain
+from sortedcontainers import SortedList
 
 from .. import events, util, dbconn
 from ..game import players
@@ -9,65 +11,480 @@ from ..game import players
 leaderboards = dict()
 last_leaderboard_update = 0
 UPDATE_INTERVAL = 3600 / 12
+# Saved ranks are written here before replacing the old ones
+STAGING_SUFFIX = "_staging"
+RANK_CHUNK_SIZE = 10000
 
 _LocalLeaderboard = namedtuple("LocalLeaderboard", ["updated", "data"])
+# projection is the Mongo expression for the value in a Player document.
+# indexed_field is set for live leaderboards (they're loaded from a (field desc, _id) index).
+_Metric = namedtuple("Metric", ["name", "projection", "sort_function", "indexed_field"])
 
+# Leaderboards (all highest first). Live ones are updated as players change
+# the rest are recalculated from a snapshot every UPDATE_INTERVAL.
+METRICS = {
+    "levels": _Metric("Total EXP", "$total_exp", lambda player: player.total_exp, "total_exp"),
+    "money": _Metric("Money", "$money", lambda player: player.money, None),
+    "quests": _Metric("Quests Won", "$quests_won", lambda player: player.quests_won, None),
+    "wagers": _Metric("Wagers Won", "$wagers_won", lambda player: player.wagers_won, None),
+    "prestige": _Metric("Prestige", "$prestige_level", lambda player: player.prestige_level, None),
+    "awards": _Metric("Awards", {"$size": {"$ifNull": ["$awards", []]}}, lambda player: len(player.awards), None)
+}
 
-def calculate_player_rankings(rank_name, sort_function, reverse=True):
-    ranked_players = sorted(filter(lambda player: player.id != util.gconf.DEAD_BOT_ID, players.players.values()),
-                            key=sort_function, reverse=reverse)
-    # ranked_players = []
-    leaderboards[rank_name] = (tuple(player.id for player in ranked_players), sort_function, reverse)
-    db = dbconn.conn()
-    db.drop_collection(rank_name)
-    for rank, player_id in enumerate(leaderboards[rank_name][0]):
-        db[rank_name].insert({"rank": rank + 1, "player_id": player_id})
 
+def is_live(rank_name):
+    return METRICS[rank_name].indexed_field is not None
+
+
+class Ranking:
+    """
+    Player ids ordered by a sort function. Kept up to date as
+    players change, so ranks & pages are O(log n) lookups rather
+    than an hourly re-sort.
+
+    Indexing/slicing gives player ids (like the old tuple of ids).
+    """
+
+    def __init__(self, sort_function, reverse=True):
+        self.sort_function = sort_function
+        self.reverse = reverse
+        self.keys = dict()
+        self.ranked = SortedList()
+        # Local leaderboards (guild id -> SortedList of the guild's players keys)
+        # These are only made for guilds that ask for them.
+        self.guild_rankings = dict()
+        self.player_guilds = defaultdict(set)
+        # Players progress on every shard thread
+        self.lock = threading.Lock()
+
+    @property
+    def updated(self):
+        return time.time()
+
+    def load(self, player_ids, values):
+        """
+        Replaces the ranking (player_ids & values are in rank order)
+        """
+        keys = [(-value if self.reverse else value, player_id) for player_id, value in zip(player_ids, values)]
+        with self.lock:
+            # Already sorted so this is linear
+            self.ranked = SortedList(keys)
+            self.keys = dict(zip(player_ids, keys))
+            self.guild_rankings = dict()
+            self.player_guilds = defaultdict(set)
+
+    def update(self, player):
+        self.set_value(player.id, self.sort_function(player))
+
+    def set_value(self, player_id, value):
+        # Ties are ordered by id
+        key = (-value if self.reverse else value, player_id)
+        with self.lock:
+            old_key = self.keys.get(player_id)
+            if old_key == key:
+                return
+            if old_key is not None:
+                self.ranked.remove(old_key)
+            else:
+                # New player. Could be in any indexed guild.
+                self._find_guilds(player_id)
+            self.keys[player_id] = key
+            self.ranked.add(key)
+            for guild_id in self.player_guilds.get(player_id, ()):
+                guild_ranking = self.guild_rankings[guild_id]
+                if old_key is not None:
+                    guild_ranking.remove(old_key)
+                guild_ranking.add(key)
+
+    def remove(self, player_id):
+        with self.lock:
+            key = self.keys.pop(player_id, None)
+            if key is not None:
+                self.ranked.remove(key)
+                for guild_id in self.player_guilds.pop(player_id, ()):
+                    self.guild_rankings[guild_id].remove(key)
+
+    def local(self, guild):
+        """
+        The ranking of the players in a guild
+        """
+        with self.lock:
+            if guild.id not in self.guild_rankings:
+                guild_ranking = self.guild_rankings[guild.id] = SortedList()
+                for member in guild.members:
+                    key = self.keys.get(member.id)
+                    if key is not None:
+                        guild_ranking.add(key)
+                        self.player_guilds[member.id].add(guild.id)
+        return GuildRanking(self, guild.id)
+
+    def add_member(self, guild_id, player_id):
+        with self.lock:
+            guild_ranking = self.guild_rankings.get(guild_id)
+            key = self.keys.get(player_id)
+            if guild_ranking is not None and key is not None and guild_id not in self.player_guilds[player_id]:
+                guild_ranking.add(key)
+                self.player_guilds[player_id].add(guild_id)
+
+    def remove_member(self, guild_id, player_id):
+        with self.lock:
+            if guild_id in self.player_guilds.get(player_id, ()):
+                self.guild_rankings[guild_id].remove(self.keys[player_id])
+                self.player_guilds[player_id].discard(guild_id)
+
+    def remove_guild(self, guild_id):
+        with self.lock:
+            for _, player_id in self.guild_rankings.pop(guild_id, ()):
+                self.player_guilds[player_id].discard(guild_id)
+
+    def _find_guilds(self, player_id):
+        for guild_id in self.guild_rankings:
+            guild = util.get_guild(guild_id)
+            if guild is not None and guild.get_member(player_id) is not None:
+                self.player_guilds[player_id].add(guild_id)
+
+    def rank(self, player_id):
+        with self.lock:
+            key = self.keys.get(player_id)
+            if key is None:
+                return -1
+            return self.ranked.index(key) + 1
+
+    def __getitem__(self, index):
+        with self.lock:
+            if isinstance(index, slice):
+                return [player_id for _, player_id in self.ranked[index]]
+            return self.ranked[index][1]
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __len__(self):
+        return len(self.ranked)
+
+
+class GuildRanking:
+    """
+    A guild's view of a Ranking. Same interface (ids by rank).
+    """
+
+    def __init__(self, ranking, guild_id):
+        self.ranking = ranking
+        self.guild_id = guild_id
+
+    def rank(self, player_id):
+        with self.ranking.lock:
+            if self.guild_id not in self.ranking.player_guilds.get(player_id, ()):
+                return -1
+            return self.ranking.guild_rankings[self.guild_id].index(self.ranking.keys[player_id]) + 1
+
+    def __getitem__(self, index):
+        with self.ranking.lock:
+            guild_ranking = self.ranking.guild_rankings.get(self.guild_id, ())
+            if isinstance(index, slice):
+                return [player_id for _, player_id in guild_ranking[index]]
+            return guild_ranking[index][1]
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __len__(self):
+        return len(self.ranking.guild_rankings.get(self.guild_id, ()))
+
+
+class SnapshotRanking:
+    """
+    Player ids ranked as of the last snapshot. Uses arrays rather
+    than a SortedList as it's only replaced (or has deleted players
+    taken out).
+    """
+
+    def __init__(self, ranked_ids=None, updated=0):
+        # Snapshots are loaded on the leaderboard thread & players deleted on shards
+        self.lock = threading.Lock()
+        self.load(numpy.empty(0, dtype=numpy.int64) if ranked_ids is None else ranked_ids, updated)
+
+    def load(self, ranked_ids, updated=None):
+        with self.lock:
+            self._set_snapshot(ranked_ids)
+            self.updated = time.time() if updated is None else updated
+
+    def _set_snapshot(self, ranked_ids):
+        id_order = numpy.argsort(ranked_ids, kind="stable")
+        # Replaced in one go (as read by other threads)
+        self.snapshot = (ranked_ids, ranked_ids[id_order], id_order)
+        self.guild_rankings = dict()
+
+    def rank(self, player_id):
+        ranked_ids, sorted_ids, ranks = self.snapshot
+        if not is_ranked_id(player_id) or abs(player_id) > players.MAX_PLAYER_ID:
+            return -1
+        index = numpy.searchsorted(sorted_ids, player_id)
+        if index < len(sorted_ids) and sorted_ids[index] == player_id:
+            return int(ranks[index]) + 1
+        return -1
+
+    def local(self, guild):
+        guild_ranking = self.guild_rankings.get(guild.id)
+        if guild_ranking is None:
+            ranked_ids, sorted_ids, ranks = self.snapshot
+            member_ids = numpy.fromiter((member.id for member in guild.members), dtype=numpy.int64)
+            indexes = numpy.searchsorted(sorted_ids, member_ids).clip(max=max(len(sorted_ids) - 1, 0))
+            found = indexes[sorted_ids[indexes] == member_ids] if len(sorted_ids) > 0 else indexes[:0]
+            guild_ranking = SnapshotRanking(ranked_ids[numpy.sort(ranks[found])], self.updated)
+            self.guild_rankings[guild.id] = guild_ranking
+        return guild_ranking
+
+    # Snapshots are not changed as players are.
+    def update(self, player):
+        pass
+
+    def remove(self, player_id):
+        # Deleted players are taken out now (not at the next snapshot)
+        with self.lock:
+            rank = self.rank(player_id)
+            if rank != -1:
+                self._set_snapshot(numpy.delete(self.snapshot[0], rank - 1))
+
+    def add_member(self, guild_id, player_id):
+        pass
+
+    def remove_member(self, guild_id, player_id):
+        pass
+
+    def remove_guild(self, guild_id):
+        self.guild_rankings.pop(guild_id, None)
 
-def calculate_level_leaderboard():
-    calculate_player_rankings("levels", lambda player: player.total_exp)
+    def __getitem__(self, index):
+        ranked_ids = self.snapshot[0]
+        if isinstance(index, slice):
+            return ranked_ids[index].tolist()
+        return int(ranked_ids[index])
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __len__(self):
+        return len(self.snapshot[0])
+
+
+def is_ranked(player):
+    # Not subclasses (ActiveQuests are Players too)
+    return type(player) is players.Player and is_ranked_id(player.id)
+
+
+def is_ranked_id(player_id):
+    return isinstance(player_id, int) and player_id != util.gconf.DEAD_BOT_ID
+
+
+def update_player(player):
+    if is_ranked(player):
+        for ranking in leaderboards.values():
+            ranking.update(player)
+
+
+def remove_player(player_id):
+    for ranking in leaderboards.values():
+        ranking.remove(player_id)
+
+
+def member_joined(member):
+    for ranking in leaderboards.values():
+        ranking.add_member(member.guild.id, member.id)
+
+
+def member_left(member):
+    for ranking in leaderboards.values():
+        ranking.remove_member(member.guild.id, member.id)
+
+
+def guild_removed(guild):
+    for ranking in leaderboards.values():
+        ranking.remove_guild(guild.id)
+
+
+def _rank_index(field):
+    return [(field, dbconn.DESCENDING), ("_id", dbconn.ASCENDING)]
+
+
+def create_indexes():
+    # Does nothing if they already exist
+    collection = dbconn.get_collection_for_object(players.Player)
+    for metric in METRICS.values():
+        if metric.indexed_field is not None:
+            collection.create_index(_rank_index(metric.indexed_field))
+
+
+def load_blob_players():
+    """
+    Loads the players still stored as a jsonpickle blob (queuing them
+    to be rewritten in the native schema). Only done at start up, the
+    snapshots after that leave out any that are left.
+    """
+    collection = dbconn.get_collection_for_object(players.Player)
+    blob_players = []
+    for document in collection.find({"data": {"$exists": True}}):
+        if not is_ranked_id(document["_id"]):
+            continue
+        player = players.players.get(document["_id"])
+        if player is None:
+            # Old blobs can be missing newer stats
+            player = util.load_and_update(players.REFERENCE_PLAYER, dbconn.load_object(document, players.Player))
+        blob_players.append(player)
+    return blob_players
+
+
+def snapshot_players(rank_names, blob_players=()):
+    """
+    Reads the values of some leaderboards for every (native) player
+    as columns, projecting just the values needed.
+    Returns the player ids & a dict of rank name -> values.
+    """
+    metrics = {rank_name: METRICS[rank_name] for rank_name in rank_names}
+    player_ids = []
+    columns = {rank_name: [] for rank_name in metrics}
+    if len(metrics) == 0:
+        return player_ids, columns
+    projection = {rank_name: metric.projection for rank_name, metric in metrics.items()}
+    player_indexes = dict()
+    collection = dbconn.get_collection_for_object(players.Player)
+    documents = collection.aggregate([{"$match": {"data": {"$exists": False}}}, {"$project": projection}],
+                                     allowDiskUse=True)
+    blob_documents = ({"_id": player.id, **{rank_name: metric.sort_function(player)
+                                             for rank_name, metric in metrics.items()}}
+                      for player in blob_players)
+    for document in chain(documents, blob_documents):
+        player_id = document["_id"]
+        if not is_ranked_id(player_id):
+            continue
+        player_indexes[player_id] = len(player_ids)
+        player_ids.append(player_id)
+        for rank_name, column in columns.items():
+            value = document.get(rank_name)
+            column.append(value if isinstance(value, (int, float)) else 0)
+    # Cached players could have changes that are not saved yet.
+    for player in list(players.players.values()):
+        if player.id in player_indexes:
+            for rank_name, metric in metrics.items():
+                columns[rank_name][player_indexes[player.id]] = metric.sort_function(player)
+    return player_ids, columns
+
+
+def load_indexed_ranking(rank_name, blob_players=()):
+    """
+    Loads a live leaderboard with a covered scan of its index
+    (already in rank order). Then it's kept up to date as players change.
+    """
+    metric = METRICS[rank_name]
+    field = metric.indexed_field
+    collection = dbconn.get_collection_for_object(players.Player)
+    player_ids = []
+    values = []
+    for document in collection.find({field: {"$exists": True}}, {field: 1}).hint(_rank_index(field)):
+        value = document[field]
+        if is_ranked_id(document["_id"]) and isinstance(value, (int, float)):
+            player_ids.append(document["_id"])
+            values.append(value)
+    ranking = leaderboards.setdefault(rank_name, Ranking(metric.sort_function))
+    ranking.load(player_ids, values)
+    # Cached players could have changes that are not saved yet.
+    for player in chain(blob_players, list(players.players.values())):
+        if is_ranked(player):
+            ranking.update(player)
+
+
+def load_leaderboards(rank_names, blob_players=()):
+    """
+    (Re)calculates leaderboards. Live ones come from their index, the
+    rest from a snapshot of every player (sorted in one vectorized pass).
+    """
+    start_time = time.time()
+    player_ids, columns = snapshot_players([rank_name for rank_name in rank_names if not is_live(rank_name)],
+                                           blob_players)
+    rank_columns(player_ids, columns)
+    for rank_name in rank_names:
+        if is_live(rank_name):
+            load_indexed_ranking(rank_name, blob_players)
+    util.logger.info("Calculated %d leaderboards (%d players) in %.2fs",
+                     len(rank_names), len(player_ids), time.time() - start_time)
+
+
+def rank_columns(player_ids, columns):
+    """
+    Loads the leaderboards from columns of values (rank name -> values)
+    """
+    id_array = numpy.array(player_ids, dtype=numpy.int64)
+    for rank_name, column in columns.items():
+        # Highest first. Ties by id (like Ranking)
+        order = numpy.lexsort((id_array, -numpy.array(column, dtype=numpy.float64)))
+        if is_live(rank_name):
+            ranking = leaderboards.setdefault(rank_name, Ranking(METRICS[rank_name].sort_function))
+            # (Indexing with numpy ints one at a time is slow)
+            ranking.load(id_array[order].tolist(), [column[index] for index in order.tolist()])
+        else:
+            leaderboards.setdefault(rank_name, SnapshotRanking()).load(id_array[order])
+
+
+def calculate_player_rankings(rank_name):
+    """
+    Saves the ranks for the website. They're written to a staging
+    collection then renamed over the old ranks, so the website
+    never sees an empty (or half written) leaderboard.
+    """
+    start_time = time.time()
+    db = dbconn.conn()
+    staging_name = rank_name + STAGING_SUFFIX
+    db.drop_collection(staging_name)
+    ranked_players = leaderboards[rank_name][:]
+    for chunk_start in range(0, len(ranked_players), RANK_CHUNK_SIZE):
+        chunk = ranked_players[chunk_start:chunk_start + RANK_CHUNK_SIZE]
+        db[staging_name].insert_many([{"rank": chunk_start + rank + 1, "player_id": player_id}
+                                      for rank, player_id in enumerate(chunk)], ordered=False)
+    if len(ranked_players) > 0:
+        db[staging_name].rename(rank_name, dropTarget=True)
+    else:
+        db.drop_collection(rank_name)
+    util.logger.info("Saved %s leaderboard (%d players) in %.2fs",
+                     rank_name, len(ranked_players), time.time() - start_time)
 
 
 def get_leaderboard(rank_name):
-    if rank_name in leaderboards:
-        return leaderboards[rank_name][0]
+    return leaderboards.get(rank_name)
 
 
-@ttl_cache(maxsize=32, ttl=3600)
 def get_local_leaderboard(guild, rank_name):
     rankings = get_leaderboard(rank_name)
     if rankings is not None:
-        rankings = list(
-            filter(lambda player_id: guild.get_member(player_id) is not None and player_id != util.gconf.DEAD_BOT_ID,
-                   rankings))
-        return _LocalLeaderboard(updated=last_leaderboard_update, data=rankings)
+        return _LocalLeaderboard(updated=rankings.updated, data=rankings.local(guild))
 
 
 def get_rank(player, rank_name, guild=None):
     if guild is not None:
         # Local
-        rankings = get_local_leaderboard(guild, rank_name).data
-    else:
-        rankings = get_leaderboard(rank_name)
-    try:
-        return rankings.index(player.id) + 1
-    except (ValueError, IndexError):
-        return -1
+        return get_local_leaderboard(guild, rank_name).data.rank(player.id)
+    return leaderboards[rank_name].rank(player.id)
+
+
+def update_due(_=None):
+    return time.time() - last_leaderboard_update >= UPDATE_INTERVAL
 
 
 async def update_leaderboards(_):
     global last_leaderboard_update
-    if time.time() - last_leaderboard_update >= UPDATE_INTERVAL:
+    if update_due():
         last_leaderboard_update = time.time()
         leaderboard_thread = threading.Thread(target=calculate_updates)
         leaderboard_thread.start()
-        util.logger.info("Global leaderboard updated!")
+        util.logger.info("Saving leaderboards!")
 
 
 def calculate_updates():
-    for rank_name, data in leaderboards.items():
-        calculate_player_rankings(rank_name, data[1], data[2])
+    load_leaderboards([rank_name for rank_name in METRICS if not is_live(rank_name)])
+    for rank_name in leaderboards:
+        calculate_player_rankings(rank_name)
 
 
-events.register_message_listener(update_leaderboards)
-calculate_level_leaderboard()
+events.register_message_listener(update_leaderboards, update_due)
+players.rank_listeners.append(update_player)
+create_indexes()
+load_leaderboards(list(METRICS), load_blob_players())
@@ -1,13 +1,13 @@
 import asyncio
 import discord
-import gc
 import json
-import jsonpickle
 import math
 import numpy
 import random
+import threading
 import time
-from collections import defaultdict
+from collections import Counter, OrderedDict, defaultdict
+from contextlib import contextmanager
 from copy import copy
 from itertools import chain
 
@@ -15,7 +15,7 @@ import generalconfig as gconf
 from . import customizations
 from . import emojis as e
 from .customizations import Theme
-from .. import dbconn, permissions, util
+from .. import asyncdb, codec, dbconn, permissions, tasks, util
 from ..game import awards, gamerules, weapons
 from ..game.helpers.misc import BattleBananaObject, Ring
 from ..permissions import Permission
@@ -34,36 +34,184 @@ class FakeMember:
         self.roles = roles
 
 
-class Players(dict):
+class Players(OrderedDict):
+    """
+    The cache of loaded players (least recently used first).
+
+    Players are evicted when there are more than max_players or
+    they've not been used for PRUNE_INACTIVITY_TIME. Pinned players
+    (in a command) & players waiting to be saved are never evicted.
+    Evicted players are just fetched from the database again.
+    """
+
     # Amount of time before the bot will prune a player.
     PRUNE_INACTIVITY_TIME = 3600 * 6
+    DEFAULT_MAX_PLAYERS = 50000
+
+    def __init__(self, max_players=DEFAULT_MAX_PLAYERS, inactivity_time=PRUNE_INACTIVITY_TIME):
+        super().__init__()
+        self.max_players = max_players
+        self.inactivity_time = inactivity_time
+        self.last_used = dict()
+        self.pins = Counter()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Used by every shard thread
+        self.lock = threading.RLock()
+
+    def lookup(self, user_id):
+        """
+        Gets a player (or None) & marks them as recently used
+        """
+        with self.lock:
+            player = self.get(user_id)
+            if player is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touch(user_id)
+            return player
+
+    def __setitem__(self, user_id, player):
+        with self.lock:
+            super().__setitem__(user_id, player)
+            self._touch(user_id)
+            if len(self) > self.max_players:
+                self._evict(len(self) - self.max_players)
+
+    def __delitem__(self, user_id):
+        with self.lock:
+            super().__delitem__(user_id)
+            self.last_used.pop(user_id, None)
+
+    def pop(self, user_id, *default):
+        with self.lock:
+            self.last_used.pop(user_id, None)
+            return super().pop(user_id, *default)
+
+    @contextmanager
+    def pinned(self, user_id):
+        with self.lock:
+            self.pins[user_id] += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.pins[user_id] -= 1
+                if self.pins[user_id] <= 0:
+                    del self.pins[user_id]
 
     def prune(self):
-
         """
-        Removes player that the bot has not seen 
-        for over an hour. If anyone mentions these
+        Removes players that the bot has not seen
+        for PRUNE_INACTIVITY_TIME. If anyone mentions these
         players (in a command) their data will be
         fetched directly from the database
         """
-        players_pruned = 0
-        for id, player in list(self.items()):
-            if time.time() - player.last_progress >= Players.PRUNE_INACTIVITY_TIME:
-                del self[id]
-                players_pruned += 1
-        gc.collect()
-        util.logger.info("Pruned %d players for inactivity", players_pruned)
+        expire_time = time.monotonic() - self.inactivity_time
+        with self.lock:
+            # Oldest first so stop at the first active player
+            expired = []
+            for user_id in self:
+                if self.last_used.get(user_id, 0) > expire_time:
+                    break
+                if self._can_evict(user_id):
+                    expired.append(user_id)
+            players_pruned = self._remove(expired)
+        util.logger.info("Pruned %d players for inactivity (%d cached, %d hits, %d misses, %d evictions)",
+                         players_pruned, len(self), self.hits, self.misses, self.evictions)
+
+    def _touch(self, user_id):
+        self.move_to_end(user_id)
+        self.last_used[user_id] = time.monotonic()
+
+    def _can_evict(self, user_id):
+        return self.pins[user_id] <= 0 and not dbconn.is_pending(self.get(user_id))
+
+    def _evict(self, count):
+        evicted = []
+        for user_id in self:
+            if len(evicted) >= count:
+                break
+            if self._can_evict(user_id):
+                evicted.append(user_id)
+        self._remove(evicted)
+
+    def _remove(self, user_ids):
+        for user_id in user_ids:
+            del self[user_id]
+        self.evictions += len(user_ids)
+        return len(user_ids)
+
+
+players = Players(max_players=gconf.other_configs.get("playerCacheSize", Players.DEFAULT_MAX_PLAYERS),
+                  inactivity_time=gconf.other_configs.get("playerCacheTime", Players.PRUNE_INACTIVITY_TIME))
+
+
+@tasks.task(timeout=3600)
+def prune_task():
+    players.prune()
+
+
+# Ids are stored as int64
+MAX_PLAYER_ID = 2 ** 63 - 1
+
+
+class RegisteredPlayers:
+    """
+    The ids of all registered players, so messages from people
+    that never made an account don't cost a db read.
+
+    Stored as a sorted int64 array (built at start up) plus the
+    few accounts made or deleted since.
+    """
+
+    def __init__(self):
+        # None till loaded (anyone could be a player)
+        self.ids = None
+        self.added = set()
+        self.removed = set()
+        self.lock = threading.Lock()
+
+    def load(self, player_ids):
+        ids = numpy.fromiter(player_ids, dtype=numpy.int64)
+        ids.sort()
+        self.ids = ids
+
+    def add(self, user_id):
+        with self.lock:
+            self.removed.discard(user_id)
+            self.added.add(user_id)
+
+    def remove(self, user_id):
+        with self.lock:
+            self.added.discard(user_id)
+            self.removed.add(user_id)
+
+    def __contains__(self, user_id):
+        if self.ids is None or user_id in self.added:
+            return True
+        elif user_id in self.removed or not isinstance(user_id, int) or abs(user_id) > MAX_PLAYER_ID:
+            return False
+        index = numpy.searchsorted(self.ids, user_id)
+        return index < len(self.ids) and self.ids[index] == user_id
+
+    def __len__(self):
+        if self.ids is None:
+            return len(self.added)
+        return len(self.ids) + len(self.added) - len(self.removed)
 
 
-players = Players()
+registered_players = RegisteredPlayers()
 
+# Called with a player when they change (or are loaded)
+rank_listeners = []
 
-# @tasks.task(timeout=Players.PRUNE_INACTIVITY_TIME)
-# def prune_task():
-#     try:
-#         players.prune()
-#     except RuntimeError as exception:
-#         util.logger.warning("Failed to prune players: %s" % exception)
+
+def ranks_changed(player):
+    for listener in rank_listeners:
+        listener(player)
 
 
 class Player(BattleBananaObject, SlotPickleMixin):
@@ -104,6 +252,7 @@ class Player(BattleBananaObject, SlotPickleMixin):
         if len(args) > 0 and isinstance(args[0], discord.Member):
             super().__init__(args[0].id, args[0].name, **kwargs)
             players[self.id] = self
+            registered_players.add(self.id)
         else:
             super().__init__("NO_ID", "BattleBanana Player", **kwargs)
         self.reset()
@@ -230,6 +379,10 @@ class Player(BattleBananaObject, SlotPickleMixin):
 
         self.save()
 
+    def save(self):
+        ranks_changed(self)
+        super().save()
+
     def prestige_multiplicator(self):
         return self.prestige_level + 1
 
@@ -242,6 +395,7 @@ class Player(BattleBananaObject, SlotPickleMixin):
         exp = min((attack + strg + accy) * 100, max_exp)
         self.exp += exp
         self.total_exp += exp
+        ranks_changed(self)
 
     def get_owned(self, item_type, all_items):
         return {item_id: item for item_id, item in all_items.items() if item_id in self.inventory[item_type]}
@@ -453,13 +607,35 @@ class Player(BattleBananaObject, SlotPickleMixin):
                 continue
 
 
+codec.register(Player)
+
+
 def find_player(user_id: int) -> Player:
-    if user_id in players:
+    """
+    Blocks on a cache miss! Use fetch_player within coroutines.
+    """
+    player = players.lookup(user_id)
+    if player is not None:
+        return player
+    elif user_id in registered_players and load_player(user_id):
         return players[user_id]
-    elif load_player(user_id):
-        player = players[user_id]
-        player.id = user_id
+
+
+async def fetch_player(user_id: int) -> Player:
+    """
+    find_player for coroutines. Cache misses are loaded without
+    blocking the shard.
+    """
+    player = players.lookup(user_id)
+    if player is not None or user_id not in registered_players:
         return player
+    # Slow try/except to prevent overflows
+    try:
+        response = await asyncdb.get_collection_for_object(Player).find_one({"_id": user_id})
+    except OverflowError:
+        return None
+    if _load_player_document(user_id, response):
+        return players[user_id]
 
 
 REFERENCE_PLAYER = Player(no_save=True)
@@ -471,11 +647,25 @@ def load_player(player_id: int):
         response = dbconn.get_collection_for_object(Player).find_one({"_id": player_id})
     except OverflowError:
         return None
-    if response is not None and 'data' in response:
-        player_data = response['data']
-        loaded_player = jsonpickle.decode(player_data)
+    return _load_player_document(player_id, response)
+
+
+def _load_player_document(player_id, response):
+    if response is None:
+        return False
+    if player_id not in players:
+        # (Could have been loaded while waiting for the db)
+        loaded_player = dbconn.load_object(response, Player)
+        loaded_player.id = player_id
         players[player_id] = util.load_and_update(REFERENCE_PLAYER, loaded_player)
-        return True
+        ranks_changed(players[player_id])
+    return True
+
+
+async def delete_player(player):
+    registered_players.remove(player.id)
+    players.pop(player.id, None)
+    await asyncdb.delete_player(player)
 
 
 async def get_stuff(self):
@@ -497,10 +687,10 @@ async def handle_client(reader, writer):
     try:
         request = json.loads(request)
         id = int(request['id'])
-        player = find_player(id)
+        player = await fetch_player(id)
         if player is None:  # no account on BattleBanana
             Player(FakeMember(id))
-            player = await find_player(id)
+            player = await fetch_player(id)
     except json.decoder.JSONDecodeError:
         player = None
         error_found = True
@@ -517,3 +707,13 @@ async def handle_client(reader, writer):
     else:
         writer.write("smh {}".format(error_found).encode())
     writer.close()  # close it
+
+
+def _load():
+    # Only the _id index is read (no documents)
+    player_ids = dbconn.get_collection_for_object(Player).find({}, {"_id": 1}).hint([("_id", dbconn.ASCENDING)])
+    registered_players.load(player["_id"] for player in player_ids if isinstance(player["_id"], int))
+    util.logger.info("Loaded %s registered player ids", len(registered_players))
+
+
+_load()
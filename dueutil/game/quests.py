@@ -1,15 +1,14 @@
-import asyncio
 import discord
 import json
-import jsonpickle
-import math
+import numpy
 import random
+from bisect import bisect_left
 from collections import defaultdict, namedtuple
 from typing import Dict, List
 
 from . import gamerules
 from .players import Player
-from .. import dbconn
+from .. import asyncdb, codec, dbconn
 from .. import util
 from ..game import players
 from ..game import weapons
@@ -17,6 +16,8 @@ from ..game.helpers.misc import BattleBananaObject, DueMap
 from ..util import SlotPickleMixin
 
 quest_map = DueMap()
+# guild id -> channel id -> _QuestSpawns (built when first needed)
+_quest_spawns = defaultdict(dict)
 
 MIN_QUEST_IV = 0
 QUEST_DAY = 86400
@@ -86,6 +87,7 @@ class Quest(BattleBananaObject, SlotPickleMixin):
         global quest_map
         if self.server_id != "":
             quest_map[self.id] = self
+            _invalidate_spawns(self.server_id)
 
     def base_values(self):
         return self._BaseStats(self.base_attack, self.base_strg,
@@ -105,9 +107,8 @@ class Quest(BattleBananaObject, SlotPickleMixin):
     def made_on(self):
         return self.server_id
 
-    @property
-    def creator(self):
-        creator = players.find_player(self.created_by)
+    async def get_creator(self):
+        creator = await players.fetch_player(self.created_by)
         if creator is not None:
             return creator.name
         else:
@@ -124,6 +125,125 @@ class Quest(BattleBananaObject, SlotPickleMixin):
         except AttributeError:
             return "Unknown"
 
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        # Where (& how often) the quest spawns changed
+        if name in ("channel", "spawn_chance"):
+            _invalidate_spawns(getattr(self, "server_id", None))
+
+
+class _QuestSpawns:
+    """
+    The quests that can spawn in a channel.
+    Uses the alias method (Vose) so picking a quest weighted by
+    its spawn chance is O(1).
+    """
+
+    __slots__ = ["quests", "probability", "alias"]
+
+    def __init__(self, channel_quests):
+        self.quests = channel_quests
+        count = len(channel_quests)
+        weights = [max(quest.spawn_chance, 0) for quest in channel_quests]
+        total_weight = sum(weights)
+        if total_weight <= 0:
+            weights = [1] * count
+            total_weight = count
+        scaled = [weight * count / total_weight for weight in weights]
+        self.probability = [1.0] * count
+        self.alias = list(range(count))
+        small = [index for index, weight in enumerate(scaled) if weight < 1]
+        large = [index for index, weight in enumerate(scaled) if weight >= 1]
+        while len(small) > 0 and len(large) > 0:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+        # Anything left over is (within rounding) 1
+
+    def choose(self):
+        index = random.randrange(len(self.quests))
+        if random.random() < self.probability[index]:
+            return self.quests[index]
+        return self.quests[self.alias[index]]
+
+    def __len__(self):
+        return len(self.quests)
+
+
+def _level_up_gains(target_level, increment_scale, exp, base_attack, base_strg, base_accy):
+    """
+    The stats a quest gets leveling up to target_level, as if it did
+    progress() with random gains (a step) till it had enough exp for
+    each level.
+
+    The random gains are drawn in bulk & the level ups are found by a
+    bisect of the running total of the exp gains (rather than a step
+    at a time). The stats are then summed in one go.
+
+    Returns attack, strg, accy, total exp gained & exp left over.
+    """
+    gains = []
+    # Running total of the exp gains (/100 / increment). Index i is the total of the first i steps.
+    exp_totals = [0.0]
+    # About 2.5 / increment_scale steps a level
+    steps_per_level = 1 + 3 / increment_scale
+    _draw_steps(int(target_level * steps_per_level) + 1, gains, exp_totals)
+
+    first_steps, level_up_steps, increments = [], [], []
+    exp_gained = 0
+    step = 0
+    max_level = len(_exp_for_next_level)
+    for level in range(target_level):
+        if level < max_level:
+            exp_next_level = _exp_for_next_level[level]
+            increment = _level_increments[level] * increment_scale
+        else:
+            # Past the max level (levels up every step)
+            exp_next_level = -1
+            increment = _level_increments[0] * increment_scale
+        # The step that levels up (once the exp is enough)
+        level_up_step = step
+        if exp < exp_next_level:
+            steps_exp = exp_totals[step] + (exp_next_level - exp) / (100 * increment)
+            while steps_exp > exp_totals[-1]:
+                _draw_steps(int((target_level - level) * steps_per_level) + 1, gains, exp_totals)
+            level_up_step = bisect_left(exp_totals, steps_exp, lo=step)
+        if level_up_step + 1 >= len(exp_totals):
+            _draw_steps(int((target_level - level) * steps_per_level) + 1, gains, exp_totals)
+        first_steps.append(step)
+        level_up_steps.append(level_up_step + 1)
+        increments.append(increment)
+        exp_gained += 100 * increment * (exp_totals[level_up_step + 1] - exp_totals[step])
+        # Exp resets on leveling up (to the exp from the level up step)
+        exp = 100 * increment * (exp_totals[level_up_step + 1] - exp_totals[level_up_step])
+        step = level_up_step + 1
+
+    # Every step at a level gains increment * (random gain - 1 + base stat)
+    gains = numpy.concatenate(gains)
+    stat_totals = numpy.zeros((len(gains) + 1, 3))
+    numpy.cumsum(gains, axis=0, out=stat_totals[1:])
+    first_steps, level_up_steps, increments = map(numpy.array, (first_steps, level_up_steps, increments))
+    random_gains = (increments[:, None] * (stat_totals[level_up_steps] - stat_totals[first_steps])).sum(axis=0)
+    base_gain = float((increments * (level_up_steps - first_steps)).sum())
+    attack, strg, accy = (1 + random_gain - base_gain + base_gain * base_stat
+                          for random_gain, base_stat in zip(random_gains.tolist(), (base_attack, base_strg, base_accy)))
+    return attack, strg, accy, exp_gained, exp
+
+
+def _draw_steps(count, gains, exp_totals):
+    # Each step gains random.uniform(0.6, 1) * increment of each stat
+    step_gains = 0.6 + 0.4 * numpy.random.random((count, 3))
+    gains.append(step_gains)
+    exp_totals.extend((exp_totals[-1] + numpy.cumsum(step_gains.sum(axis=1))).tolist())
+
+
+# Per level exp (as floats) & base stat increments for _level_up_gains
+_exp_for_next_level = [float(gamerules.get_exp_for_next_level(level))
+                       for level in range(len(gamerules.exp_for_next_level))]
+_level_increments = [max(exp_next_level, 1000) / 600 for exp_next_level in _exp_for_next_level]
+
 
 class ActiveQuest(Player, util.SlotPickleMixin):
     __slots__ = ["level", "attack", "strg", "hp",
@@ -154,34 +274,21 @@ class ActiveQuest(Player, util.SlotPickleMixin):
         target_exp = random.uniform(quester.total_exp, quester.total_exp*1.8)
         active_quest.level = gamerules.get_level_from_exp(target_exp)
         active_quest.total_exp = active_quest.exp = 0
-        await active_quest._calculate_stats()
+        active_quest._calculate_stats()
         quester.quests.append(active_quest)
         quester.save()
         return active_quest
 
-    async def _calculate_stats(self):
+    def _calculate_stats(self):
         base_attack, base_strg, base_accy, base_hp = tuple(base_value / 1.7 for base_value in
                                                            self.info.base_values())
-        self.attack = self.accy = self.strg = 1
         target_level = self.level
-        self.level = 0
         self.hp = base_hp * target_level * random.uniform(0.6, 1)
         increment_scale = random.uniform(0.4, 1)
-        while self.level < target_level:
-            exp_next_level = gamerules.get_exp_for_next_level(self.level)
-            increment = max(exp_next_level, 1000) * increment_scale / 600
-            if self.exp >= exp_next_level:
-                self.level += 1
-                self.exp = 0
-            self.progress(increment * random.uniform(0.6, 1),
-                          increment * random.uniform(0.6, 1),
-                          increment * random.uniform(0.6, 1),
-                          max_attr=math.inf,
-                          max_exp=math.inf)
-            self.attack += -increment + increment * base_attack
-            self.strg += -increment + increment * base_strg
-            self.accy += -increment + increment * base_accy
-            await asyncio.sleep(1 / 1000)
+        gains = _level_up_gains(target_level, increment_scale, self.exp, base_attack, base_strg, base_accy)
+        self.level = target_level
+        self.attack, self.strg, self.accy, exp_gained, self.exp = gains
+        self.total_exp += exp_gained
         self.cash_iv = min(self.info.base_values()) * 3 * random.uniform(0.8, 1.6)
 
     async def get_avatar_url(self, *args):
@@ -243,31 +350,50 @@ class ActiveQuest(Player, util.SlotPickleMixin):
         return object_state
 
 
+codec.register(Quest)
+codec.register(ActiveQuest)
+
+
 def get_server_quest_list(guild: discord.Guild) -> Dict[str, Quest]:
     return quest_map[guild]
 
 
 def get_quest_on_server(guild: discord.Guild, quest_name: str) -> Quest:
-    return quest_map[f"{guild.id}/{quest_name.lower()}"]
+    return quest_map[guild.id, quest_name.lower()]
 
 
-def remove_quest_from_server(guild: discord.Guild, quest_name: str):
+async def remove_quest_from_server(guild: discord.Guild, quest_name: str):
     quest_id = f"{guild.id}/{quest_name.lower()}"
-    del quest_map[quest_id]
-    dbconn.get_collection_for_object(Quest).remove({'_id': quest_id})
+    del quest_map[guild.id, quest_name.lower()]
+    _invalidate_spawns(guild.id)
+    await asyncdb.delete_object(Quest, quest_id)
 
 
 def get_quest_from_id(quest_id: str) -> Quest:
     return quest_map[quest_id]
 
 
+def _channel_spawns(channel: discord.abc.GuildChannel) -> _QuestSpawns:
+    guild_spawns = _quest_spawns[channel.guild.id]
+    spawns = guild_spawns.get(channel.id)
+    if spawns is None:
+        spawns = guild_spawns[channel.id] = _QuestSpawns([quest for quest in quest_map[channel.guild].values()
+                                                          if quest.channel in ("ALL", channel.id)])
+    return spawns
+
+
+def _invalidate_spawns(server_id):
+    _quest_spawns.pop(server_id, None)
+
+
 def get_channel_quests(channel: discord.abc.GuildChannel) -> List[Quest]:
-    return [quest for quest in quest_map[channel.guild].values() if quest.channel in ("ALL", channel.id)]
+    return list(_channel_spawns(channel).quests)
 
 
 def get_random_quest_in_channel(channel: discord.abc.GuildChannel):
-    if channel.guild in quest_map:
-        return random.choice(get_channel_quests(channel))
+    spawns = _channel_spawns(channel)
+    if len(spawns) > 0:
+        return spawns.choose()
 
 
 def add_default_quest_to_server(guild):
@@ -285,10 +411,11 @@ def add_default_quest_to_server(guild):
           no_save=False)
 
 
-def remove_all_quests(guild):
+async def remove_all_quests(guild):
     if guild in quest_map:
-        result = dbconn.delete_objects(Quest, '%s/.*' % guild.id)
+        result = await asyncdb.delete_objects(Quest, '%s/.*' % guild.id)
         del quest_map[guild]
+        _invalidate_spawns(guild.id)
         return result.deleted_count
     return 0
 
@@ -297,8 +424,7 @@ def has_quests(place):
     if isinstance(place, discord.Guild):
         return place in quest_map and len(quest_map[place]) > 0
     elif isinstance(place, discord.abc.GuildChannel):
-        if place.guild in quest_map:
-            return len(get_channel_quests(place)) > 0
+        return len(_channel_spawns(place)) > 0
     return False
 
 
@@ -324,7 +450,7 @@ def _load():
     load_default_quests()
 
     for quest in dbconn.get_collection_for_object(Quest).find():
-        loaded_quest = jsonpickle.decode(quest['data'])
+        loaded_quest = dbconn.load_object(quest, Quest)
 
         if isinstance(loaded_quest.channel, str) and loaded_quest.channel not in ("ALL", None, "NONE"):
             loaded_quest.channel = int(loaded_quest.channel)
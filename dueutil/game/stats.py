@@ -1,13 +1,31 @@
-from collections import defaultdict
+import threading
+from collections import Counter, defaultdict
 from enum import Enum
+from itertools import chain
 from typing import Dict
 
-from .. import dbconn
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from .. import asyncdb, dbconn, tasks, util
 
 """
 General game stats
+
+Increments are counted in memory & written with one bulk $inc every
+STATS_FLUSH_INTERVAL seconds (and on shutdown), rather than a db
+round-trip for every command.
 """
 
+# Seconds between stat flushes (can be set with "statsInterval" in dbconfig.json)
+STATS_FLUSH_INTERVAL = 30
+
+# Stats are incremented from all the shard threads.
+_pending_increments = Counter()
+# Increments being written (still counted by get_stats till the write is done)
+_flushing_increments = Counter()
+_pending_lock = threading.Lock()
+
 
 class Stat(Enum):
     MONEY_CREATED = "moneycreated"
@@ -22,11 +40,50 @@ class Stat(Enum):
 
 
 def increment_stat(dueutil_stat: Stat, increment=1):
-    dbconn.conn()["stats"].update({"stat": dueutil_stat.value},
-                                  {"$inc": {"count": increment}}, upsert=True)
+    with _pending_lock:
+        _pending_increments[dueutil_stat] += increment
+
+
+def flush_stats():
+    """
+    Writes the pending increments (blocking)
+    """
+    with _pending_lock:
+        pending = Counter({dueutil_stat: increment for dueutil_stat, increment in _pending_increments.items()
+                           if increment != 0})
+        _pending_increments.clear()
+        _flushing_increments.update(pending)
+    if len(pending) == 0:
+        return
+    updates = [UpdateOne({"stat": dueutil_stat.value}, {"$inc": {"count": increment}}, upsert=True)
+               for dueutil_stat, increment in pending.items()]
+    written = False
+    try:
+        dbconn.conn()["stats"].bulk_write(updates, ordered=False)
+        written = True
+    except PyMongoError as write_error:
+        util.logger.error("Failed to flush stats: %s", write_error)
+    finally:
+        with _pending_lock:
+            _flushing_increments.subtract(pending)
+            for dueutil_stat in pending:
+                if _flushing_increments[dueutil_stat] == 0:
+                    del _flushing_increments[dueutil_stat]
+            if not written:
+                # Try again next flush.
+                _pending_increments.update(pending)
+
+
+async def get_stats() -> Dict[Stat, int]:
+    stats_response = await asyncdb.conn()["stats"].find()
+    stats = defaultdict(int, ((Stat(stat["stat"]), stat["count"]) for stat in stats_response))
+    # Plus anything not flushed yet (or being flushed).
+    with _pending_lock:
+        for dueutil_stat, increment in chain(_pending_increments.items(), _flushing_increments.items()):
+            stats[dueutil_stat] += increment
+    return stats
 
 
-def get_stats() -> Dict[Stat, int]:
-    stats_response = dbconn.conn()["stats"].find()
-    stats = dict((Stat(stat["stat"]), stat["count"]) for stat in stats_response)
-    return defaultdict(int, stats)
+@tasks.task(timeout=dbconn.config.get("statsInterval", STATS_FLUSH_INTERVAL))
+async def flush_stats_task():
+    await asyncdb.run(flush_stats)
@@ -1,6 +1,4 @@
-import jsonpickle
-
-from .. import dbconn, util
+from .. import asyncdb, codec, dbconn, util
 from ..game import players
 from ..game.helpers.misc import BattleBananaObject
 from ..util import SlotPickleMixin
@@ -27,16 +25,17 @@ class Team(BattleBananaObject, SlotPickleMixin):
         self.pendings = []
 
         self.no_save = details.pop("no_save", False)
+        if not self.no_save:
+            teams[self.id] = self
 
         self.save()
         owner.team = self.id
         owner.save()
 
-    @property
-    def avgLevel(self):
+    async def avgLevel(self):
         level = 0
         for member in self.members:
-            level += players.find_player(member).level
+            level += (await players.fetch_player(member)).level
         return "%.2f" % (level / len(self.members))
 
     def isPending(self, member):
@@ -100,16 +99,16 @@ class Team(BattleBananaObject, SlotPickleMixin):
         self.pendings.remove(member.id)
         self.save()
 
-    def Delete(self):
+    async def Delete(self):
         for member in self.members:
-            member = players.find_player(member)
+            member = await players.fetch_player(member)
             member.team = None
             member.save()
 
         if self.id in teams:
             del teams[self.id]
 
-        dbconn.get_collection_for_object(Team).delete_one({'_id': self.id})
+        await asyncdb.delete_object(Team, self.id)
 
     def get_name_possession(self):
         if self.name.endswith('s'):
@@ -117,11 +116,30 @@ class Team(BattleBananaObject, SlotPickleMixin):
         return self.name + "'s"
 
 
+codec.register(Team)
+
+
+# Loaded teams stay cached (like players) so every command changes the same
+# object. A copy read from the db could be missing a save that's still queued.
 def find_team(team_id: str) -> Team:
     if team_id in teams:
-        return teams.pop(team_id)
+        return teams[team_id]
     elif load_team(team_id):
-        return teams.pop(team_id)
+        return teams[team_id]
+
+
+async def fetch_team(team_id: str) -> Team:
+    """
+    find_team for coroutines
+    """
+    if team_id in teams:
+        return teams[team_id]
+    response = await asyncdb.get_collection_for_object(Team).find_one({"_id": team_id})
+    if team_id in teams:
+        # Loaded (or made) while waiting on the db
+        return teams[team_id]
+    if _load_team_document(response):
+        return teams[team_id]
 
 
 REFERENCE_TEAM = Team(players.REFERENCE_PLAYER, "reference team", "Okay!", 1, False, no_save=True)
@@ -129,8 +147,11 @@ REFERENCE_TEAM = Team(players.REFERENCE_PLAYER, "reference team", "Okay!", 1, Fa
 
 def load_team(team_id):
     response = dbconn.get_collection_for_object(Team).find_one({"_id": team_id})
-    if response is not None and 'data' in response:
-        team_data = response['data']
-        loaded_team = jsonpickle.decode(team_data)
+    return _load_team_document(response)
+
+
+def _load_team_document(response):
+    if response is not None:
+        loaded_team = dbconn.load_object(response, Team)
         teams[loaded_team.id] = util.load_and_update(REFERENCE_TEAM, loaded_team)
         return True
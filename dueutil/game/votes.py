@@ -2,7 +2,7 @@ import traceback
 from discord import Embed
 
 import generalconfig as gconf
-from dueutil import util, tasks, dbconn
+from dueutil import asyncdb, util, tasks
 from dueutil.botcommands.player import DAILY_AMOUNT
 from . import players
 
@@ -14,7 +14,7 @@ async def process_votes():
             return
         util.logger.info("Processing Votes.")
         try:
-            votes = dbconn.conn()["Votes"].find()
+            votes = await asyncdb.conn()["Votes"].find()
         except Exception as exception:
             util.logger.error("Failed to fetch votes: %s", exception)
             return
@@ -31,9 +31,9 @@ async def process_votes():
                 isWeekend = vote.get("weekend", False)
                 date = vote.get("date")
 
-                player = players.find_player(user_id)
+                player = await players.fetch_player(user_id)
                 if player is None:
-                    dbconn.conn()["Votes"].delete_one({'_id': vote_id})
+                    await asyncdb.conn()["Votes"].delete_one({'_id': vote_id})
                     continue
 
                 reward = DAILY_AMOUNT * player.level * player.prestige_multiplicator()
@@ -44,7 +44,7 @@ async def process_votes():
 
                 client.run_task(notify_complete, user_id, vote, reward)
 
-                dbconn.conn()["Votes"].delete_one({'_id': vote_id})
+                await asyncdb.conn()["Votes"].delete_one({'_id': vote_id})
 
                 embed = Embed(title="New vote", type="rich", colour=gconf.DUE_COLOUR)
                 embed.add_field(name="Voter: ", value=user_id)
@@ -1,11 +1,10 @@
 import discord
 import json
-import jsonpickle
 from collections import namedtuple
 from typing import Union, Dict
 
 from . import emojis
-from .. import dbconn
+from .. import asyncdb, codec, dbconn
 from .. import util
 from ..game.helpers.misc import BattleBananaObject, DueMap
 from ..util import SlotPickleMixin
@@ -130,6 +129,9 @@ class Weapon(BattleBananaObject, SlotPickleMixin):
         if updated:
             self.save()
 
+
+codec.register(Weapon)
+
 # The 'None'/No weapon weapon
 NO_WEAPON = Weapon("None", None, 1, 66, no_save=True, image_url="http://i.imgur.com/gNn7DyW.png", icon="👊")
 NO_WEAPON_ID = NO_WEAPON.id
@@ -152,10 +154,8 @@ def does_weapon_exist(server_id: int, weapon_name: str) -> bool:
 
 def get_weapon_for_server(server_id: int, weapon_name: str) -> Weapon:
     if weapon_name.lower() in stock_weapons:
-        return weapons["STOCK/" + weapon_name.lower()]
-    weapon_id = f"{server_id}/{weapon_name.lower()}"
-    if weapon_id in weapons:
-        return weapons[weapon_id]
+        return weapons["STOCK", weapon_name.lower()]
+    return weapons[server_id, weapon_name.lower()]
 
 
 def get_weapon_summary_from_id(weapon_id: str) -> Summary:
@@ -165,11 +165,11 @@ def get_weapon_summary_from_id(weapon_id: str) -> Summary:
                    accy=float(summary[2]))
 
 
-def remove_weapon_from_shop(guild: discord.Guild, weapon_name: str) -> bool:
+async def remove_weapon_from_shop(guild: discord.Guild, weapon_name: str) -> bool:
     weapon = get_weapon_for_server(guild.id, weapon_name)
     if weapon is not None:
         del weapons[weapon.id]
-        dbconn.get_collection_for_object(Weapon).remove({'_id': weapon.id})
+        await asyncdb.delete_object(Weapon, weapon.id)
         return True
     return False
 
@@ -194,9 +194,9 @@ def stock_weapon(weapon_name: str) -> str:
     return NO_WEAPON_ID
 
 
-def remove_all_weapons(guild):
+async def remove_all_weapons(guild):
     if guild in weapons:
-        result = dbconn.delete_objects(Weapon, '%s\+.*' % guild.id)
+        result = await asyncdb.delete_objects(Weapon, '%s\+.*' % guild.id)
         del weapons[guild]
         return result.deleted_count
     return 0
@@ -221,7 +221,7 @@ def _load():
 
     # Load from db
     for weapon in dbconn.get_collection_for_object(Weapon).find():
-        loaded_weapon = jsonpickle.decode(weapon['data'])
+        loaded_weapon = dbconn.load_object(weapon, Weapon)
 
         if isinstance(loaded_weapon.server_id, str):
             loaded_weapon.server_id = int(loaded_weapon.server_id)
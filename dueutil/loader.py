@@ -32,6 +32,7 @@ def loader(action, packages=BOT_PACKAGES):
                 # print(subpackages)
                 # loader(action,packages=subpackages)
     # if packages == BOT_PACKAGES:
+    events.command_event.rebuild_names()
     dbconn.drop_and_insert("commands", events.command_event.to_dict())
     if COMMANDS in packages:
         util.logger.info('Bot extensions loaded with %d commands', len(events.command_event))
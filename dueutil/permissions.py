@@ -2,7 +2,7 @@ from enum import Enum
 from functools import total_ordering
 
 import generalconfig as gconf
-from . import dbconn, util
+from . import asyncdb, dbconn, util
 
 special_permissions = dict()
 
@@ -52,15 +52,15 @@ def has_special_permission(member, permission):
 
 def give_permission(member, permission):
     if permission != Permission.PLAYER:
-        dbconn.conn()["permissions"].update({'_id': member.id}, {"$set": {'permission': permission.value[1]}},
-                                            upsert=True)
+        asyncdb.run_later(dbconn.conn()["permissions"].update_one, {'_id': member.id},
+                          {"$set": {'permission': permission.value[1]}}, upsert=True)
         special_permissions[member.id] = permission.value[1]
     else:
         strip_permissions(member)
 
 
 def strip_permissions(member):
-    dbconn.conn()["permissions"].delete_many({'_id': member.id})
+    asyncdb.run_later(dbconn.conn()["permissions"].delete_many, {'_id': member.id})
     if member.id in special_permissions:
         del special_permissions[member.id]
 
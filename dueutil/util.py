@@ -10,7 +10,7 @@ from datetime import datetime
 from itertools import chain
 
 import generalconfig as gconf
-from dueutil import dbconn
+from dueutil import asyncdb
 from .trello import TrelloClient
 
 """
@@ -97,6 +97,18 @@ class SlotPickleMixin:
         for slot, value in state.items():
             setattr(self, slot, value)
 
+    @property
+    def saved_document(self):
+        """
+        The document last written to (or read from) the db.
+        Saves compare against this to only write the changed slots.
+        """
+        return self.__dict__.get("_saved_document")
+
+    def mark_saved(self, document):
+        # Not a slot (so not part of the state)
+        self.__dict__["_saved_document"] = document
+
 
 async def download_file(url):
     async with aiohttp.ClientSession(conn_timeout=10) as session:
@@ -155,8 +167,8 @@ async def say(channel: discord.TextChannel, *args, **kwargs):
 
 
 async def save_old_topdog(player):
-    topdogs = dbconn.conn()["Topdogs"]
-    topdogs.insert_one({'user_id': player.id, 'date': datetime.utcnow()})
+    topdogs = asyncdb.conn()["Topdogs"]
+    await topdogs.insert_one({'user_id': player.id, 'date': datetime.utcnow()})
 
 
 async def typing(channel):
@@ -12,8 +12,8 @@ import traceback
 from threading import Thread
 
 import generalconfig as gconf
-from dueutil import dbconn, events, loader, permissions, servercounts, util
-from dueutil.game import players
+from dueutil import asyncdb, dbconn, events, loader, permissions, servercounts, util
+from dueutil.game import leaderboards, players
 from dueutil.game.configs import dueserverconfig
 from dueutil.game.helpers import imagecache
 from dueutil.permissions import Permission
@@ -21,6 +21,10 @@ from dueutil.permissions import Permission
 sentry_sdk.init(gconf.other_configs.get("sentryAuth"), ignore_errors=["KeyboardInterrupt"])
 
 MAX_RECOVERY_ATTEMPTS = 1000
+# How often the shard loop is checked for blocking calls (seconds)
+LOOP_LAG_INTERVAL = 1
+# Lag (seconds) that gets logged as a warning
+LOOP_LAG_WARNING = 0.5
 
 stopped = False
 bot_key = ""
@@ -51,6 +55,8 @@ class BattleBananaClient(discord.AutoShardedClient):
     def __init__(self, **details):
         self.queue_tasks = queue.Queue()
         self.start_time = time.time()
+        self.loop_lag = 0
+        self.max_loop_lag = 0
 
         intents = discord.Intents.default()
         intents.members = True
@@ -59,6 +65,7 @@ class BattleBananaClient(discord.AutoShardedClient):
         super(BattleBananaClient, self).__init__(intents=intents, **details)
 
         asyncio.ensure_future(self.__check_task_queue(), loop=self.loop)
+        asyncio.ensure_future(self.__measure_loop_lag(), loop=self.loop)
 
     async def __check_task_queue(self):
         while True:
@@ -75,6 +82,19 @@ class BattleBananaClient(discord.AutoShardedClient):
                 pass
             await asyncio.sleep(5)
 
+    async def __measure_loop_lag(self):
+        """
+        Measures how late the event loop wakes up from a sleep.
+        Anything blocking the loop (like a sync db call) shows up here.
+        """
+        while True:
+            sleep_start = time.monotonic()
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            self.loop_lag = max(time.monotonic() - sleep_start - LOOP_LAG_INTERVAL, 0)
+            self.max_loop_lag = max(self.max_loop_lag, self.loop_lag)
+            if self.loop_lag > LOOP_LAG_WARNING:
+                util.logger.warning("Shard event loop lagged by %.2fs", self.loop_lag)
+
     def run_task(self, task, *args, **kwargs):
         """
         Runs a task from within this clients thread
@@ -87,7 +107,7 @@ class BattleBananaClient(discord.AutoShardedClient):
     async def on_guild_join(self, guild):
         await guild.chunk()
         server_count = util.get_server_count()
-        dbconn.update_guild_joined(1)
+        await asyncdb.update_guild_joined(1)
         if server_count % 250 == 0:
             await util.say(gconf.announcement_channel,
                            ":confetti_ball: I'm on __**%d SERVERS**__ now!1!111!\n@everyone" % server_count)
@@ -259,7 +279,7 @@ class BattleBananaClient(discord.AutoShardedClient):
             return
 
         member = after
-        player = players.find_player(before.id)
+        player = await players.fetch_player(before.id)
         if player is not None:
             old_image = await player.get_avatar_url(member=before)
             new_image = await player.get_avatar_url(member=after)
@@ -270,19 +290,25 @@ class BattleBananaClient(discord.AutoShardedClient):
                 player.donor = True
                 player.save()
 
+    async def on_member_join(self, member):
+        leaderboards.member_joined(member)
+
+    async def on_member_remove(self, member):
+        leaderboards.member_left(member)
+
     async def on_guild_remove(self, guild):
+        leaderboards.guild_removed(guild)
         if not self.is_ready():
             return
 
-        for collection in dbconn.db.list_collection_names():
+        for collection in await asyncdb.run(dbconn.conn().list_collection_names):
             if collection not in ("Player", "Topdogs"):
-                dbconn.db[collection].delete_many({'_id': {'$regex': '%s.*' % guild.id}})
-                dbconn.db[collection].delete_many({'_id': guild.id})
-                dbconn.db[collection].delete_many({'_id': str(guild.id)})
+                # Also drops any queued saves (or they'd be written back)
+                asyncdb.run_later(dbconn.delete_guild_objects, collection, guild.id)
         await util.duelogger.info("BattleBanana has been removed from the guild **%s** (%s members)"
                                   % (util.ultra_escape_string(guild.name), guild.member_count))
         # Update stats
-        dbconn.update_guild_joined(-1)
+        await asyncdb.update_guild_joined(-1)
         await servercounts.update_server_count(self)
 
     async def on_ready(self):
@@ -0,0 +1,25 @@
+"""
+Benchmarks for the hot paths (not run by pytest).
+
+Like the tests they import the bot, so they need its environment
+(requirements.txt, generalconfig.py & a dbconfig.json for a test
+database). Run them from the repo root, e.g.
+
+    python -m tests.benchmarks.bench_codec
+"""
+
+import timeit
+
+
+def best_time(function, number=1, repeat=5):
+    """
+    The best time (seconds) for one call of function
+    """
+
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+def report(name, old_time, new_time, unit="ms"):
+    scale = {"s": 1, "ms": 1e3, "us": 1e6}[unit]
+    print("%-40s old %10.3f%s  new %10.3f%s  (%.1fx)"
+          % (name, old_time * scale, unit, new_time * scale, unit, old_time / new_time if new_time > 0 else float("inf")))
@@ -0,0 +1,53 @@
+"""
+Vectorized battle odds vs running the scalar engine lots of times.
+
+Seeded, so the numbers are the same every run.
+
+    python -m tests.benchmarks.bench_battles
+"""
+
+import random
+
+from dueutil.game import battles, players
+from . import best_time, report
+
+# (level, attack, strg, accy) for each side of a matchup
+MATCHUPS = (((5, 10, 10, 10), (5, 10, 10, 10)),
+            ((20, 45, 40, 50), (25, 60, 55, 50)),
+            ((120, 900, 800, 850), (100, 700, 900, 600)))
+
+
+def fighter(level, attack, strg, accy):
+    player = players.Player(no_save=True)
+    player.level = level
+    player.attack, player.strg, player.accy = attack, strg, accy
+    player.hp = 10 * level
+    return player
+
+
+def scalar_odds(player_one, player_two, simulations, seed):
+    rng = random.Random(seed)
+    wins = turns = 0
+    for _ in range(simulations):
+        results = battles.battle(player_one=player_one, player_two=player_two, seed=rng.getrandbits(63))
+        wins += results.winner is player_one
+        turns += results.turn_count
+    return wins / simulations, turns / simulations
+
+
+def main():
+    simulations = battles.BATTLE_SIMULATIONS
+    print("%d battles per estimate" % simulations)
+    for stats_one, stats_two in MATCHUPS:
+        player_one, player_two = fighter(*stats_one), fighter(*stats_two)
+        scalar_win, scalar_turns = scalar_odds(player_one, player_two, simulations, seed=0)
+        odds = battles.battle_odds(player_one, player_two, simulations=simulations, seed=0)
+        print("level %d vs %d: win %.3f vs %.3f, turns %.1f vs %.1f (scalar vs vectorized)"
+              % (stats_one[0], stats_two[0], scalar_win, odds.win, scalar_turns, odds.turns))
+        old_time = best_time(lambda: scalar_odds(player_one, player_two, simulations, seed=0), repeat=3)
+        new_time = best_time(lambda: battles.battle_odds(player_one, player_two, simulations=simulations, seed=0))
+        report("battle odds (level %d vs %d)" % (stats_one[0], stats_two[0]), old_time, new_time)
+
+
+if __name__ == "__main__":
+    main()
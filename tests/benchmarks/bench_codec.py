@@ -0,0 +1,67 @@
+"""
+Native document codec vs the old jsonpickle blobs.
+
+Encode & decode time and BSON size for a synthetic set of players.
+
+    python -m tests.benchmarks.bench_codec [player count]
+"""
+
+import random
+import sys
+import time
+
+import bson
+import jsonpickle
+
+from dueutil import codec
+from dueutil.game import players
+
+DEFAULT_PLAYERS = 100000
+
+
+def synthetic_players(count, seed=0):
+    rng = random.Random(seed)
+    synthetic = []
+    for player_id in range(count):
+        player = players.Player(no_save=True)
+        player.id = 10 ** 17 + player_id
+        player.name = "Player %d" % player_id
+        player.level = rng.randint(1, 500)
+        player.total_exp = player.exp = rng.random() * 10 ** 7
+        player.money = rng.randint(0, 10 ** 9)
+        player.attack, player.strg, player.accy = (rng.random() * 1000 for _ in range(3))
+        player.quests_won = rng.randint(0, 10 ** 4)
+        player.wagers_won = rng.randint(0, 10 ** 3)
+        player.awards = ["Award%d" % award for award in range(rng.randint(0, 30))]
+        player.inventory["weapons"] = ["weapon%d" % weapon for weapon in range(rng.randint(0, 6))]
+        synthetic.append(player)
+    return synthetic
+
+
+def timed(function, items):
+    start = time.perf_counter()
+    results = [function(item) for item in items]
+    return time.perf_counter() - start, results
+
+
+def main(count):
+    print("Making %d players..." % count)
+    synthetic = synthetic_players(count)
+
+    blob_time, blobs = timed(jsonpickle.encode, synthetic)
+    native_time, documents = timed(codec.encode, synthetic)
+    blob_load_time, _ = timed(jsonpickle.decode, blobs)
+    native_load_time, _ = timed(lambda document: codec.decode(document, players.Player), documents)
+    blob_size = sum(len(bson.encode({"_id": player.id, "data": blob})) for player, blob in zip(synthetic, blobs))
+    native_size = sum(len(bson.encode(dict(document, _id=player.id)))
+                      for player, document in zip(synthetic, documents))
+
+    print("%-10s %14s %14s %14s" % ("", "encode", "decode", "size"))
+    print("%-10s %13.1fs %13.1fs %12.1fMB" % ("jsonpickle", blob_time, blob_load_time, blob_size / 2 ** 20))
+    print("%-10s %13.1fs %13.1fs %12.1fMB" % ("native", native_time, native_load_time, native_size / 2 ** 20))
+    print("%-10s %13.1fx %13.1fx %13.1fx" % ("speedup", blob_time / native_time, blob_load_time / native_load_time,
+                                             blob_size / native_size))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PLAYERS)
@@ -0,0 +1,46 @@
+"""
+Command arg matching: the old determine_args vs the compiled ArgsMatcher.
+
+Runs the args of a seeded corpus through every registered args_pattern.
+Patterns with players or teams are left out (their converters need
+the db & cost the same either way).
+
+    python -m tests.benchmarks.bench_commands
+"""
+
+import asyncio
+import random
+
+from dueutil import commands, events, loader
+from tests.test_commands import TOKENS, _old_determine_args
+from . import best_time, report
+
+CALLS_PER_PATTERN = 200
+
+
+def main():
+    loader.load_modules(packages=loader.COMMANDS)
+    patterns = sorted({command.args_pattern for command in events.command_event.values()}, key=str)
+    patterns = [pattern for pattern in patterns if not pattern or not set(pattern) & {"P", "T"}]
+    rng = random.Random(0)
+    corpus = [(pattern, [rng.choice(TOKENS) for _ in range(rng.randint(0, 6))])
+              for pattern in patterns for _ in range(CALLS_PER_PATTERN)]
+
+    # The "SRRRRS?S?L?%?" kind of pattern is where the old version did the most work
+    long_corpus = [("SRRRRS?S?L?%?", ["name", "1", "2", "3", "4", "desc"])] * len(corpus)
+
+    async def match_all(determine_args, calls):
+        for pattern, args in calls:
+            await determine_args(pattern, args.copy(), None, None)
+
+    loop = asyncio.new_event_loop()
+    print("%d patterns, %d calls" % (len(patterns), len(corpus)))
+    for name, calls in (("registered patterns", corpus), ("SRRRRS?S?L?%?", long_corpus)):
+        old_time = best_time(lambda: loop.run_until_complete(match_all(_old_determine_args, calls)))
+        new_time = best_time(lambda: loop.run_until_complete(match_all(commands.determine_args, calls)))
+        report(name + " (per call)", old_time / len(calls), new_time / len(calls), unit="us")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+DueMap lookups: the old string key parsing vs the (guild, item) index.
+
+    python -m tests.benchmarks.bench_duemap
+"""
+
+import collections.abc
+import random
+
+import discord
+
+from dueutil.game.helpers.misc import DueMap
+from . import best_time, report
+
+GUILDS = 1000
+ITEMS_PER_GUILD = 20
+LOOKUPS = 100000
+
+
+class OldDueMap(collections.abc.MutableMapping):
+    """The DueMap from before the (guild, item) index"""
+
+    def __init__(self):
+        self.collection = dict()
+
+    def __getitem__(self, key):
+        key = self._parse_key(key)
+        if isinstance(key, list):
+            if key[0] in self.collection and key[1] in self.collection[key[0]]:
+                return self.collection[key[0]][key[1]]
+            return None
+        if key in self.collection:
+            return self.collection[key]
+        return {}
+
+    def __contains__(self, key):
+        key = self._parse_key(key)
+        if isinstance(key, list):
+            return key[0] in self.collection and key[1] in self.collection[key[0]]
+        return key in self.collection
+
+    def __setitem__(self, key, value):
+        key = self._parse_key(key, value)
+        if isinstance(key, list):
+            if key[0] not in self.collection:
+                items = dict()
+                items[key[1]] = value
+                self.collection[key[0]] = items
+            else:
+                self.collection[key[0]][key[1]] = value
+        else:
+            self.collection[key] = value
+
+    def __delitem__(self, key):
+        key = self._parse_key(key)
+        if isinstance(key, list):
+            del self.collection[key[0]][key[1]]
+        else:
+            del self.collection[key]
+
+    def __iter__(self):
+        return iter(self.collection)
+
+    def __len__(self):
+        return len(self.collection)
+
+    @staticmethod
+    def _parse_key(key, value=None):
+        if isinstance(key, int):
+            key = str(key)
+        if isinstance(key, discord.Guild):
+            if value is not None:
+                return [str(key.id), value.name]
+            return str(key.id)
+        elif "/" not in key:
+            return key
+        key = key.split('/', 1)
+        if '+' in key[0]:
+            key[0] = key[0].split('+')[0]
+        return key
+
+
+def main():
+    rng = random.Random(0)
+    guild_ids = [rng.getrandbits(60) for _ in range(GUILDS)]
+    old_map, new_map = OldDueMap(), DueMap()
+    for guild_id in guild_ids:
+        for item in range(ITEMS_PER_GUILD):
+            old_map["%d/item %d" % (guild_id, item)] = new_map[guild_id, "item %d" % item] = item
+
+    # Half the lookups miss (like the per message muted/whitelist checks)
+    keys = [(rng.choice(guild_ids), "item %d" % rng.randrange(ITEMS_PER_GUILD * 2)) for _ in range(LOOKUPS)]
+    string_keys = ["%d/%s" % key for key in keys]
+    groups = [guild_id for guild_id, _ in keys]
+    assert [key in old_map for key in string_keys] == [key in new_map for key in keys]
+    assert [old_map[key] for key in string_keys] == [new_map[key] for key in string_keys]
+
+    cases = (("contains", lambda: [key in old_map for key in string_keys],
+              lambda: [key in new_map for key in keys]),
+             ("getitem", lambda: [old_map[key] for key in string_keys],
+              lambda: [new_map[key] for key in keys]),
+             ("getitem (string keys)", lambda: [old_map[key] for key in string_keys],
+              lambda: [new_map[key] for key in string_keys]),
+             ("guild items", lambda: [old_map[guild_id] for guild_id in groups],
+              lambda: [new_map[guild_id] for guild_id in groups]))
+    print("%d guilds x %d items, %d lookups" % (GUILDS, ITEMS_PER_GUILD, LOOKUPS))
+    for name, old_lookups, new_lookups in cases:
+        old_time = best_time(old_lookups)
+        new_time = best_time(new_lookups)
+        report(name + " (per lookup)", old_time / LOOKUPS, new_time / LOOKUPS, unit="us")
+
+
+if __name__ == "__main__":
+    main()
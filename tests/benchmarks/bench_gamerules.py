@@ -0,0 +1,55 @@
+"""
+Table driven level/exp math vs the old per call eval & loops.
+
+    python -m tests.benchmarks.bench_gamerules
+"""
+
+import random
+
+from dueutil.game import gamerules
+from . import best_time, report
+
+LEVELS = 1000
+
+
+# The old gamerules functions (over the same progression rules)
+def old_get_exp_for_next_level(level):
+    for level_range, exp_details in gamerules.exp_per_level.items():
+        if level in level_range:
+            return int(eval(exp_details.replace("oldLevel", str(level))))
+    return -1
+
+
+def old_get_exp_for_level(level):
+    return sum([old_get_exp_for_next_level(level) for level in range(1, level)])
+
+
+def old_get_level_from_exp(exp):
+    level = 1
+    while 1:
+        exp -= old_get_exp_for_next_level(level)
+        if exp < 0:
+            break
+        level += 1
+    return level
+
+
+def main():
+    rng = random.Random(0)
+    max_level = len(gamerules.total_exp_for_level)
+    levels = [rng.randint(1, max_level) for _ in range(LEVELS)]
+    exps = [rng.uniform(0, gamerules.get_exp_for_level(max_level)) for _ in range(LEVELS)]
+
+    cases = (("get_exp_for_next_level", old_get_exp_for_next_level, gamerules.get_exp_for_next_level, levels),
+             ("get_exp_for_level", old_get_exp_for_level, gamerules.get_exp_for_level, levels),
+             ("get_level_from_exp", old_get_level_from_exp, gamerules.get_level_from_exp, exps))
+    print("%d calls each (levels 1 - %d)" % (LEVELS, max_level))
+    for name, old_function, new_function, values in cases:
+        assert [old_function(value) for value in values] == [new_function(value) for value in values], name
+        old_time = best_time(lambda: [old_function(value) for value in values], repeat=3)
+        new_time = best_time(lambda: [new_function(value) for value in values], repeat=3)
+        report(name, old_time / LEVELS, new_time / LEVELS, unit="us")
+
+
+if __name__ == "__main__":
+    main()
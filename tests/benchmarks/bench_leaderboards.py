@@ -0,0 +1,72 @@
+"""
+Multi-metric leaderboards from columns vs the old per-object sort.
+
+The old leaderboard sorted Player objects with sorted(key=...) and
+looked ranks up with tuple.index. The new one ranks columns of values
+(as read from the db) with numpy & looks ranks up by bisection.
+
+    python -m tests.benchmarks.bench_leaderboards [player count]
+"""
+
+import random
+import sys
+import time
+
+from dueutil.game import leaderboards
+
+DEFAULT_PLAYERS = 1000000
+RANK_LOOKUPS = 1000
+
+
+class _SyntheticPlayer:
+    # Just what the metrics need (1M real Players would not fit in memory)
+    __slots__ = ["id", "total_exp", "money", "quests_won", "wagers_won", "prestige_level", "awards"]
+
+    def __init__(self, player_id, rng):
+        self.id = player_id
+        self.total_exp = rng.random() * 10 ** 7
+        self.money = rng.randint(0, 10 ** 9)
+        self.quests_won = rng.randint(0, 10 ** 4)
+        self.wagers_won = rng.randint(0, 10 ** 3)
+        self.prestige_level = rng.randint(0, 20)
+        self.awards = [None] * rng.randint(0, 30)
+
+
+def old_rank(synthetic_players):
+    rankings = dict()
+    for rank_name, metric in leaderboards.METRICS.items():
+        ranked_players = sorted(synthetic_players, key=metric.sort_function, reverse=True)
+        rankings[rank_name] = tuple(player.id for player in ranked_players)
+    return rankings
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main(count):
+    rng = random.Random(0)
+    print("Making %d players..." % count)
+    synthetic_players = [_SyntheticPlayer(10 ** 17 + player_id, rng) for player_id in range(count)]
+    player_ids = [player.id for player in synthetic_players]
+    columns = {rank_name: [metric.sort_function(player) for player in synthetic_players]
+               for rank_name, metric in leaderboards.METRICS.items()}
+
+    old_time, old_rankings = timed(old_rank, synthetic_players)
+    new_time, _ = timed(leaderboards.rank_columns, player_ids, columns)
+    print("Ranking %d leaderboards: old %.2fs  new %.2fs  (%.1fx)"
+          % (len(columns), old_time, new_time, old_time / new_time))
+
+    lookup_ids = rng.sample(player_ids, RANK_LOOKUPS)
+    for rank_name in ("levels", "money"):
+        old_lookup_time, _ = timed(lambda: [old_rankings[rank_name].index(player_id) for player_id in lookup_ids])
+        new_lookup_time, _ = timed(lambda: [leaderboards.leaderboards[rank_name].rank(player_id)
+                                            for player_id in lookup_ids])
+        print("%d %s rank lookups: old %.3fs  new %.3fs  (%.0fx)"
+              % (RANK_LOOKUPS, rank_name, old_lookup_time, new_lookup_time, old_lookup_time / new_lookup_time))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PLAYERS)
@@ -0,0 +1,63 @@
+"""
+Event loop lag with db calls made on the loop vs through asyncdb.
+
+Runs the same player lookups from many concurrent "commands" while a
+probe measures how late the loop wakes up (like the shard lag monitor).
+Against a real (remote) database the blocking version stalls the loop
+for every round trip.
+
+    python -m tests.benchmarks.bench_loop_lag [lookups per command]
+"""
+
+import asyncio
+import sys
+import time
+
+from dueutil import asyncdb, dbconn
+from dueutil.game import players
+
+PROBE_INTERVAL = 0.005
+COMMANDS = 50
+DEFAULT_LOOKUPS = 20
+
+
+async def probe(lags, done):
+    while not done.is_set():
+        sleep_start = time.monotonic()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(max(time.monotonic() - sleep_start - PROBE_INTERVAL, 0))
+
+
+async def blocking_command(collection, lookups):
+    for player_id in range(lookups):
+        collection.find_one({"_id": player_id})
+        await asyncio.sleep(0)
+
+
+async def async_command(collection, lookups):
+    for player_id in range(lookups):
+        await asyncdb.run(collection.find_one, {"_id": player_id})
+
+
+async def measure(command, lookups):
+    collection = dbconn.get_collection_for_object(players.Player)
+    lags, done = [], asyncio.Event()
+    probe_task = asyncio.ensure_future(probe(lags, done))
+    start = time.monotonic()
+    await asyncio.gather(*(command(collection, lookups) for _ in range(COMMANDS)))
+    elapsed = time.monotonic() - start
+    done.set()
+    await probe_task
+    return elapsed, max(lags, default=0), sum(lags) / max(len(lags), 1)
+
+
+def main(lookups):
+    print("%d commands x %d lookups" % (COMMANDS, lookups))
+    print("%-10s %12s %12s %12s" % ("", "total", "max lag", "mean lag"))
+    for name, command in (("blocking", blocking_command), ("asyncdb", async_command)):
+        elapsed, max_lag, mean_lag = asyncio.run(measure(command, lookups))
+        print("%-10s %11.1fms %11.1fms %11.2fms" % (name, elapsed * 1e3, max_lag * 1e3, mean_lag * 1e3))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LOOKUPS)
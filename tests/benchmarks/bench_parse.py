@@ -0,0 +1,40 @@
+"""
+The single pass command tokenizer vs the old char at a time parse.
+
+Long & adversarial messages (about 2000 chars, the max for a message).
+
+    python -m tests.benchmarks.bench_parse
+"""
+
+from types import SimpleNamespace
+
+from dueutil import commands
+from dueutil.game.configs import dueserverconfig
+from tests.test_commands import MENTION_IDS, _old_parse
+from . import best_time, report
+
+KEY = dueserverconfig.DEFAULT_SERVER_KEY
+MENTIONS = [MENTION_IDS[index % 2] for index in range(80)]
+MESSAGES = (("short", KEY + "battle <@%d> 100" % MENTION_IDS[0], MENTIONS[:1]),
+            ("2000 chars of words", KEY + "cmd " + " ".join(["word"] * 398), []),
+            ("500 quoted strings", KEY + "cmd " + '"a" ' * 500, []),
+            ("2000 backslashes", KEY + "cmd " + "\\" * 2000, []),
+            ("long quoted string", KEY + 'cmd "' + "a b " * 498 + '"', []),
+            ("80 mentions", KEY + "cmd " + " ".join("<@%d>" % mention for mention in MENTIONS), MENTIONS))
+
+
+def message(content, raw_mentions):
+    return SimpleNamespace(content=content, raw_mentions=list(raw_mentions),
+                           guild=SimpleNamespace(id=0), channel=None)
+
+
+def main():
+    for name, content, raw_mentions in MESSAGES:
+        assert commands.parse(message(content, raw_mentions)) == _old_parse(message(content, raw_mentions))
+        old_time = best_time(lambda: _old_parse(message(content, raw_mentions)), number=200)
+        new_time = best_time(lambda: commands.parse(message(content, raw_mentions)), number=200)
+        report("%s (%d chars)" % (name, len(content)), old_time, new_time, unit="us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+The tests import the bot, so (like the bot) they need its config:
+generalconfig.py & a dbconfig.json for a test database. Without them
+the tests are skipped.
+"""
+
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.chdir(ROOT)
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+missing_configs = []
+if importlib.util.find_spec("generalconfig") is None:
+    missing_configs.append("generalconfig.py")
+if not os.path.exists("dbconfig.json"):
+    missing_configs.append("dbconfig.json")
+collect_ignore_glob = ["test_*.py"] if missing_configs else []
+
+
+def pytest_report_header(config):
+    if missing_configs:
+        return "Skipping the tests (missing %s)" % ", ".join(missing_configs)
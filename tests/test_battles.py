@@ -0,0 +1,36 @@
+import bson
+import pytest
+
+from dueutil.game import battles, players
+
+# (level, attack, strg, accy) for each side of a matchup
+MATCHUPS = (((5, 10, 10, 10), (5, 10, 10, 10)),
+            ((20, 45, 40, 50), (25, 60, 55, 50)),
+            ((120, 900, 800, 850), (100, 700, 900, 600)))
+
+
+def _fighter(player_id, name, level, attack, strg, accy):
+    player = players.Player(no_save=True)
+    player.id, player.name = player_id, name
+    player.level = level
+    player.attack, player.strg, player.accy = attack, strg, accy
+    player.hp = 10 * level
+    return player
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("stats_one, stats_two", MATCHUPS)
+def test_saved_replay_matches_battle(stats_one, stats_two, seed):
+    player_one = _fighter(10 ** 17 + 1, "Player One", *stats_one)
+    player_two = _fighter(10 ** 17 + 2, "Player Two", *stats_two)
+    battle_log = battles.get_battle_log(player_one=player_one, player_two=player_two, seed=seed)
+
+    # What would be stored in & loaded back from BattleReplays
+    document = bson.BSON.encode(battles.replay_document(battle_log, "Test")).decode()
+    replay = battles.load_replay(document)
+    replay_log = battles.get_replay_log(replay, (player_one.name_clean, player_two.name_clean))
+
+    winner_id = replay_log.winner.id if replay_log.winner is not None else None
+    assert (winner_id, replay_log.turn_count) == (document["winner"], document["turn_count"])
+    assert replay_log.embed.title == battle_log.embed.title
+    assert replay_log.embed.to_dict()["fields"] == battle_log.embed.to_dict()["fields"]
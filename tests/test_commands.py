@@ -0,0 +1,278 @@
+import asyncio
+import random
+from types import SimpleNamespace
+
+import pytest
+from hypothesis import given, settings, strategies as st
+
+from dueutil import commands, commandtypes, events, loader, util
+from dueutil.game.configs import dueserverconfig
+
+TOKENS = ("hello", "1", "0", "-3", "2.5", "10k", "1,000", "2m", "yes", "no", "true",
+          "50%", "abc def", "  ", "\u200b", "https://x.com/a.png", "x.txt", "team",
+          "*", "?", "1234567890123", "-0", "1e5", "nan")
+EXTRA_PATTERNS = ("", "SIR?", "SI*PB?R?I?C?", "P*", "S?S?S?", "C?S", "%?L?", "T", "TS?", "B?B?", "MS*", "SC*S")
+MENTION_IDS = (215601360862232576, 132315148487622656, 44, 4444444444444444444)
+MESSAGE_CHARS = ("a", "b", "1", "\\", '"', " ", "  ", "\t", "\n", "\xa0", "\x1c", "<@", ">", "!", ",")
+
+
+async def _old_determine_args(pattern, args, called, ctx):
+    # determine_args from before ArgsMatcher (the reference for the test)
+
+    original_pattern = pattern
+
+    # Internal helpers.
+    def remove_optional(args_pattern):
+        pattern_pos = len(args_pattern) - 1
+        while pattern_pos >= 0:
+            if len(args_pattern.replace('?', '')) == len(args):
+                break
+            elif pattern_pos == 0:
+                return False
+            if args_pattern[pattern_pos] == '?':
+                args_pattern = args_pattern[:pattern_pos - 1]
+                pattern_pos = len(args_pattern) - 1
+                continue
+            pattern_pos -= 1
+        return args_pattern.replace('?', '')
+
+    def could_be_string(args_pattern):
+        if args_pattern[0] in commandtypes.STRING_TYPES:
+            if len(args_pattern) > 1:
+                pattern_pos = len(args_pattern) - 1
+                while pattern_pos > 0:
+                    if args_pattern[pattern_pos] == '?':
+                        pattern_pos -= 2
+                        continue
+                    return False
+            return args_pattern in commandtypes.STRING_TYPES or len(args_pattern) > 1
+        return False
+
+    def attempt_args_as_string(crappy_args, args_pattern):
+        # A last ditch effort to get some use out of the shit known as input.
+        if len(crappy_args) > 0 and could_be_string(args_pattern):
+            # Only a pattern that can just be a string is valid
+            return ' '.join(map(str, crappy_args)),
+        return False
+
+    def valid_args_len(test_args, args_pattern):
+        # Length - zero or more types (as they are not needed)
+        pattern_type_count = len(args_pattern) - args_pattern.count('*') * 2
+        if '*' in args_pattern:
+            return len(test_args) >= pattern_type_count
+        return len(test_args) == pattern_type_count
+
+    # Initial pattern checks
+    guessing_arguments = False
+    if pattern is None and len(args) > 0:
+        return False
+    elif pattern is None and len(args) == 0:
+        return args
+    if len(pattern) == 0:
+        return args
+    if '*' not in pattern:
+        pattern_optional_removed = remove_optional(pattern)
+        if pattern_optional_removed is False or len(args) > len(pattern_optional_removed):
+            if could_be_string(pattern):
+                # If the command is wrong by all other tests and it could be a string
+                # merge the arguments to a single string.
+                if len(args) > 0:
+                    return ' '.join(args),
+                return False
+            # Guessing args: Trying to figure out if the user has forgot quotes.
+            # With no context on the command it's fiddly
+            guessing_arguments = True
+        if not guessing_arguments:
+            pattern = pattern_optional_removed
+        else:
+            pattern = pattern.replace('?', '')
+
+    # Checking the command args match the given pattern.
+    pos = 0
+    args_index = 0
+    current_rule = ''
+    checks_satisfied = 0
+    while pos < len(pattern) and args_index < len(args):
+        pos_change = pattern[pos] != '*'
+        if pos_change:
+            current_rule = pattern[pos]
+        if pos + 1 < len(pattern) and pattern[pos + 1] == '*':
+            # We don't move in were we are in the pattern
+            # if the rule is a Kleene star
+            pos += 1
+            pos_change = False
+        # Get the value as the type it should be (if possible). Will return False or None if it fails.
+        value = await commandtypes.parse_type(current_rule, args[args_index], called=called, ctx=ctx)
+        if (value is False and current_rule != 'B') or value is None:
+            # We've got a incorrect value and are not expecting multiple (*)
+            if pattern[pos] != '*':
+                # We've been unable to parse it.
+                # One last try.
+                return attempt_args_as_string(args, original_pattern)
+            else:
+                # Must be the end of the repeated set of values (*)
+                if pos + 1 < len(pattern):
+                    args_index -= 1
+                    pos_change = True
+                else:
+                    # Okay I'm super cereal - Giving up after this
+                    return attempt_args_as_string(args, original_pattern)
+        else:
+            # Normal - All is good
+            args[args_index] = value
+            checks_satisfied += 1
+        args_index += 1
+        if pos_change:
+            pos += 1
+
+    # Final checks
+    if (checks_satisfied == len(args) and not guessing_arguments
+            and valid_args_len(args, pattern)):
+        return args
+    elif guessing_arguments:
+        """
+        If they've forgot quotes for the last sting
+        so !command arg0 arg1 arg2 "A String here"
+        and they've done
+        !command arg0 arg1 arg2 A String here
+        """
+        if len(args) > len(pattern):
+            last_string = -1
+            # Find the last type that could be a string in the pattern.
+            # Use a simple loop as the regex (re) kinda sucks for this
+            for string_type in commandtypes.STRING_TYPES:
+                last_string_type = pattern.rfind(string_type)
+                if last_string_type > last_string:
+                    last_string = last_string_type
+            if last_string != -1:
+                if could_be_string(pattern[last_string:]):
+                    new_args = tuple(args[:last_string]) + (' '.join(args[last_string:]),)
+                    if checks_satisfied == len(new_args) and valid_args_len(new_args, pattern):
+                        return new_args
+    return False
+
+
+def _old_parse(command_message):
+    # parse from before the single pass tokenizer (the reference for the test)
+
+    key = dueserverconfig.server_cmd_key(command_message.guild)
+    command_string = command_message.content.replace(key, '', 1)
+    user_mentions = command_message.raw_mentions
+    escaped = False
+    is_string = False
+    args = []
+    current_arg = ''
+
+    def replace_mentions():
+        nonlocal user_mentions, current_arg
+        for mention in user_mentions:  # Replace mentions
+            mention = str(mention)
+            if mention in current_arg and len(current_arg) - len(mention) < 6:
+                current_arg = mention
+                del user_mentions[user_mentions.index(int(mention))]
+
+    def add_arg():
+        nonlocal current_arg, args
+        if len(current_arg) > 0:
+            replace_mentions()
+            args = args + [current_arg]
+            current_arg = ""
+
+    for char_pos in range(0, len(command_string) + 1):
+        current_char = command_string[char_pos] if char_pos < len(command_string) else ' '
+        if char_pos < len(command_string) and (not current_char.isspace() or is_string):
+            if not escaped:
+                if current_char == '\\' and not (current_char.isspace() or current_char.isalpha()):
+                    escaped = True
+                    continue
+                elif current_char == '"':
+                    is_string = not is_string
+                    add_arg()
+                    continue
+            else:
+                escaped = False
+            current_arg += command_string[char_pos]
+        else:
+            add_arg()
+
+    if is_string:
+        raise util.BattleBananaException(command_message.channel, "Unclosed string in command!")
+
+    if len(args) > 0:
+        return key, args[0], args[1:]
+    else:
+        return key, "", []
+
+
+@pytest.fixture(scope="module")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="module")
+def args_patterns():
+    if not events.command_event:
+        loader.load_modules(packages=loader.COMMANDS)
+    patterns = {command.args_pattern for command in events.command_event.values()}
+    return sorted(patterns | set(EXTRA_PATTERNS), key=str)
+
+
+def _determined_args(loop, determine_args, pattern, args):
+    try:
+        determined_args = loop.run_until_complete(determine_args(pattern, list(args), None, None))
+    except Exception as error:
+        # Bad input can break the type parsers (the same for both)
+        return type(error)
+    return type(determined_args), determined_args
+
+
+def _check_same_args(loop, pattern, args):
+    assert (_determined_args(loop, commands.determine_args, pattern, args)
+            == _determined_args(loop, _old_determine_args, pattern, args)), (pattern, args)
+
+
+def test_registered_patterns_match_old(loop, args_patterns):
+    assert len(args_patterns) > len(EXTRA_PATTERNS)
+    rng = random.Random(0)
+    for pattern in args_patterns:
+        for args_count in range(8):
+            for _ in range(25):
+                _check_same_args(loop, pattern, [rng.choice(TOKENS) for _ in range(args_count)])
+
+
+_args = st.lists(st.one_of(st.sampled_from(TOKENS), st.text(max_size=6),
+                           st.integers(-10 ** 12, 10 ** 12).map(str),
+                           st.floats(allow_nan=False).map(str)), max_size=8)
+
+
+@settings(max_examples=1000, deadline=None)
+@given(data=st.data(), args=_args)
+def test_fuzzed_args_match_old(loop, args_patterns, data, args):
+    _check_same_args(loop, data.draw(st.sampled_from(args_patterns)), args)
+
+
+def _parsed(parse, content, raw_mentions):
+    message = SimpleNamespace(content=content, raw_mentions=list(raw_mentions),
+                              guild=SimpleNamespace(id=0), channel=None)
+    try:
+        parsed = parse(message)
+    except util.BattleBananaException as error:
+        parsed = error.message
+    # parse removes the mentions it uses
+    return parsed, message.raw_mentions
+
+
+_mentions = st.sampled_from(MENTION_IDS).flatmap(
+    lambda mention_id: st.sampled_from(("<@%d>", "<@!%d>", "%d", "x<@%d>yz", "<@%d>abcdef")).map(
+        lambda mention: mention % mention_id))
+_message_parts = st.lists(st.one_of(st.sampled_from(MESSAGE_CHARS), st.text(max_size=4), _mentions), max_size=20)
+
+
+@settings(max_examples=3000, deadline=None)
+@given(parts=_message_parts, raw_mentions=st.lists(st.sampled_from(MENTION_IDS), max_size=5),
+       has_key=st.booleans())
+def test_parse_matches_old(parts, raw_mentions, has_key):
+    content = (dueserverconfig.DEFAULT_SERVER_KEY if has_key else "") + "".join(parts)
+    assert _parsed(commands.parse, content, raw_mentions) == _parsed(_old_parse, content, raw_mentions)
@@ -0,0 +1,86 @@
+import asyncio
+
+import bson
+import pytest
+
+from dueutil import asyncdb, dbconn
+from dueutil.game import players
+
+
+class _BrokenCollection:
+    def bulk_write(self, requests, **options):
+        raise bson.errors.InvalidDocument("cannot encode object")
+
+
+@pytest.fixture
+def unsaved_players(monkeypatch):
+    monkeypatch.setattr(dbconn, "conn", lambda: {"Player": _BrokenCollection()})
+    unsaved = []
+    for player_id in range(3):
+        player = players.Player(no_save=True)
+        player.id = 10 ** 17 + player_id
+        dbconn.queue_object(player.id, player)
+        unsaved.append(player)
+    yield unsaved
+    dbconn._drop_pending("Player", lambda player_id: player_id in {player.id for player in unsaved})
+
+
+def test_failed_flush_keeps_objects_pending(unsaved_players):
+    assert dbconn.flush_objects() == 0
+    assert all(dbconn.is_pending(player) for player in unsaved_players)
+    # The retry is a full write
+    assert all(player.saved_document is None for player in unsaved_players)
+
+
+def test_flush_task_survives_failed_flush(unsaved_players):
+    loop = asyncio.new_event_loop()
+    try:
+        # The task only ends if the flush raised
+        with pytest.raises(asyncio.TimeoutError):
+            loop.run_until_complete(asyncio.wait_for(asyncdb.flush_task(), 1))
+    finally:
+        loop.close()
+    assert all(dbconn.is_pending(player) for player in unsaved_players)
+
+
+class _GuildThing:
+    pass
+
+
+def test_deleting_guild_drops_queued_saves():
+    guild_id = 1234567
+    kept_id = "7654321/foe"
+    for thing_id in (guild_id, "%d/foe" % guild_id, "%d+channel/foe" % guild_id, kept_id):
+        dbconn.queue_object(thing_id, _GuildThing())
+    dbconn.delete_guild_objects(_GuildThing.__name__, guild_id)
+    pending_ids = [thing_id for collection, thing_id in dbconn._pending_objects if collection == _GuildThing.__name__]
+    dbconn._drop_pending(_GuildThing.__name__, lambda thing_id: True)
+    assert pending_ids == [kept_id]
+
+
+class _EvictingCollection:
+    """Fills a player cache while the players' save is being written"""
+
+    def __init__(self, cache, players_to_add):
+        self.cache = cache
+        self.players_to_add = players_to_add
+
+    def bulk_write(self, requests, **options):
+        for player in self.players_to_add:
+            self.cache[player.id] = player
+
+
+def test_flushing_players_not_evicted(monkeypatch):
+    cache = players.Players(max_players=2)
+    saving, others = [], []
+    for player_id in range(4):
+        player = players.Player(no_save=True)
+        player.id = 10 ** 17 + player_id
+        (saving if player_id < 2 else others).append(player)
+    for player in saving:
+        cache[player.id] = player
+        dbconn.queue_object(player.id, player)
+    monkeypatch.setattr(dbconn, "conn", lambda: {"Player": _EvictingCollection(cache, others)})
+    dbconn.flush_objects(*saving)
+    assert all(player.id in cache for player in saving)
+    assert not any(dbconn.is_pending(player) for player in saving)
@@ -0,0 +1,74 @@
+import math
+import random
+
+import numpy
+from scipy import stats
+
+from dueutil.game import gamerules, players, quests
+
+SAMPLES = 4000
+
+
+class _Info:
+    @staticmethod
+    def base_values():
+        return quests.Quest._BaseStats(1.2, 1.5, 1.1, 30)
+
+
+class _Quest:
+    """Just what _calculate_stats needs (not a saved ActiveQuest)"""
+
+    info = _Info()
+    progress = players.Player.progress
+
+    def __init__(self, level):
+        self.level = level
+        self.exp = self.total_exp = 0
+
+
+def _old_calculate_stats(self):
+    # The step at a time version (from before it was vectorized)
+    base_attack, base_strg, base_accy, base_hp = tuple(base_value / 1.7 for base_value in
+                                                       self.info.base_values())
+    self.attack = self.accy = self.strg = 1
+    target_level = self.level
+    self.level = 0
+    self.hp = base_hp * target_level * random.uniform(0.6, 1)
+    increment_scale = random.uniform(0.4, 1)
+    while self.level < target_level:
+        exp_next_level = gamerules.get_exp_for_next_level(self.level)
+        increment = max(exp_next_level, 1000) * increment_scale / 600
+        if self.exp >= exp_next_level:
+            self.level += 1
+            self.exp = 0
+        self.progress(increment * random.uniform(0.6, 1),
+                      increment * random.uniform(0.6, 1),
+                      increment * random.uniform(0.6, 1),
+                      max_attr=math.inf,
+                      max_exp=math.inf)
+        self.attack += -increment + increment * base_attack
+        self.strg += -increment + increment * base_strg
+        self.accy += -increment + increment * base_accy
+    self.cash_iv = min(self.info.base_values()) * 3 * random.uniform(0.8, 1.6)
+
+
+def _sample_stats(calculate_stats, level):
+    samples = []
+    for _ in range(SAMPLES):
+        quest = _Quest(level)
+        calculate_stats(quest)
+        samples.append((quest.level, quest.attack, quest.strg, quest.accy,
+                        quest.hp, quest.total_exp, quest.exp, quest.cash_iv))
+    return numpy.array(samples, dtype=float)
+
+
+def test_quest_stats_match_old_distribution():
+    random.seed(0)
+    numpy.random.seed(0)
+    for level in (1, 15, 60, 120):
+        old_stats = _sample_stats(_old_calculate_stats, level)
+        new_stats = _sample_stats(quests.ActiveQuest._calculate_stats, level)
+        assert set(old_stats[:, 0]) == set(new_stats[:, 0]) == {level}
+        for column, stat in enumerate(("attack", "strg", "accy", "hp", "total_exp", "exp", "cash_iv"), 1):
+            p_value = stats.ks_2samp(old_stats[:, column], new_stats[:, column]).pvalue
+            assert p_value > 0.001, "%s at level %d (p = %g)" % (stat, level, p_value)
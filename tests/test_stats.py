@@ -0,0 +1,54 @@
+import asyncio
+from collections import Counter
+
+import pytest
+from pymongo.errors import PyMongoError
+
+from dueutil.game import stats
+from dueutil.game.stats import Stat
+
+
+class _StatsCollection:
+    """Checks what get_stats says while the bulk $inc is being written"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.count = 0
+        self.seen_during_write = None
+
+    def find(self, *args, **kwargs):
+        return [{"stat": Stat.COMMANDS_USED.value, "count": self.count}] if self.count else []
+
+    def bulk_write(self, requests, **options):
+        self.seen_during_write = asyncio.run(stats.get_stats())[Stat.COMMANDS_USED]
+        if self.fail:
+            raise PyMongoError("write failed")
+        self.count += sum(request._doc["$inc"]["count"] for request in requests)
+
+
+@pytest.fixture
+def stats_collection(monkeypatch):
+    monkeypatch.setattr(stats, "_pending_increments", Counter())
+    monkeypatch.setattr(stats, "_flushing_increments", Counter())
+    collection = _StatsCollection()
+    monkeypatch.setattr(stats.dbconn, "conn", lambda: {"stats": collection})
+    yield collection
+
+
+def test_stats_counted_during_flush(stats_collection):
+    stats.increment_stat(Stat.COMMANDS_USED, 5)
+    stats.flush_stats()
+    assert stats_collection.seen_during_write == 5
+    assert asyncio.run(stats.get_stats())[Stat.COMMANDS_USED] == 5
+
+
+def test_failed_flush_keeps_increments(stats_collection):
+    stats_collection.fail = True
+    stats.increment_stat(Stat.COMMANDS_USED, 3)
+    stats.flush_stats()
+    assert stats_collection.seen_during_write == 3
+    assert asyncio.run(stats.get_stats())[Stat.COMMANDS_USED] == 3
+    stats_collection.fail = False
+    stats.flush_stats()
+    assert stats_collection.count == 3
+    assert asyncio.run(stats.get_stats())[Stat.COMMANDS_USED] == 3